@@ -1,13 +1,25 @@
+import asyncio
 import logging
+import time
 import voluptuous as vol
 
-from homeassistant.core import HomeAssistant, ServiceCall
+from homeassistant.core import HomeAssistant, ServiceCall, ServiceResponse, SupportsResponse, callback
 from homeassistant.config_entries import ConfigEntry
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import config_validation as cv, device_registry as dr, entity_registry as er
 from homeassistant.helpers.event import async_track_time_change
 from homeassistant.helpers.typing import ConfigType # Use ConfigType for async_setup
+from homeassistant.util import dt as dt_util
 
 from .upload import daily_upload_task
-from .const import DOMAIN
+from .upload_queue import UploadQueue
+from .scheduler import PollScheduler
+from .client import DeviceClient
+from .push import async_register_push_webhook
+from .history import HistoryStore, history_db_path
+from .statistics import StatisticsImporter
+from .image_store import instance_www_dir
+from .const import DOMAIN, UPLOAD_MODE_FILE, DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT, DEFAULT_FLOW_ROUND_TIMEOUT, DEFAULT_FLEET_CONCURRENCY, FLEET_MAX_CONCURRENCY, HISTORY_MAX_ROWS
 # Import sensor class if needed for type checking during unload
 # from .sensor import MeterCollectorSensor
 
@@ -40,6 +52,12 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     # Ensure domain and instance-specific data structures exist
     hass.data.setdefault(DOMAIN, {})
     hass.data[DOMAIN].setdefault("cancel_upload_task", {})
+    hass.data[DOMAIN].setdefault("upload_queues", {})
+    hass.data[DOMAIN].setdefault("clients", {})
+    hass.data[DOMAIN].setdefault("history", {})
+    if "scheduler" not in hass.data[DOMAIN]:
+        # One scheduler for all instances: staggered phases and bounded concurrent polls
+        hass.data[DOMAIN]["scheduler"] = PollScheduler(hass)
     # Store entry data/options if needed globally (less common now with entry object)
     # hass.data[DOMAIN][entry.entry_id] = {"entry": entry} # Example
 
@@ -49,6 +67,35 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     if not hass.services.has_service(DOMAIN, "collect_data"):
          await _register_services(hass) # Register services if not already done
 
+    # Read options first, fallback to data for backward compatibility or initial setup
+    enable_upload = entry.options.get("enable_upload", entry.data.get("enable_upload", False))
+    upload_url = entry.options.get("upload_url", entry.data.get("upload_url"))
+    api_key = entry.options.get("api_key", entry.data.get("api_key"))
+    upload_mode = entry.options.get("upload_mode", UPLOAD_MODE_FILE)
+
+    # --- Device HTTP Client ---
+    # Shared by the sensor and the buttons so requests to the device never overlap
+    hass.data[DOMAIN]["clients"][instance_name] = DeviceClient(
+        hass,
+        entry.data["ip"],
+        instance_name,
+        connect_timeout=entry.options.get("connect_timeout", DEFAULT_CONNECT_TIMEOUT),
+        read_timeout=entry.options.get("read_timeout", DEFAULT_READ_TIMEOUT),
+    )
+
+    # --- History Store ---
+    # Opened before the platforms so the sensor can write its first reading into it
+    if entry.options.get("history_store", False):
+        history = HistoryStore(hass, history_db_path(hass, instance_name), instance_name)
+        await history.async_start()
+        hass.data[DOMAIN]["history"][instance_name] = history
+
+    # --- Persistent Upload Queue ---
+    # Loaded before the platforms so the sensor platform can add the queue diagnostic sensors,
+    # and so archives left over from earlier failures are retried right away
+    if enable_upload and upload_url and api_key:
+        await _async_get_upload_queue(hass, instance_name, upload_url, api_key, upload_mode)
+
     # --- Forward Setup to Platforms ---
     try:
         await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
@@ -58,12 +105,12 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         # Clean up anything partially set up if needed before returning False
         return False
 
-    # --- Schedule Daily Upload Task ---
-    # Read options first, fallback to data for backward compatibility or initial setup
-    enable_upload = entry.options.get("enable_upload", entry.data.get("enable_upload", False))
-    upload_url = entry.options.get("upload_url", entry.data.get("upload_url"))
-    api_key = entry.options.get("api_key", entry.data.get("api_key"))
+    # --- Push Mode Webhook ---
+    # Registered once the sensor exists, polling is reduced to a watchdog by the sensor
+    if entry.options.get("push_mode", False):
+        entry.async_on_unload(async_register_push_webhook(hass, entry))
 
+    # --- Schedule Daily Upload Task ---
     if enable_upload and upload_url and api_key:
         _LOGGER.info(f"Scheduling daily upload task at midnight for instance: {instance_name}")
 
@@ -72,15 +119,19 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
             # Fetch sensor instance safely from hass.data
             sensor = hass.data.get(DOMAIN, {}).get(instance_name)
 
-            if sensor and hasattr(sensor, "available") and sensor.available and hasattr(sensor, "www_dir"):
+            if sensor and hasattr(sensor, "available") and sensor.available:
                 _LOGGER.debug(f"Executing daily upload for instance: {instance_name}")
                 try:
+                    # Close yesterday's CSV log segment first so it ships tonight
+                    await sensor.async_rotate_csv_log()
                     await daily_upload_task(
                         hass,
-                        sensor.www_dir,
+                        instance_www_dir(instance_name),
                         upload_url, # Use the value read from options/data
                         api_key,    # Use the value read from options/data
-                        instance_name
+                        instance_name,
+                        upload_mode,
+                        await _async_get_upload_queue(hass, instance_name, upload_url, api_key, upload_mode)
                     )
                 except Exception as e:
                     _LOGGER.error(f"Error during scheduled daily upload for {instance_name}: {e}", exc_info=True)
@@ -115,74 +166,195 @@ async def options_update_listener(hass: HomeAssistant, entry: ConfigEntry) -> No
     await hass.config_entries.async_reload(entry.entry_id)
 
 
+async def _async_get_upload_queue(hass: HomeAssistant, instance_name: str, upload_url: str, api_key: str, upload_mode: str) -> UploadQueue:
+    """Return the persistent upload queue of an instance, loading it on first use."""
+    upload_queues = hass.data[DOMAIN].setdefault("upload_queues", {})
+    if instance_name not in upload_queues:
+        upload_queue = UploadQueue(hass, instance_name, instance_www_dir(instance_name), upload_url, api_key, upload_mode)
+        await upload_queue.async_load()
+        upload_queues[instance_name] = upload_queue
+        _LOGGER.debug(f"Loaded upload queue for {instance_name} ({upload_queue.depth} pending archives)")
+    return upload_queues[instance_name]
+
+
 async def _register_services(hass: HomeAssistant) -> None:
     """Register the services for the integration."""
     # Note: Consider if services should be per-instance or global.
     # If per-instance, they might be better registered elsewhere or handled differently.
 
-    # --- Collect Data Service ---
-    async def async_handle_collect_data(call: ServiceCall) -> None:
-        """Handle the collect_data service call."""
-        instance_name = call.data.get("instance_name")
-        _LOGGER.debug(f"Service call collect_data received for instance: {instance_name}")
-
-        if not instance_name:
-            _LOGGER.error("Service collect_data: Missing 'instance_name'")
-            return
-
-        sensor = hass.data.get(DOMAIN, {}).get(instance_name)
-
-        if sensor and hasattr(sensor, "async_update") and hasattr(sensor, "available"):
-            if sensor.available:
+    # --- Fleet Helpers ---
+    def _resolve_instances(call: ServiceCall) -> list:
+        """Return the instance names targeted by a call: names (or "all") and/or areas."""
+        sensors = {name: hass.data[DOMAIN][name] for name in hass.data[DOMAIN].get("clients", {}) if name in hass.data[DOMAIN]}
+        names = call.data.get("instance_name", [])
+        if "all" in names:
+            return list(sensors)
+        targets = []
+        for name in names:
+            if name not in sensors:
+                raise HomeAssistantError(f"Sensor instance '{name}' not found")
+            targets.append(name)
+        area_ids = set(call.data.get("area_id", []))
+        if area_ids:
+            entity_registry = er.async_get(hass)
+            device_registry = dr.async_get(hass)
+            for name, sensor in sensors.items():
+                entry = entity_registry.async_get(sensor.entity_id) if sensor.entity_id else None
+                if entry is None:
+                    continue
+                area_id = entry.area_id
+                if area_id is None and entry.device_id:
+                    device = device_registry.async_get(entry.device_id)
+                    area_id = device.area_id if device else None
+                if area_id in area_ids and name not in targets:
+                    targets.append(name)
+        return targets
+
+    async def _async_run_fleet(call: ServiceCall, service: str, job) -> ServiceResponse:
+        """Run job(instance_name) for the targeted instances, at most max_concurrent at a time."""
+        instance_names = _resolve_instances(call)
+        semaphore = asyncio.Semaphore(call.data["max_concurrent"])
+        started = time.monotonic()
+
+        async def _async_run_one(instance_name):
+            async with semaphore:
+                instance_started = time.monotonic()
                 try:
-                    _LOGGER.info(f"Service collect_data: Triggering update for sensor: {instance_name}")
-                    # Note: Calling async_update directly might bypass throttling.
-                    # Consider if a dedicated "force_update" method is needed in the sensor.
-                    await sensor.async_update() # Be aware this might ignore Throttle
-                    _LOGGER.debug(f"Service collect_data: Update successful for sensor: {instance_name}")
+                    result = {"success": True, **await job(instance_name)}
                 except Exception as e:
-                    _LOGGER.error(f"Service collect_data: Failed to update sensor {instance_name}: {e}", exc_info=True)
-            else:
-                _LOGGER.warning(f"Service collect_data: Sensor {instance_name} is unavailable, cannot collect data.")
-        else:
-            _LOGGER.error(f"Service collect_data: Sensor instance '{instance_name}' not found or invalid.")
+                    _LOGGER.error(f"Service {service}: failed for {instance_name}: {e}", exc_info=True)
+                    result = {"success": False, "error": str(e)}
+                result["duration_ms"] = round((time.monotonic() - instance_started) * 1000, 1)
+                return instance_name, result
+
+        results = dict(await asyncio.gather(*(_async_run_one(name) for name in instance_names)))
+        duration_ms = round((time.monotonic() - started) * 1000, 1)
+        _LOGGER.info(f"Service {service}: {len(results)} instances in {duration_ms} ms")
+        return {
+            "count": len(results),
+            "succeeded": sum(1 for result in results.values() if result["success"]),
+            "duration_ms": duration_ms,
+            "results": results,
+        }
+
+    # --- Collect Data Service ---
+    async def async_handle_collect_data(call: ServiceCall) -> ServiceResponse:
+        """Handle the collect_data service call, polls the targeted instances and returns their readings."""
+
+        async def _async_collect(instance_name):
+            sensor = hass.data[DOMAIN][instance_name]
+            if not sensor.available:
+                _LOGGER.info(f"Service collect_data: Sensor {instance_name} is unavailable, trying anyway.")
+            await sensor._async_update()
+            return {
+                "available": sensor.available,
+                "value": sensor.state,
+                "error": sensor.extra_state_attributes.get("error"),
+                "timestamp": sensor.extra_state_attributes.get("timestamp"),
+            }
+
+        return await _async_run_fleet(call, "collect_data", _async_collect)
 
     # --- Upload Data Service ---
-    async def async_handle_upload_data(call: ServiceCall) -> None:
-        """Handle the upload_data service call."""
-        instance_name = call.data.get("instance_name")
-        _LOGGER.debug(f"Service call upload_data received for instance: {instance_name}")
+    async def async_handle_upload_data(call: ServiceCall) -> ServiceResponse:
+        """Handle the upload_data service call, uploads the new images of the targeted instances."""
+
+        async def _async_upload(instance_name):
+            sensor = hass.data[DOMAIN][instance_name]
+            if not (sensor.upload_url and sensor.api_key): # Check if upload details are configured
+                raise HomeAssistantError(f"Upload URL or API Key not configured for instance {instance_name}")
+            upload_queue = await _async_get_upload_queue(hass, instance_name, sensor.upload_url, sensor.api_key, sensor.upload_mode)
+            await sensor.async_rotate_csv_log()
+            result = await daily_upload_task(
+                hass,
+                instance_www_dir(instance_name),
+                sensor.upload_url,
+                sensor.api_key,
+                instance_name,
+                sensor.upload_mode,
+                upload_queue,
+            )
+            return {**result, "queue_depth": upload_queue.depth}
 
-        if not instance_name:
-            _LOGGER.error("Service upload_data: Missing 'instance_name'")
-            return
+        return await _async_run_fleet(call, "upload_data", _async_upload)
 
+    # --- Trigger Reading Service ---
+    async def async_handle_trigger_reading(call: ServiceCall) -> ServiceResponse:
+        """Handle the trigger_reading service call, starts a round and returns its reading."""
+        instance_name = call.data["instance_name"]
         sensor = hass.data.get(DOMAIN, {}).get(instance_name)
-
-        # Need to get upload details from the config entry associated with the sensor/instance
-        # This requires finding the correct entry or storing necessary details on the sensor itself.
-        # Assuming sensor has upload_url, api_key, www_dir attributes set during its init.
-        if sensor and hasattr(sensor, "www_dir") and hasattr(sensor, "upload_url") and hasattr(sensor, "api_key"):
-             if sensor.available: # Check if sensor is available before trying to upload
-                if sensor.upload_url and sensor.api_key: # Check if upload details are configured
-                    try:
-                        _LOGGER.info(f"Service upload_data: Triggering upload for instance: {instance_name}")
-                        await daily_upload_task(
-                            hass,
-                            sensor.www_dir,
-                            sensor.upload_url,
-                            sensor.api_key,
-                            instance_name # Use instance_name from service call
-                        )
-                        _LOGGER.debug(f"Service upload_data: Upload successful for instance: {instance_name}")
-                    except Exception as e:
-                        _LOGGER.error(f"Service upload_data: Failed to upload data for {instance_name}: {e}", exc_info=True)
-                else:
-                    _LOGGER.error(f"Service upload_data: Upload URL or API Key not configured for instance {instance_name}.")
-             else:
-                 _LOGGER.warning(f"Service upload_data: Sensor {instance_name} is unavailable, cannot upload data.")
-        else:
-            _LOGGER.error(f"Service upload_data: Sensor instance '{instance_name}' not found or missing required attributes (www_dir, upload_url, api_key).")
+        if sensor is None or not hasattr(sensor, "async_trigger_round"):
+            raise HomeAssistantError(f"Sensor instance '{instance_name}' not found")
+        try:
+            result = await sensor.async_trigger_round(call.data["timeout"])
+        except Exception as e:
+            raise HomeAssistantError(f"Could not start a flow round on {instance_name}: {e}") from e
+        _LOGGER.info(f"Service trigger_reading: round of {instance_name} done in {result['round_seconds']}s, value {result['value']}")
+        return result
+
+    # --- History Services ---
+    def _get_history_store(instance_name):
+        history = hass.data.get(DOMAIN, {}).get("history", {}).get(instance_name)
+        if history is None:
+            raise HomeAssistantError(f"History store is not enabled for instance '{instance_name}'")
+        return history
+
+    async def async_handle_get_history(call: ServiceCall) -> ServiceResponse:
+        """Handle the get_history service call, returns the readings of a time range."""
+        instance_name = call.data["instance_name"]
+        history = _get_history_store(instance_name)
+        end = call.data.get("end") or dt_util.now()
+        readings = await history.async_query(
+            int(dt_util.as_timestamp(call.data["start"])),
+            int(dt_util.as_timestamp(end)),
+            by=call.data["by"],
+            resolution=call.data.get("resolution"),
+            limit=call.data["limit"],
+        )
+        _LOGGER.debug(f"Service get_history: {len(readings)} readings for {instance_name}")
+        return {"instance_name": instance_name, "count": len(readings), "readings": readings}
+
+    async def async_handle_import_history(call: ServiceCall) -> ServiceResponse:
+        """Handle the import_history service call, bulk imports the CSV log into the history store."""
+        instance_name = call.data["instance_name"]
+        history = _get_history_store(instance_name)
+        read, inserted = await history.async_import_csv(instance_www_dir(instance_name))
+        _LOGGER.info(f"Service import_history: {inserted} of {read} CSV rows imported for {instance_name}")
+        return {"instance_name": instance_name, "rows_read": read, "rows_inserted": inserted}
+
+    # --- Long-Term Statistics Backfill Service ---
+    async def async_handle_import_statistics(call: ServiceCall) -> ServiceResponse:
+        """Handle the import_statistics service call, backfills the CSV logs into hourly statistics."""
+        if "recorder" not in hass.config.components:
+            raise HomeAssistantError("The recorder integration is required to import statistics")
+
+        @callback
+        def _report_progress(instance_name, hours, imported_until):
+            hass.bus.async_fire(f"{DOMAIN}_statistics_import_progress", {
+                "instance_name": instance_name,
+                "hours_imported": hours,
+                "imported_until": dt_util.utc_from_timestamp(imported_until).isoformat(),
+            })
+
+        results = []
+        # One meter after the other: memory stays bounded to one batch whatever the number of meters
+        for instance_name in call.data["instance_name"]:
+            sensor = hass.data.get(DOMAIN, {}).get(instance_name)
+            if sensor is None or not hasattr(sensor, "native_unit_of_measurement"):
+                raise HomeAssistantError(f"Sensor instance '{instance_name}' not found")
+            importer = StatisticsImporter(hass, instance_name, instance_www_dir(instance_name), sensor.native_unit_of_measurement)
+            results.append(await importer.async_run(restart=call.data["restart"], progress_callback=_report_progress))
+        return {"imports": results}
+
+    # Fleet services: instance names (or "all") and/or areas, handled max_concurrent at a time
+    fleet_schema = vol.All(
+        vol.Schema({
+            vol.Optional("instance_name"): vol.All(cv.ensure_list, [str]),
+            vol.Optional("area_id"): vol.All(cv.ensure_list, [str]),
+            vol.Optional("max_concurrent", default=DEFAULT_FLEET_CONCURRENCY): vol.All(vol.Coerce(int), vol.Range(min=1, max=FLEET_MAX_CONCURRENCY)),
+        }),
+        cv.has_at_least_one_key("instance_name", "area_id"),
+    )
 
     # Register services safely, checking if they already exist
     if not hass.services.has_service(DOMAIN, "collect_data"):
@@ -192,7 +364,8 @@ async def _register_services(hass: HomeAssistant) -> None:
                 DOMAIN,
                 "collect_data",
                 async_handle_collect_data,
-                schema=vol.Schema({vol.Required("instance_name"): str}),
+                schema=fleet_schema,
+                supports_response=SupportsResponse.OPTIONAL,
             )
             _LOGGER.info("collect_data service registered successfully")
         except Exception as e:
@@ -205,12 +378,62 @@ async def _register_services(hass: HomeAssistant) -> None:
                 DOMAIN,
                 "upload_data",
                 async_handle_upload_data,
-                schema=vol.Schema({vol.Required("instance_name"): str}),
+                schema=fleet_schema,
+                supports_response=SupportsResponse.OPTIONAL,
             )
             _LOGGER.info("upload_data service registered successfully")
         except Exception as e:
             _LOGGER.error(f"Failed to register upload_data service: {e}", exc_info=True)
 
+    if not hass.services.has_service(DOMAIN, "trigger_reading"):
+        hass.services.async_register(
+            DOMAIN,
+            "trigger_reading",
+            async_handle_trigger_reading,
+            schema=vol.Schema({
+                vol.Required("instance_name"): str,
+                vol.Optional("timeout", default=DEFAULT_FLOW_ROUND_TIMEOUT): vol.All(vol.Coerce(int), vol.Range(min=5, max=900)),
+            }),
+            supports_response=SupportsResponse.OPTIONAL,
+        )
+
+    if not hass.services.has_service(DOMAIN, "get_history"):
+        hass.services.async_register(
+            DOMAIN,
+            "get_history",
+            async_handle_get_history,
+            schema=vol.Schema({
+                vol.Required("instance_name"): str,
+                vol.Required("start"): cv.datetime,
+                vol.Optional("end"): cv.datetime,
+                vol.Optional("by", default="ha"): vol.In(["ha", "device"]),
+                vol.Optional("resolution"): cv.positive_int, # Seconds per bucket
+                vol.Optional("limit", default=HISTORY_MAX_ROWS): vol.All(vol.Coerce(int), vol.Range(min=1, max=HISTORY_MAX_ROWS)),
+            }),
+            supports_response=SupportsResponse.ONLY,
+        )
+
+    if not hass.services.has_service(DOMAIN, "import_statistics"):
+        hass.services.async_register(
+            DOMAIN,
+            "import_statistics",
+            async_handle_import_statistics,
+            schema=vol.Schema({
+                vol.Required("instance_name"): vol.All(cv.ensure_list, [str]),
+                vol.Optional("restart", default=False): bool, # Ignore the saved progress and import everything again
+            }),
+            supports_response=SupportsResponse.OPTIONAL,
+        )
+
+    if not hass.services.has_service(DOMAIN, "import_history"):
+        hass.services.async_register(
+            DOMAIN,
+            "import_history",
+            async_handle_import_history,
+            schema=vol.Schema({vol.Required("instance_name"): str}),
+            supports_response=SupportsResponse.OPTIONAL,
+        )
+
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
@@ -232,6 +455,12 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
          _LOGGER.debug(f"No upload task listener found to cancel for instance: {instance_name}")
 
 
+    # --- Stop the Upload Queue Retry Timer ---
+    upload_queue = hass.data.get(DOMAIN, {}).get("upload_queues", {}).pop(instance_name, None)
+    if upload_queue:
+        await upload_queue.async_shutdown()
+        _LOGGER.debug(f"Stopped upload queue for instance: {instance_name}")
+
     # --- Unload Platforms ---
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
     if unload_ok:
@@ -241,6 +470,19 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         # Depending on severity, you might want to stop here
         # return False # Or attempt further cleanup
 
+    # --- Close the History Store ---
+    history = hass.data.get(DOMAIN, {}).get("history", {}).pop(instance_name, None)
+    if history:
+        await history.async_close()
+        _LOGGER.debug(f"Closed history store for instance: {instance_name}")
+
+    # --- Close the Device HTTP Client ---
+    # After the platforms, the entities may still talk to the device while unloading
+    client = hass.data.get(DOMAIN, {}).get("clients", {}).pop(instance_name, None)
+    if client:
+        await client.async_close()
+        _LOGGER.debug(f"Closed HTTP client for instance: {instance_name}")
+
     # --- Clean up hass.data ---
     # Remove the sensor instance associated with this entry's instance_name
     if DOMAIN in hass.data and instance_name in hass.data[DOMAIN]:
@@ -0,0 +1,160 @@
+import logging
+import math
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+from homeassistant.core import callback
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN, AGGREGATE_RATE_TAU, AGGREGATE_REFRESH_INTERVAL, AGGREGATE_SAVE_DELAY
+
+_LOGGER = logging.getLogger(__name__)
+
+AGGREGATES_VERSION = 1
+HOUR = 3600
+
+
+class ConsumptionAggregator:
+    """
+    Incremental consumption of one meter: last hour (rolling), today, this month and a moving-average rate.
+
+    Each accepted reading costs O(1) amortized: the rolling hour is a deque of increments with a
+    running sum, day and month are counters reset on the first reading of a new period, and the
+    rate is a time-weighted exponential moving average. State is restored from storage on startup.
+    """
+
+    def __init__(self, hass, instance_name):
+        """Initialize the aggregator (call async_load before use)."""
+        self._hass = hass
+        self._instance_name = instance_name
+        self._store = Store(hass, AGGREGATES_VERSION, f"{DOMAIN}.{instance_name}.aggregates")
+        self._last_value = None
+        self._last_epoch = None
+        self._hour = deque() # (epoch, increment), oldest first
+        self._hour_total = 0.0
+        self._day = None # ISO date of the `today` counter
+        self._today = 0.0
+        self._month = None # YYYY-MM of the `month` counter
+        self._this_month = 0.0
+        self._rate = None # Per hour
+        self._listeners = []
+        self._cancel_timer = None
+
+    @property
+    def last_hour(self):
+        """Return the consumption of the last 60 minutes."""
+        return round(self._hour_total, 6)
+
+    @property
+    def today(self):
+        """Return the consumption since local midnight."""
+        return round(self._today, 6)
+
+    @property
+    def this_month(self):
+        """Return the consumption since the first day of the month."""
+        return round(self._this_month, 6)
+
+    @property
+    def rate(self):
+        """Return the moving-average consumption rate per hour, None before the second reading."""
+        return round(self._rate, 6) if self._rate is not None else None
+
+    @callback
+    def async_add_listener(self, update_callback):
+        """Register a callback run when the aggregates change, returns the remover."""
+        self._listeners.append(update_callback)
+
+        @callback
+        def _remove():
+            self._listeners.remove(update_callback)
+
+        return _remove
+
+    async def async_load(self):
+        """Restore the aggregates and start the periodic refresh (expiry of the rolling hour, new day or month)."""
+        data = await self._store.async_load() or {}
+        self._last_value = data.get("last_value")
+        self._last_epoch = data.get("last_epoch")
+        self._hour = deque(tuple(item) for item in data.get("hour", []))
+        self._hour_total = sum(increment for _epoch, increment in self._hour)
+        self._day = data.get("day")
+        self._today = data.get("today", 0.0)
+        self._month = data.get("month")
+        self._this_month = data.get("this_month", 0.0)
+        self._rate = data.get("rate")
+        self._refresh(time.time())
+        self._cancel_timer = async_track_time_interval(self._hass, self._async_timer, timedelta(seconds=AGGREGATE_REFRESH_INTERVAL))
+
+    async def async_shutdown(self):
+        """Stop the refresh timer and save the aggregates."""
+        if self._cancel_timer:
+            self._cancel_timer()
+            self._cancel_timer = None
+        await self._store.async_save(self._data())
+
+    @callback
+    def async_add_reading(self, epoch, value):
+        """Account for an accepted reading (cumulative meter value)."""
+        if self._last_value is not None and value < self._last_value:
+            # Never lower the baseline: the recovery after a misread dip would be counted twice
+            _LOGGER.debug(f"Ignoring decreasing reading {value} (last {self._last_value}) in the aggregates of {self._instance_name}")
+            return
+        if self._last_value is not None and value > self._last_value:
+            increment = value - self._last_value
+            elapsed = max(epoch - self._last_epoch, 1)
+            self._refresh(epoch)
+            self._hour.append((epoch, increment))
+            self._hour_total += increment
+            self._today += increment
+            self._this_month += increment
+            # Time-weighted EMA: a long gap weighs the new rate more
+            rate = increment * HOUR / elapsed
+            alpha = 1 - math.exp(-elapsed / AGGREGATE_RATE_TAU)
+            self._rate = rate if self._rate is None else self._rate + alpha * (rate - self._rate)
+        else:
+            self._refresh(epoch)
+        self._last_value = value
+        self._last_epoch = epoch
+        self._store.async_delay_save(self._data, AGGREGATE_SAVE_DELAY)
+        self._notify()
+
+    def _refresh(self, now):
+        """Expire the rolling hour and reset the counters of a new day or month."""
+        while self._hour and self._hour[0][0] <= now - HOUR:
+            self._hour_total -= self._hour.popleft()[1]
+        if not self._hour:
+            self._hour_total = 0.0 # Drop the float drift of the running sum
+        local = datetime.fromtimestamp(now)
+        day = local.date().isoformat()
+        month = local.strftime("%Y-%m")
+        if day != self._day:
+            self._day = day
+            self._today = 0.0
+        if month != self._month:
+            self._month = month
+            self._this_month = 0.0
+
+    async def _async_timer(self, _now):
+        self._refresh(time.time())
+        if self._last_epoch and time.time() - self._last_epoch > AGGREGATE_RATE_TAU:
+            self._rate = 0.0 if self._rate is not None else None # No reading for a while: no consumption
+        self._notify()
+
+    def _notify(self):
+        for update_callback in list(self._listeners):
+            update_callback()
+
+    def _data(self):
+        return {
+            "last_value": self._last_value,
+            "last_epoch": self._last_epoch,
+            "hour": list(self._hour),
+            "day": self._day,
+            "today": self._today,
+            "month": self._month,
+            "this_month": self._this_month,
+            "rate": self._rate,
+        }
@@ -0,0 +1,120 @@
+import bisect
+import heapq
+import itertools
+import logging
+from collections import deque
+
+from .const import (
+    ANOMALY_MAD_SCALE,
+    ANOMALY_MIN_SAMPLES,
+    DEFAULT_ANOMALY_MAD_THRESHOLD,
+    DEFAULT_ANOMALY_WINDOW,
+    DEFAULT_MAX_RATE_PER_HOUR,
+    UNIT_SCALES,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+# Verdicts of AnomalyFilter.check (None: accepted)
+UNCHANGED = "unchanged"
+DECREASE = "decrease"
+RATE = "rate"
+OUTLIER = "outlier"
+
+
+def default_max_rate(device_class, unit_of_measurement):
+    """Return the maximum plausible consumption per hour of a device class, in the unit of the meter."""
+    base_rate = DEFAULT_MAX_RATE_PER_HOUR.get(device_class)
+    if base_rate is None:
+        return None
+    return base_rate * UNIT_SCALES.get(unit_of_measurement, 1)
+
+
+def _median(sorted_values):
+    count = len(sorted_values)
+    middle = count // 2
+    if count % 2:
+        return sorted_values[middle]
+    return (sorted_values[middle - 1] + sorted_values[middle]) / 2
+
+
+def _median_absolute_deviation(sorted_values, median):
+    """
+    Return the median of |value - median| in O(n) without sorting: the deviations of the values
+    below the median, read backwards, and of the values above it are two ascending runs to merge.
+    """
+    split = bisect.bisect_left(sorted_values, median)
+    below = (median - value for value in reversed(sorted_values[:split]))
+    above = (value - median for value in sorted_values[split:])
+    count = len(sorted_values)
+    middle = count // 2
+    deviations = list(itertools.islice(heapq.merge(below, above), middle + 1))
+    if count % 2:
+        return deviations[middle]
+    return (deviations[middle - 1] + deviations[middle]) / 2
+
+
+class AnomalyFilter:
+    """
+    Plausibility filter for the raw readings of a cumulative meter.
+
+    Always rejects readings below the last accepted one. When enabled, also rejects readings
+    implying a consumption rate above max_rate (per hour), or far above the recent rates:
+    rate > median + threshold * MAD over the last `window` accepted increments.
+    The window is a fixed-size deque mirrored in a sorted list, so the cost of a reading only
+    depends on the window size (O(window) for the MAD), never on the length of the history.
+    """
+
+    def __init__(self, instance_name, enabled=False, window=DEFAULT_ANOMALY_WINDOW, mad_threshold=DEFAULT_ANOMALY_MAD_THRESHOLD, max_rate=None):
+        """Initialize the filter."""
+        self._instance_name = instance_name
+        self._enabled = enabled
+        self._mad_threshold = mad_threshold
+        self._max_rate = max_rate # Per hour in the meter unit, None or 0: no absolute limit
+        self._rates = deque(maxlen=max(window, ANOMALY_MIN_SAMPLES)) # Accepted increments as rates per hour, oldest first
+        self._sorted_rates = [] # Same values, sorted
+        self._last = None # (epoch, value) of the last accepted reading
+        self.rejected = 0
+        self.last_rejection = None # Reason of the last rejected reading
+
+    def check(self, epoch, value):
+        """Return None when the reading is plausible, otherwise the reason it must be skipped."""
+        if self._last is None:
+            return None
+        last_epoch, last_value = self._last
+        if value == last_value:
+            return UNCHANGED
+        if value < last_value:
+            return self._reject(DECREASE, f"{value} is below the last reading {last_value}")
+        if not self._enabled:
+            return None
+
+        rate = (value - last_value) * 3600 / max(epoch - last_epoch, 1)
+        if self._max_rate and rate > self._max_rate:
+            return self._reject(RATE, f"{rate:.3f}/h exceeds the maximum plausible rate {self._max_rate}/h")
+        if len(self._sorted_rates) >= ANOMALY_MIN_SAMPLES:
+            median = _median(self._sorted_rates)
+            mad = _median_absolute_deviation(self._sorted_rates, median)
+            # MAD of 0 (identical recent rates) gives no usable scale, the absolute limit still applies
+            if mad and rate > median + self._mad_threshold * ANOMALY_MAD_SCALE * mad:
+                return self._reject(OUTLIER, f"{rate:.3f}/h is an outlier (median {median:.3f}/h, MAD {mad:.3f})")
+        return None
+
+    def add(self, epoch, value):
+        """Record an accepted reading."""
+        if self._last is not None and value > self._last[1]:
+            rate = (value - self._last[1]) * 3600 / max(epoch - self._last[0], 1)
+            if len(self._rates) == self._rates.maxlen:
+                oldest = self._rates[0]
+                del self._sorted_rates[bisect.bisect_left(self._sorted_rates, oldest)]
+            self._rates.append(rate)
+            bisect.insort(self._sorted_rates, rate)
+        self._last = (epoch, value)
+
+    def _reject(self, reason, detail):
+        self.rejected += 1
+        self.last_rejection = reason
+        # Small decreases are common OCR jitter, spikes are worth a line in the log
+        level = logging.DEBUG if reason == DECREASE else logging.INFO
+        _LOGGER.log(level, f"Rejected reading of {self._instance_name}: {detail}")
+        return reason
@@ -0,0 +1,78 @@
+import logging
+import time
+
+from .const import (
+    BREAKER_BACKOFF_FACTOR,
+    BREAKER_CLOSED,
+    BREAKER_HALF_OPEN,
+    BREAKER_OPEN,
+    BREAKER_PROBE_MAX_INTERVAL,
+    DEFAULT_BREAKER_THRESHOLD,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open circuit breaker for one device.
+
+    closed: normal polling, consecutive failures are counted.
+    open: the device is considered offline, only a cheap probe runs, at an exponentially growing interval.
+    half-open: the probe answered, the next full poll decides between closed and open again.
+    """
+
+    def __init__(self, instance_name, failure_threshold=DEFAULT_BREAKER_THRESHOLD):
+        """Initialize the breaker (closed)."""
+        self._instance_name = instance_name
+        self._failure_threshold = max(1, failure_threshold)
+        self.state = BREAKER_CLOSED
+        self.consecutive_failures = 0
+        self.trips = 0 # Consecutive openings without a successful poll in between
+        self.opened_at = None # Epoch seconds of the first opening
+        self._base_interval = None # Poll interval in use when the breaker opened
+
+    @property
+    def is_open(self):
+        """Return True while polls should be replaced by a probe."""
+        return self.state == BREAKER_OPEN
+
+    def begin_probe(self):
+        """Move to half-open before probing the device."""
+        self.state = BREAKER_HALF_OPEN
+
+    def record_success(self):
+        """
+        Record a successful poll.
+        Returns the poll interval to restore when the breaker was not closed, None otherwise.
+        """
+        self.consecutive_failures = 0
+        if self.state == BREAKER_CLOSED:
+            return None
+        _LOGGER.info(f"Device {self._instance_name} is reachable again after {round(time.time() - self.opened_at)} seconds, closing circuit breaker.")
+        base_interval = self._base_interval
+        self.state = BREAKER_CLOSED
+        self.trips = 0
+        self.opened_at = None
+        self._base_interval = None
+        return base_interval
+
+    def record_failure(self, current_interval):
+        """
+        Record a failed poll or probe.
+        Returns the probe interval (seconds) when the breaker (re)opens, None while it stays closed.
+        """
+        self.consecutive_failures += 1
+        if self.state == BREAKER_CLOSED and self.consecutive_failures < self._failure_threshold:
+            return None
+
+        if self.state == BREAKER_CLOSED:
+            self._base_interval = current_interval
+            self.opened_at = time.time()
+            _LOGGER.warning(f"Device {self._instance_name} failed {self.consecutive_failures} polls in a row, opening circuit breaker.")
+        self.state = BREAKER_OPEN
+        self.trips += 1
+        backoff = int(self._base_interval * BREAKER_BACKOFF_FACTOR ** (self.trips - 1))
+        interval = max(self._base_interval, min(BREAKER_PROBE_MAX_INTERVAL, backoff)) # Never probe faster than the normal polls
+        _LOGGER.debug(f"Circuit breaker of {self._instance_name} open (trip {self.trips}), next probe in {interval} seconds.")
+        return interval
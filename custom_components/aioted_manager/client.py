@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import time
+
+import aiohttp
+
+from homeassistant.helpers.aiohttp_client import async_create_clientsession
+
+from .const import (
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_READ_TIMEOUT,
+    LATENCY_BUCKETS_MS,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class DeviceResponse:
+    """Status, headers and body of a device response."""
+
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+
+class DeviceClient:
+    """
+    HTTP client for one AI-on-the-edge device.
+
+    The ESP32 web server copes badly with concurrent requests, so every request to
+    the device waits its turn (FIFO): with a single request in flight, the
+    session keeps reusing one keep-alive connection to the device.
+    """
+
+    def __init__(self, hass, ip_address, instance_name, connect_timeout=DEFAULT_CONNECT_TIMEOUT, read_timeout=DEFAULT_READ_TIMEOUT):
+        """Initialize the client (the session is created on first use)."""
+        self._hass = hass
+        self._base_url = f"http://{ip_address}"
+        self._instance_name = instance_name
+        self._timeout = aiohttp.ClientTimeout(total=None, sock_connect=connect_timeout, sock_read=read_timeout)
+        self._session = None
+        self._lock = asyncio.Lock() # asyncio.Lock wakes waiters in arrival order
+        self._pending = 0
+        self._latency = {} # endpoint -> {"buckets": [...], "count", "errors", "max_ms", "total_ms"}
+
+    @property
+    def pending(self):
+        """Return the number of requests waiting for or using the device."""
+        return self._pending
+
+    async def async_get_json(self, endpoint, path, headers=None):
+        """GET a JSON document."""
+        return await self.async_request(endpoint, path, read="json", headers=headers)
+
+    async def async_get_bytes(self, endpoint, path):
+        """GET a binary body (images)."""
+        return (await self.async_request(endpoint, path, read="bytes")).body
+
+    async def async_get_text(self, endpoint, path, timeout=None):
+        """GET a text body."""
+        return (await self.async_request(endpoint, path, read="text", timeout=timeout)).body
+
+    async def async_request(self, endpoint, path, read="text", headers=None, timeout=None):
+        """
+        Serialized GET on the device, returns a DeviceResponse.
+        Raises aiohttp.ClientError or asyncio.TimeoutError, like the session it wraps.
+        """
+        url = f"{self._base_url}/{path}"
+        if isinstance(timeout, (int, float)):
+            timeout = aiohttp.ClientTimeout(total=timeout)
+        self._pending += 1
+        try:
+            async with self._lock:
+                start = time.monotonic()
+                failed = True
+                try:
+                    session = self._get_session()
+                    async with session.get(url, headers=headers, timeout=timeout or self._timeout) as response:
+                        response.raise_for_status()
+                        body = None
+                        if response.status != 304:
+                            if read == "json":
+                                body = await response.json(content_type=None)
+                            elif read == "bytes":
+                                body = await response.read()
+                            else:
+                                body = await response.text()
+                        failed = False
+                        return DeviceResponse(response.status, response.headers, body)
+                finally:
+                    self._record(endpoint, (time.monotonic() - start) * 1000, failed)
+        finally:
+            self._pending -= 1
+
+    def latency_histograms(self):
+        """Return the per-endpoint latency histograms (counts per upper bound in ms)."""
+        histograms = {}
+        for endpoint, stats in self._latency.items():
+            histograms[endpoint] = {
+                "count": stats["count"],
+                "errors": stats["errors"],
+                "avg_ms": round(stats["total_ms"] / stats["count"], 1) if stats["count"] else None,
+                "max_ms": round(stats["max_ms"], 1),
+                "buckets": {
+                    (f"<={bound}" if bound != float("inf") else "inf"): count
+                    for bound, count in zip(LATENCY_BUCKETS_MS, stats["buckets"])
+                },
+            }
+        return histograms
+
+    async def async_close(self):
+        """Close the session and its keep-alive connection."""
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            # Own session (closed with the entry) on Home Assistant's connector, closed by Home Assistant on shutdown
+            self._session = async_create_clientsession(self._hass, timeout=self._timeout)
+        return self._session
+
+    def _record(self, endpoint, elapsed_ms, failed):
+        stats = self._latency.get(endpoint)
+        if stats is None:
+            stats = self._latency[endpoint] = {
+                "buckets": [0] * len(LATENCY_BUCKETS_MS),
+                "count": 0,
+                "errors": 0,
+                "max_ms": 0.0,
+                "total_ms": 0.0,
+            }
+        for index, bound in enumerate(LATENCY_BUCKETS_MS):
+            if elapsed_ms <= bound:
+                stats["buckets"][index] += 1
+                break
+        stats["count"] += 1
+        stats["errors"] += int(failed)
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+        stats["total_ms"] += elapsed_ms
+        _LOGGER.debug(f"{self._instance_name} {endpoint} request took {elapsed_ms:.1f} ms{' (failed)' if failed else ''}")
@@ -18,7 +18,21 @@ from .const import (
     DEFAULT_SCAN_INTERVAL,
     # SHARED_SCHEMA, # Keep if used, but ideally define schemas locally
     DEVICE_CLASSES,
-    UNIT_OF_MEASUREMENTS
+    UNIT_OF_MEASUREMENTS,
+    UPLOAD_MODES,
+    UPLOAD_MODE_FILE,
+    DEFAULT_MIN_SCAN_INTERVAL,
+    DEFAULT_MAX_SCAN_INTERVAL,
+    DEFAULT_WATCHDOG_INTERVAL,
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_READ_TIMEOUT,
+    DEFAULT_BREAKER_THRESHOLD,
+    DEFAULT_RETENTION_MAX_MB,
+    DEFAULT_RETENTION_MAX_AGE_DAYS,
+    DEFAULT_RETENTION_ERROR_MAX_AGE_DAYS,
+    DEFAULT_ANOMALY_WINDOW,
+    DEFAULT_ANOMALY_MAD_THRESHOLD,
+    ANOMALY_MIN_SAMPLES,
 )
 
 from homeassistant.helpers import config_validation as cv
@@ -47,6 +61,18 @@ def _build_options_schema(config_entry: ConfigEntry) -> vol.Schema:
             CONF_SCAN_INTERVAL,
             default=config_entry.options.get(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL)
         ): cv.positive_int, # Use cv.positive_int for better validation
+        vol.Optional(
+            "adaptive_polling", # Poll between min and max interval depending on consumption
+            default=config_entry.options.get("adaptive_polling", False)
+        ): bool,
+        vol.Optional(
+            "min_scan_interval",
+            default=config_entry.options.get("min_scan_interval", DEFAULT_MIN_SCAN_INTERVAL)
+        ): cv.positive_int,
+        vol.Optional(
+            "max_scan_interval",
+            default=config_entry.options.get("max_scan_interval", DEFAULT_MAX_SCAN_INTERVAL)
+        ): cv.positive_int,
         vol.Optional(
             "log_as_csv",
             default=config_entry.options.get("log_as_csv", True)
@@ -69,10 +95,74 @@ def _build_options_schema(config_entry: ConfigEntry) -> vol.Schema:
             "api_key",
             default=config_entry.options.get("api_key", "")
         ): str,
+        vol.Optional(
+            "upload_mode", # file: zip on disk then upload, stream: zip built while uploading, chunked: resumable 1 MiB parts
+            default=config_entry.options.get("upload_mode", UPLOAD_MODE_FILE)
+        ): vol.In(UPLOAD_MODES),
         vol.Optional(
             "disable_error_checking", # New checkbox key
             default=config_entry.options.get("disable_error_checking", False) # Default to False (checking enabled)
         ): bool,
+        vol.Optional(
+            "push_mode", # The device posts its readings to a webhook
+            default=config_entry.options.get("push_mode", False)
+        ): bool,
+        vol.Optional(
+            "watchdog_interval", # Seconds between polls in push mode
+            default=config_entry.options.get("watchdog_interval", DEFAULT_WATCHDOG_INTERVAL)
+        ): cv.positive_int,
+        vol.Optional(
+            "connect_timeout", # Seconds to connect to the device
+            default=config_entry.options.get("connect_timeout", DEFAULT_CONNECT_TIMEOUT)
+        ): cv.positive_int,
+        vol.Optional(
+            "read_timeout", # Seconds without data from the device
+            default=config_entry.options.get("read_timeout", DEFAULT_READ_TIMEOUT)
+        ): cv.positive_int,
+        vol.Optional(
+            "breaker_threshold", # Consecutive failed polls before only probing the device
+            default=config_entry.options.get("breaker_threshold", DEFAULT_BREAKER_THRESHOLD)
+        ): cv.positive_int,
+        vol.Optional(
+            "anomaly_filter", # Reject spikes (OCR misreads) on top of decreasing readings
+            default=config_entry.options.get("anomaly_filter", False)
+        ): bool,
+        vol.Optional(
+            "anomaly_window",
+            default=config_entry.options.get("anomaly_window", DEFAULT_ANOMALY_WINDOW)
+        ): vol.All(vol.Coerce(int), vol.Range(min=ANOMALY_MIN_SAMPLES, max=500)),
+        vol.Optional(
+            "anomaly_mad_threshold",
+            default=config_entry.options.get("anomaly_mad_threshold", DEFAULT_ANOMALY_MAD_THRESHOLD)
+        ): vol.All(vol.Coerce(float), vol.Range(min=1)),
+        vol.Optional(
+            "max_rate_per_hour", # In the meter unit, 0 = default of the device class
+            default=config_entry.options.get("max_rate_per_hour", 0)
+        ): vol.All(vol.Coerce(float), vol.Range(min=0)),
+        vol.Optional(
+            "consumption_sensors", # Last hour, today, this month and rate entities
+            default=config_entry.options.get("consumption_sensors", False)
+        ): bool,
+        vol.Optional(
+            "history_store", # SQLite history for the get_history service
+            default=config_entry.options.get("history_store", False)
+        ): bool,
+        vol.Optional(
+            "additional_numbers", # Comma-separated names of the other numbers read by the device
+            default=config_entry.options.get("additional_numbers", "")
+        ): str,
+        vol.Optional(
+            "retention_max_mb", # Disk budget for the saved images, 0 = unlimited
+            default=config_entry.options.get("retention_max_mb", DEFAULT_RETENTION_MAX_MB)
+        ): vol.All(vol.Coerce(int), vol.Range(min=0)),
+        vol.Optional(
+            "retention_max_age_days", # 0 = keep forever
+            default=config_entry.options.get("retention_max_age_days", DEFAULT_RETENTION_MAX_AGE_DAYS)
+        ): vol.All(vol.Coerce(int), vol.Range(min=0)),
+        vol.Optional(
+            "retention_error_max_age_days", # _err images are usually kept longer for troubleshooting
+            default=config_entry.options.get("retention_error_max_age_days", DEFAULT_RETENTION_ERROR_MAX_AGE_DAYS)
+        ): vol.All(vol.Coerce(int), vol.Range(min=0)),
         # --- Fields below are usually part of config_entry.data and NOT options ---
         # vol.Required(
         #     "instance_name",
@@ -230,6 +320,11 @@ class MeterCollectorOptionsFlow(config_entries.OptionsFlow):
                  errors[CONF_SCAN_INTERVAL] = "invalid_scan_interval"
                  _LOGGER.error(f"Invalid scan interval format: {scan_interval}")
 
+            # Validate the adaptive polling bounds
+            if user_input.get("min_scan_interval", DEFAULT_MIN_SCAN_INTERVAL) > user_input.get("max_scan_interval", DEFAULT_MAX_SCAN_INTERVAL):
+                errors["min_scan_interval"] = "invalid_adaptive_interval"
+                _LOGGER.error(f"Minimum scan interval is above maximum scan interval: {user_input}")
+
             # Add validation for other options if needed (e.g., upload_url format)
 
             # --- Save Options if No Errors ---
@@ -1,71 +1,179 @@
-# Default values
-DOMAIN = "aioted_manager"
-DEFAULT_SCAN_INTERVAL = 300  # Default scan interval in seconds
-DEFAULT_FLOW_ROUND_TIME_WAIT = 30  # Default time in seconds to run a complete round after a flow is started
-
-### api doc : https://jomjol.github.io/AI-on-the-edge-device-docs/REST-API/
-API_flow_start = "flow_start"
-# API_setPreValue = "setPreValue?numbers" #/setPreValue?numbers={instance_name}&value{last_raw_value}
-API_reboot = "reboot"
-# API_mqtt_publish_discovery = "mqtt_publish_discovery"
-API_json = "json"
-# API_value = "value"
-# API_img_raw = "img_tmp/raw.jpg" #Capture and show a new raw image
-API_img_alg= "img_tmp/alg.jpg" #Show last aligned image
-# API_img_alg_roi= "img_tmp/alg_roi.jpg" #Show last aligned image including ROI overlay
-# API_statusflow = "statusflow" #Show the actual step of the flow incl. timestamp - Example: Take Image (15:56:34)
-# API_rssi = "rssi" #Show the WIFI signal strength (Unit: dBm) - Example: -51
-# API_cpu_temperature = "cpu_temperature" #Show the CPU temperature (Unit: °C) - Example: 38
-# API_sysinfo = "sysinfo"
-# API_starttime = "starttime" #Show starttime - Example: 20230113-154634
-# API_uptime = "uptime" #Show uptime - Example: 0d 00h 15m 50s
-# API_lighton = "lighton" #Switch the camera flashlight on 
-# API_lightoff = "lightoff" #Switch the camera flashlight off
-# API_capture = "capture" #Capture a new image (without flashlight)
-# API_capture_with_flashlight = "capture_with_flashlight" #Capture a new image with flashlight
-# API_stream = "stream"
-# API_save = "save"
-# API_log = "log"
-# API_log_html = "log.html"
-# API_heap= "heap"
-# API_metrics= "metrics"
-
-import voluptuous as vol
-
-# Define the valid options for device class and unit of measurement
-DEVICE_CLASSES = {
-    "power",
-    "water",
-    "gas",
-}
-
-UNIT_OF_MEASUREMENTS = {
-    "L",
-    "m³",
-    "ft³",
-    "CCF",
-    "gal",
-    "kW",
-    "W",
-    "MW",
-    "GW",
-    "TW",
-    "BTU/h",
-}
-
-# Define the shared schema
-# not used as setup is done in config_flow.py
-# but kept for reference and future use
-""" SHARED_SCHEMA = {
-    vol.Required("instance_name"): str,
-    vol.Required("ip"): str,
-    vol.Optional("scan_interval", default=DEFAULT_SCAN_INTERVAL): int,
-    vol.Optional("log_as_csv", default=True): bool,
-    vol.Optional("save_images", default=True): bool,
-    vol.Required("device_class"): vol.In(DEVICE_CLASSES),
-    vol.Required("unit_of_measurement"): vol.In(UNIT_OF_MEASUREMENTS),
-    vol.Optional("enable_upload", default=False): bool,
-    vol.Optional("upload_url"): str,
-    vol.Optional("api_key"): str,
-} """
-
+# Default values
+DOMAIN = "aioted_manager"
+DEFAULT_SCAN_INTERVAL = 300  # Default scan interval in seconds
+DEFAULT_FLOW_ROUND_TIMEOUT = 180  # Longest time in seconds to wait for a round started with flow_start
+DEFAULT_MAX_CONCURRENT_POLLS = 4  # Devices polled at the same time across all instances
+
+# Adaptive polling
+DEFAULT_MIN_SCAN_INTERVAL = 60  # Interval in seconds while consumption is active
+DEFAULT_MAX_SCAN_INTERVAL = 1800  # Longest interval in seconds when the reading stays flat
+ADAPTIVE_BACKOFF_FACTOR = 2  # Interval multiplier after each flat reading
+
+# Flow round completion (statusflow polling after flow_start)
+FLOW_POLL_INITIAL = 0.5  # Seconds before the first statusflow check
+FLOW_POLL_BACKOFF = 1.5  # Delay multiplier between two checks
+FLOW_POLL_MAX = 5  # Longest delay in seconds between two checks
+FLOW_STATUS_TIMEOUT = 3  # Timeout in seconds of one statusflow request
+FLOW_IDLE_STATES = ("flow finished", "wait for next round", "idle")  # statusflow prefixes of a device between rounds
+
+# Update pipeline timings
+TIMING_WINDOW = 100  # Durations kept per phase for the rolling percentiles
+
+# Push mode
+DEFAULT_WATCHDOG_INTERVAL = 1800  # Seconds between the polls catching missed pushes
+
+# CSV log writer
+CSV_FLUSH_INTERVAL = 60  # Flush buffered CSV rows at least every N seconds
+CSV_FLUSH_MAX_ROWS = 20  # Flush as soon as N rows are buffered
+CSV_MAX_BUFFERED_ROWS = 1000  # Rows kept in memory when flushing keeps failing
+CSV_ROTATE_MAX_BYTES = 10 * 1024 * 1024  # Live log size forcing a rotation before the end of the day
+
+# Upload
+UPLOAD_MODE_FILE = "file"  # Build the zip in www/<instance>/zip, then upload it
+UPLOAD_MODE_STREAM = "stream"  # Build the zip on the fly while uploading
+UPLOAD_MODE_CHUNKED = "chunked"  # Upload the zip in resumable parts
+UPLOAD_MODES = [UPLOAD_MODE_FILE, UPLOAD_MODE_STREAM, UPLOAD_MODE_CHUNKED]
+CHUNKED_UPLOAD_PART_SIZE = 1024 * 1024  # Bytes per part in chunked mode
+UPLOAD_QUEUE_BACKOFF_BASE = 60  # Seconds before the first retry of a failed archive
+UPLOAD_QUEUE_BACKOFF_MAX = 6 * 3600  # Maximum seconds between retries
+UPLOAD_QUEUE_MAX_BYTES = 512 * 1024 * 1024  # Oldest archives are dropped above this total size
+UPLOAD_SETTLE_TIME = 60  # Seconds behind the cutoff a file may still show up (temporary file renamed late)
+STREAM_CHUNK_SIZE = 64 * 1024  # Bytes per chunk handed to the HTTP body
+STREAM_QUEUE_CHUNKS = 4  # Chunks buffered between the zip builder and the request
+UPLOAD_STATUS_UPLOADED = "uploaded"  # Results of daily_upload_task
+UPLOAD_STATUS_QUEUED = "queued"  # Upload failed, the queue retries it
+UPLOAD_STATUS_PENDING = "pending"  # An earlier archive is still queued, nothing new archived
+UPLOAD_STATUS_NOTHING = "no_new_files"
+UPLOAD_STATUS_FAILED = "failed"
+
+# Fleet services (collect_data / upload_data on several instances)
+DEFAULT_FLEET_CONCURRENCY = 4  # Instances handled at the same time
+FLEET_MAX_CONCURRENCY = 32
+
+# Device HTTP client
+DEFAULT_CONNECT_TIMEOUT = 5  # Seconds to open the TCP connection to the device
+DEFAULT_READ_TIMEOUT = 10  # Seconds without data from the device before a request fails
+LATENCY_BUCKETS_MS = (25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, float("inf"))  # Request latency histogram bounds
+
+# Circuit breaker
+BREAKER_CLOSED = "closed"
+BREAKER_OPEN = "open"
+BREAKER_HALF_OPEN = "half_open"
+DEFAULT_BREAKER_THRESHOLD = 3  # Consecutive failed polls before the breaker opens
+BREAKER_BACKOFF_FACTOR = 2  # Probe interval multiplier after each failed probe
+BREAKER_PROBE_MAX_INTERVAL = 3600  # Longest interval in seconds between two probes
+BREAKER_PROBE_TIMEOUT = 3  # Seconds allowed for the probe request
+
+# Anomaly filter
+DEFAULT_ANOMALY_WINDOW = 20  # Accepted increments kept for the median / MAD
+DEFAULT_ANOMALY_MAD_THRESHOLD = 6.0  # Rejected above median + threshold * scaled MAD
+ANOMALY_MIN_SAMPLES = 5  # Increments needed before the MAD rule applies
+ANOMALY_MAD_SCALE = 1.4826  # MAD to standard deviation for normally distributed data
+# Maximum plausible consumption per hour per device class, in m³ (water, gas) or kWh (power)
+DEFAULT_MAX_RATE_PER_HOUR = {
+    "water": 5,
+    "gas": 10,
+    "power": 50,
+}
+# Conversion from the base units above to the unit of the meter
+UNIT_SCALES = {
+    "L": 1000,
+    "m³": 1,
+    "ft³": 35.3147,
+    "CCF": 0.353147,
+    "gal": 264.172,
+    "W": 1000,
+    "kW": 1,
+    "MW": 0.001,
+    "GW": 0.000001,
+    "TW": 0.000000001,
+    "BTU/h": 3412.14,
+}
+
+# Consumption aggregates
+AGGREGATE_RATE_TAU = 900  # Seconds, time constant of the moving-average rate
+AGGREGATE_REFRESH_INTERVAL = 300  # Seconds between expiries of the rolling hour without new reading
+AGGREGATE_SAVE_DELAY = 60  # Seconds the aggregates are kept in memory before being saved
+
+# Image store
+IMAGE_HASH_LENGTH = 16  # Hex digits of the SHA-256 content hash kept in image file names
+IMAGE_DEDUP_DAYS = 1  # Days of shards (besides today) indexed at startup to skip duplicate frames
+MIGRATION_BATCH_SIZE = 500  # Images moved per executor job when migrating the flat layout
+
+# History store
+HISTORY_MAX_ROWS = 5000  # Rows returned at most by the get_history service
+HISTORY_IMPORT_BATCH_SIZE = 1000  # Rows per transaction when importing CSV logs
+STATISTICS_IMPORT_BATCH_HOURS = 500  # Hourly statistics per recorder import call when backfilling
+
+# Image retention (0 disables a limit)
+DEFAULT_RETENTION_MAX_MB = 0  # Disk budget in MiB for the saved images of an instance
+DEFAULT_RETENTION_MAX_AGE_DAYS = 0  # Age after which normal images are deleted
+DEFAULT_RETENTION_ERROR_MAX_AGE_DAYS = 0  # Age after which _err images are deleted
+RETENTION_PRUNE_INTERVAL = 3600  # Seconds between two age checks when no new image arrives
+
+### api doc : https://jomjol.github.io/AI-on-the-edge-device-docs/REST-API/
+API_flow_start = "flow_start"
+# API_setPreValue = "setPreValue?numbers" #/setPreValue?numbers={instance_name}&value{last_raw_value}
+API_reboot = "reboot"
+# API_mqtt_publish_discovery = "mqtt_publish_discovery"
+API_json = "json"
+# API_value = "value"
+# API_img_raw = "img_tmp/raw.jpg" #Capture and show a new raw image
+API_img_alg= "img_tmp/alg.jpg" #Show last aligned image
+# API_img_alg_roi= "img_tmp/alg_roi.jpg" #Show last aligned image including ROI overlay
+API_statusflow = "statusflow" #Show the actual step of the flow incl. timestamp - Example: Take Image (15:56:34)
+# API_rssi = "rssi" #Show the WIFI signal strength (Unit: dBm) - Example: -51
+# API_cpu_temperature = "cpu_temperature" #Show the CPU temperature (Unit: °C) - Example: 38
+# API_sysinfo = "sysinfo"
+# API_starttime = "starttime" #Show starttime - Example: 20230113-154634
+# API_uptime = "uptime" #Show uptime - Example: 0d 00h 15m 50s
+# API_lighton = "lighton" #Switch the camera flashlight on 
+# API_lightoff = "lightoff" #Switch the camera flashlight off
+# API_capture = "capture" #Capture a new image (without flashlight)
+# API_capture_with_flashlight = "capture_with_flashlight" #Capture a new image with flashlight
+# API_stream = "stream"
+# API_save = "save"
+# API_log = "log"
+# API_log_html = "log.html"
+# API_heap= "heap"
+# API_metrics= "metrics"
+
+import voluptuous as vol
+
+# Define the valid options for device class and unit of measurement
+DEVICE_CLASSES = {
+    "power",
+    "water",
+    "gas",
+}
+
+UNIT_OF_MEASUREMENTS = {
+    "L",
+    "m³",
+    "ft³",
+    "CCF",
+    "gal",
+    "kW",
+    "W",
+    "MW",
+    "GW",
+    "TW",
+    "BTU/h",
+}
+
+# Define the shared schema
+# not used as setup is done in config_flow.py
+# but kept for reference and future use
+""" SHARED_SCHEMA = {
+    vol.Required("instance_name"): str,
+    vol.Required("ip"): str,
+    vol.Optional("scan_interval", default=DEFAULT_SCAN_INTERVAL): int,
+    vol.Optional("log_as_csv", default=True): bool,
+    vol.Optional("save_images", default=True): bool,
+    vol.Required("device_class"): vol.In(DEVICE_CLASSES),
+    vol.Required("unit_of_measurement"): vol.In(UNIT_OF_MEASUREMENTS),
+    vol.Optional("enable_upload", default=False): bool,
+    vol.Optional("upload_url"): str,
+    vol.Optional("api_key"): str,
+} """
+
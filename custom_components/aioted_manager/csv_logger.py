@@ -0,0 +1,285 @@
+import asyncio
+import csv
+import gzip
+import logging
+import os
+import re
+import shutil
+import time
+from datetime import date, timedelta
+
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+from homeassistant.helpers.event import async_track_time_interval
+
+from .const import CSV_FLUSH_INTERVAL, CSV_FLUSH_MAX_ROWS, CSV_MAX_BUFFERED_ROWS, CSV_ROTATE_MAX_BYTES
+from .image_store import iter_shard_files, shard_dir
+
+_LOGGER = logging.getLogger(__name__)
+
+CSV_HEADER = [
+    "Timestamp",
+    "Value",
+    "Raw Value",
+    "Pre",
+    "Error",
+    "Rate",
+    "Timestamp (JSON)"
+]
+
+# Closed log segment: YYYY/MM/DD/log_<epoch of its first row>.csv.gz, in the shard of its last row
+SEGMENT_NAME_RE = re.compile(r"^log_(\d+)\.csv\.gz$")
+
+
+def list_segments(log_dir):
+    """Return (first row epoch, path) of the closed log segments, oldest first (executor thread)."""
+    segments = [
+        (int(match.group(1)), os.path.join(log_dir, relpath))
+        for relpath, _entry, match in iter_shard_files(log_dir, SEGMENT_NAME_RE, include_flat=False)
+    ]
+    segments.sort()
+    return segments
+
+
+def _read_rows(reader, start, end):
+    for row in reader:
+        if not row or not row[0].isdigit():
+            continue # Header
+        epoch = int(row[0])
+        if (start is not None and epoch < start) or (end is not None and epoch > end):
+            continue
+        yield row
+
+
+def iter_csv_rows(log_dir, start=None, end=None, csv_name="log.csv"):
+    """
+    Yield the data rows (optionally between start and end, epoch seconds) of the closed segments
+    and then of the live log, oldest first, one row at a time (executor thread).
+    """
+    segments = list_segments(log_dir)
+    for index, (first_epoch, path) in enumerate(segments):
+        if end is not None and first_epoch > end:
+            return
+        if start is not None and index + 1 < len(segments) and segments[index + 1][0] <= start:
+            continue # Fully before the range, the next segment starts earlier than start
+        with gzip.open(path, "rt", newline="") as f:
+            yield from _read_rows(csv.reader(f), start, end)
+    live_path = os.path.join(log_dir, csv_name)
+    if os.path.isfile(live_path):
+        with open(live_path, newline="") as f:
+            yield from _read_rows(csv.reader(f), start, end)
+
+
+def _read_first_epoch(csv_file):
+    """Return the epoch of the first data row of a CSV log, None if it has none."""
+    with open(csv_file, newline="") as f:
+        for row in _read_rows(csv.reader(f), None, None):
+            return int(row[0])
+    return None
+
+
+class CsvLogWriter:
+    """
+    Buffered CSV log writer keeping the log file open between flushes.
+
+    The live log is rotated when a row of a new day arrives (or the file exceeds CSV_ROTATE_MAX_BYTES)
+    into a gzip segment in the date shard of its last row, so segments closed on a day are found
+    by listing the shards of that day (and the day before).
+    """
+
+    def __init__(self, hass, csv_file, instance_name, flush_interval=CSV_FLUSH_INTERVAL, max_rows=CSV_FLUSH_MAX_ROWS, rotate_max_bytes=CSV_ROTATE_MAX_BYTES, timings=None):
+        """Initialize the writer (the file is opened lazily on first flush)."""
+        self._hass = hass
+        self._csv_file = csv_file
+        self._rotating_file = f"{csv_file}.rotating" # Live log moved aside, until compressed into its segment
+        self._instance_name = instance_name
+        self._flush_interval = timedelta(seconds=flush_interval)
+        self._max_rows = max_rows
+        self._buffer = []
+        self._file = None # Open file handle, only touched from executor threads under _flush_lock
+        self._csv_writer = None
+        self._flush_lock = asyncio.Lock()
+        self._cancel_timer = None
+        self._cancel_stop_listener = None
+        self._rotate_max_bytes = rotate_max_bytes
+        self._segment_start = None # Epoch of the first row of the live log
+        self._segment_end = None # Epoch of the last row written since the live log was opened
+        self._segment_bytes = 0 # Approximate size of the live log
+        self.last_flush_duration = None # Seconds spent in the last flush (executor hop included)
+        self.rows_written = 0
+        self.segments_rotated = 0
+        self._batch_written = 0 # Rows of the batch being flushed already handed to the file
+        self._timings = timings # Optional UpdateTimings recording the executor wait of the flushes
+
+    @property
+    def buffer_depth(self):
+        """Return the number of rows waiting to be flushed."""
+        return len(self._buffer)
+
+    async def async_start(self):
+        """Start the periodic flush timer and the shutdown listener."""
+        self._cancel_timer = async_track_time_interval(self._hass, self._async_flush_timer, self._flush_interval)
+        self._cancel_stop_listener = self._hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, self._async_on_stop)
+        _LOGGER.debug(f"CSV log writer started for {self._instance_name}: {self._csv_file}")
+
+    async def async_write(self, row):
+        """Buffer a row, flushing immediately when the batch is full."""
+        self._buffer.append(row)
+        if len(self._buffer) >= self._max_rows:
+            await self.async_flush()
+
+    async def async_flush(self):
+        """Write all buffered rows to disk in a single executor job."""
+        async with self._flush_lock:
+            if not self._buffer:
+                return
+            rows, self._buffer = self._buffer, []
+            start = time.monotonic()
+            try:
+                await self._async_run_job(self._write_rows, rows)
+                self.rows_written += len(rows)
+                _LOGGER.debug(f"Flushed {len(rows)} CSV rows for {self._instance_name} to {self._csv_file}")
+            except Exception as e:
+                written = self._batch_written
+                self.rows_written += written
+                _LOGGER.error(f"Failed to flush CSV rows to {self._csv_file} for {self._instance_name} ({written} of {len(rows)} written): {e}")
+                # Keep the rows not written yet for the next flush (the others would be duplicated),
+                # but never let a broken disk grow the buffer without bound
+                self._buffer[:0] = rows[written:]
+                del self._buffer[:-CSV_MAX_BUFFERED_ROWS]
+                await self._hass.async_add_executor_job(self._close_file)
+            finally:
+                self.last_flush_duration = time.monotonic() - start
+
+    async def async_close(self):
+        """Stop the timers, flush remaining rows and close the file."""
+        if self._cancel_timer:
+            self._cancel_timer()
+            self._cancel_timer = None
+        if self._cancel_stop_listener:
+            self._cancel_stop_listener()
+            self._cancel_stop_listener = None
+        await self.async_flush()
+        async with self._flush_lock:
+            await self._hass.async_add_executor_job(self._close_file)
+        _LOGGER.debug(f"CSV log writer closed for {self._instance_name}")
+
+    async def async_rotate_if_due(self):
+        """Flush, then close the live log into a segment if it holds rows of an earlier day."""
+        await self.async_flush()
+        async with self._flush_lock:
+            try:
+                await self._hass.async_add_executor_job(self._rotate_if_stale, int(time.time()))
+            except Exception as e:
+                _LOGGER.error(f"Failed to rotate CSV log {self._csv_file} for {self._instance_name}: {e}")
+
+    async def _async_run_job(self, target, *args):
+        if self._timings:
+            return await self._timings.async_add_executor_job(self._hass, target, *args)
+        return await self._hass.async_add_executor_job(target, *args)
+
+    async def _async_flush_timer(self, _now):
+        """Flush on the periodic timer, rotating after midnight even when no reading arrives."""
+        await self.async_rotate_if_due()
+
+    async def _async_on_stop(self, _event):
+        """Flush and close when Home Assistant stops."""
+        self._cancel_stop_listener = None # Listener already fired, must not be removed again
+        await self.async_close()
+
+    def _write_rows(self, rows):
+        """
+        Write rows to the open CSV file, rotating first when a row starts a new segment (executor thread).
+        _batch_written counts the rows written, so a failure in the middle of the batch only requeues the rest.
+        """
+        self._batch_written = 0
+        for row in rows:
+            if self._file is None:
+                self._open_file()
+            if self._rotation_due(int(row[0])):
+                self._rotate()
+                self._open_file()
+            if self._segment_start is None:
+                self._segment_start = int(row[0])
+            self._segment_end = int(row[0])
+            self._csv_writer.writerow(row)
+            self._batch_written += 1
+            self._segment_bytes += sum(len(str(value)) for value in row) + len(row) + 1
+        self._file.flush()
+
+    def _open_file(self):
+        """Open (or create) the live log and read where its segment starts (executor thread)."""
+        os.makedirs(os.path.dirname(self._csv_file), exist_ok=True)
+        file_exists = os.path.isfile(self._csv_file) and os.path.getsize(self._csv_file) > 0
+        self._segment_start = _read_first_epoch(self._csv_file) if file_exists else None
+        self._segment_bytes = os.path.getsize(self._csv_file) if file_exists else 0
+        self._segment_end = None
+        self._file = open(self._csv_file, "a", newline="")
+        self._csv_writer = csv.writer(self._file)
+        if not file_exists:
+            self._csv_writer.writerow(CSV_HEADER)
+
+    def _rotation_due(self, epoch):
+        if self._segment_start is None:
+            return False
+        if date.fromtimestamp(epoch) != date.fromtimestamp(self._segment_start):
+            return True
+        return self._segment_bytes >= self._rotate_max_bytes
+
+    def _rotate_if_stale(self, now):
+        """Rotate the live log if its first row is from an earlier day (executor thread)."""
+        if os.path.isfile(self._rotating_file):
+            self._compress_rotating() # Retry a rotation that failed after moving the live log aside
+        if self._file is None:
+            if not os.path.isfile(self._csv_file) or os.path.getsize(self._csv_file) == 0:
+                return
+            self._segment_start = _read_first_epoch(self._csv_file)
+        if self._segment_start is not None and date.fromtimestamp(now) != date.fromtimestamp(self._segment_start):
+            self._rotate()
+
+    def _rotate(self):
+        """Move the live log aside, compress it into its segment and start an empty one (executor thread)."""
+        self._close_file()
+        if os.path.isfile(self._rotating_file):
+            self._compress_rotating() # Never overwrite an earlier log still waiting for compression
+        # Last row unknown for a log reopened without new rows: use the rotation time
+        segment_start, segment_end = self._segment_start, self._segment_end or int(time.time())
+        # Moved aside first: whatever fails afterwards, new rows go to a new live log and never to an archived one
+        os.replace(self._csv_file, self._rotating_file)
+        os.utime(self._rotating_file, (segment_end, segment_end)) # A retry finds the same shard
+        self._segment_start = None
+        self._segment_end = None
+        self._segment_bytes = 0
+        self._compress_rotating(segment_start, segment_end)
+
+    def _compress_rotating(self, segment_start=None, segment_end=None):
+        """
+        Compress the moved-aside live log into its segment, then delete it (executor thread).
+        Without start and end (retry), they are read from the file and its modification time,
+        so a retry after a failed delete rewrites the same segment instead of adding a second one.
+        """
+        if segment_start is None:
+            segment_start = _read_first_epoch(self._rotating_file)
+        if segment_end is None:
+            segment_end = int(os.path.getmtime(self._rotating_file))
+        if segment_start is None:
+            os.remove(self._rotating_file) # Header only
+            return
+        segment_path = os.path.join(os.path.dirname(self._csv_file), shard_dir(segment_end), f"log_{segment_start}.csv.gz")
+        os.makedirs(os.path.dirname(segment_path), exist_ok=True)
+        tmp_path = f"{segment_path}.tmp"
+        with open(self._rotating_file, "rb") as src, gzip.open(tmp_path, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(tmp_path, segment_path)
+        os.remove(self._rotating_file)
+        self.segments_rotated += 1
+        _LOGGER.info(f"Rotated CSV log of {self._instance_name} into {segment_path}")
+
+    def _close_file(self):
+        """Close the CSV file if it is open (executor thread)."""
+        if self._file is not None:
+            try:
+                self._file.close()
+            except Exception as e:
+                _LOGGER.error(f"Failed to close CSV file {self._csv_file}: {e}")
+            self._file = None
+            self._csv_writer = None
@@ -0,0 +1,43 @@
+from homeassistant.components.diagnostics import async_redact_data
+
+from .const import DOMAIN
+
+# Credentials and network details of the user's setup
+TO_REDACT = {"api_key", "upload_url", "ip"}
+
+
+async def async_get_config_entry_diagnostics(hass, entry):
+    """Return the diagnostics of a config entry: pipeline timings, HTTP latency, schedule and queues."""
+    instance_name = entry.data["instance_name"]
+    domain_data = hass.data.get(DOMAIN, {})
+    sensor = domain_data.get(instance_name)
+    client = domain_data.get("clients", {}).get(instance_name)
+    scheduler = domain_data.get("scheduler")
+    upload_queue = domain_data.get("upload_queues", {}).get(instance_name)
+    history = domain_data.get("history", {}).get(instance_name)
+
+    return {
+        "entry": {
+            "data": async_redact_data(dict(entry.data), TO_REDACT),
+            "options": async_redact_data(dict(entry.options), TO_REDACT),
+        },
+        "sensor": {
+            "available": sensor.available,
+            "attributes": async_redact_data(dict(sensor.extra_state_attributes), TO_REDACT),
+        } if sensor else None,
+        # Where the time of a poll goes: Wi-Fi (fetch_*), storage (store_image, save_csv), event loop (write_state, executor_wait)
+        "timings": sensor.timings.as_dict() if sensor else None,
+        "number_timings": {follower.unique_id: follower.timings.as_dict() for follower in sensor.followers} if sensor else None,
+        "http": {
+            "pending_requests": client.pending,
+            "latency_ms": client.latency_histograms(),
+        } if client else None,
+        "schedule": scheduler.snapshot()["jobs"].get(instance_name) if scheduler else None,
+        "scheduler_max_concurrent": scheduler.snapshot()["max_concurrent"] if scheduler else None,
+        "upload_queue": {
+            "depth": upload_queue.depth,
+            "queued_bytes": upload_queue.queued_bytes,
+            "oldest_pending_age": upload_queue.oldest_pending_age,
+        } if upload_queue else None,
+        "history_buffer_depth": history.buffer_depth if history else None,
+    }
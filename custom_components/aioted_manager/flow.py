@@ -0,0 +1,65 @@
+import asyncio
+import logging
+import time
+
+from .const import (
+    API_flow_start,
+    API_statusflow,
+    DEFAULT_FLOW_ROUND_TIMEOUT,
+    FLOW_IDLE_STATES,
+    FLOW_POLL_BACKOFF,
+    FLOW_POLL_INITIAL,
+    FLOW_POLL_MAX,
+    FLOW_STATUS_TIMEOUT,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def is_flow_idle(status):
+    """Return True if a statusflow answer (e.g. "Flow finished (15:56:34)") means the device is between rounds."""
+    return (status or "").strip().lower().startswith(FLOW_IDLE_STATES)
+
+
+async def _async_status(client):
+    """Return the statusflow answer, None if the device did not answer."""
+    try:
+        return (await client.async_get_text(API_statusflow, API_statusflow, timeout=FLOW_STATUS_TIMEOUT)).strip()
+    except Exception as e:
+        _LOGGER.debug(f"statusflow request failed: {e}")
+        return None
+
+
+async def async_run_flow_round(client, instance_name, timeout=DEFAULT_FLOW_ROUND_TIMEOUT):
+    """
+    Start a round with flow_start and wait until statusflow reports it finished.
+
+    statusflow is checked with a growing delay (0.5 s up to 5 s), so a fast device is read
+    as soon as its round ends and a slow one is not flooded. The round is complete when the
+    device is idle again after having been seen busy, or when its idle status (which carries
+    the time of the last round) differs from the one before the trigger. Without that status
+    (the device did not answer twice), only an idle status after a busy one completes the round.
+    Returns the round duration in seconds, raises TimeoutError after `timeout` seconds.
+    """
+    before = await _async_status(client)
+    if before is None:
+        before = await _async_status(client) # Busy devices sometimes drop a request
+    started = time.monotonic()
+    await client.async_request(API_flow_start, API_flow_start)
+    _LOGGER.debug(f"Flow started on {instance_name} (status before: {before})")
+
+    delay = FLOW_POLL_INITIAL
+    seen_busy = False
+    async with asyncio.timeout(timeout):
+        while True:
+            await asyncio.sleep(delay)
+            delay = min(delay * FLOW_POLL_BACKOFF, FLOW_POLL_MAX)
+            status = await _async_status(client)
+            if status is None:
+                continue # Busy devices sometimes drop a request, keep waiting
+            if not is_flow_idle(status):
+                seen_busy = True
+            elif seen_busy or (before is not None and status != before):
+                elapsed = time.monotonic() - started
+                _LOGGER.debug(f"Flow round of {instance_name} finished in {elapsed:.1f}s ({status})")
+                return elapsed
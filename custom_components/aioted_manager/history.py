@@ -0,0 +1,235 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+from homeassistant.helpers.event import async_track_time_interval
+
+from .const import (
+    DOMAIN,
+    CSV_FLUSH_INTERVAL,
+    CSV_FLUSH_MAX_ROWS,
+    CSV_MAX_BUFFERED_ROWS,
+    HISTORY_IMPORT_BATCH_SIZE,
+    HISTORY_MAX_ROWS,
+)
+from .csv_logger import iter_csv_rows
+
+_LOGGER = logging.getLogger(__name__)
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS readings (
+        ha_ts INTEGER NOT NULL PRIMARY KEY,
+        device_ts INTEGER,
+        value REAL,
+        raw REAL,
+        pre REAL,
+        error TEXT,
+        rate REAL
+    )""",
+    "CREATE INDEX IF NOT EXISTS readings_device_ts ON readings (device_ts)",
+)
+INSERT_SQL = "INSERT OR IGNORE INTO readings (ha_ts, device_ts, value, raw, pre, error, rate) VALUES (?, ?, ?, ?, ?, ?, ?)"
+COLUMNS = ("ha_ts", "device_ts", "value", "raw", "pre", "error", "rate")
+TIME_COLUMNS = {"ha": "ha_ts", "device": "device_ts"}
+
+
+def history_db_path(hass, instance_name):
+    """Return the history database of an instance (kept out of www, which is served publicly)."""
+    return hass.config.path(".storage", f"{DOMAIN}.{instance_name}.history.db")
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_device_timestamp(timestamp):
+    """Return the epoch of a device JSON timestamp (e.g. 2024-05-01T12:34:56+0200), None if unparsable."""
+    if not timestamp:
+        return None
+    try:
+        return int(datetime.fromisoformat(str(timestamp)).timestamp())
+    except ValueError:
+        return None
+
+
+def history_row(ha_ts, values):
+    """Build a history row from the values extracted from the device JSON."""
+    return (
+        int(ha_ts),
+        parse_device_timestamp(values.get("timestamp")),
+        _to_float(values.get("value")),
+        _to_float(values.get("raw_value")),
+        _to_float(values.get("pre")),
+        values.get("error_value"),
+        _to_float(values.get("rate")),
+    )
+
+
+def csv_history_row(row):
+    """Build a history row from a log.csv row, None for the header or a malformed row."""
+    if len(row) < 7 or not row[0].isdigit():
+        return None
+    return history_row(row[0], {
+        "value": row[1],
+        "raw_value": row[2],
+        "pre": row[3],
+        "error_value": row[4],
+        "rate": row[5],
+        "timestamp": row[6],
+    })
+
+
+class HistoryStore:
+    """
+    Per-instance SQLite (WAL) store of the readings, indexed by HA and device timestamp.
+
+    Rows are buffered and inserted in batches from the executor, like the CSV log.
+    One connection per store, serialized by a thread lock.
+    """
+
+    def __init__(self, hass, db_path, instance_name, flush_interval=CSV_FLUSH_INTERVAL, max_rows=CSV_FLUSH_MAX_ROWS):
+        """Initialize the store (call async_start before use)."""
+        self._hass = hass
+        self._db_path = db_path
+        self._instance_name = instance_name
+        self._flush_interval = timedelta(seconds=flush_interval)
+        self._max_rows = max_rows
+        self._buffer = []
+        self._connection = None
+        self._db_lock = threading.Lock() # The connection is used from several executor threads
+        self._flush_lock = asyncio.Lock()
+        self._cancel_timer = None
+        self._cancel_stop_listener = None
+
+    @property
+    def buffer_depth(self):
+        """Return the number of rows waiting to be inserted."""
+        return len(self._buffer)
+
+    async def async_start(self):
+        """Open the database and start the periodic flush."""
+        await self._hass.async_add_executor_job(self._open)
+        self._cancel_timer = async_track_time_interval(self._hass, self._async_flush_timer, self._flush_interval)
+        self._cancel_stop_listener = self._hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, self._async_on_stop)
+        _LOGGER.debug(f"History store opened for {self._instance_name}: {self._db_path}")
+
+    async def async_write(self, row):
+        """Buffer a row, inserting the batch when it is full."""
+        self._buffer.append(row)
+        if len(self._buffer) >= self._max_rows:
+            await self.async_flush()
+
+    async def async_flush(self):
+        """Insert the buffered rows in one transaction."""
+        async with self._flush_lock:
+            if not self._buffer or self._connection is None:
+                return
+            rows, self._buffer = self._buffer, []
+            try:
+                await self._hass.async_add_executor_job(self._insert, rows)
+            except Exception as e:
+                _LOGGER.error(f"Failed to insert history rows for {self._instance_name}: {e}")
+                self._buffer[:0] = rows
+                del self._buffer[:-CSV_MAX_BUFFERED_ROWS]
+
+    async def async_query(self, start, end, by="ha", resolution=None, limit=HISTORY_MAX_ROWS):
+        """
+        Return the readings between start and end (epoch seconds, inclusive) as a list of dicts.
+        With a resolution (seconds), one row per bucket: the last reading of the bucket and the reading count.
+        """
+        await self.async_flush() # Include the readings still buffered
+        return await self._hass.async_add_executor_job(self._query, start, end, TIME_COLUMNS[by], resolution, min(limit, HISTORY_MAX_ROWS))
+
+    async def async_import_csv(self, log_dir):
+        """Bulk import the CSV log segments and log.csv, rows already stored are ignored. Returns (rows read, rows inserted)."""
+        await self.async_flush()
+        return await self._hass.async_add_executor_job(self._import_csv, log_dir)
+
+    async def async_close(self):
+        """Stop the timers, insert the remaining rows and close the database."""
+        if self._cancel_timer:
+            self._cancel_timer()
+            self._cancel_timer = None
+        if self._cancel_stop_listener:
+            self._cancel_stop_listener()
+            self._cancel_stop_listener = None
+        await self.async_flush()
+        async with self._flush_lock:
+            await self._hass.async_add_executor_job(self._close)
+        _LOGGER.debug(f"History store closed for {self._instance_name}")
+
+    async def _async_flush_timer(self, _now):
+        await self.async_flush()
+
+    async def _async_on_stop(self, _event):
+        self._cancel_stop_listener = None # Listener already fired, must not be removed again
+        await self.async_close()
+
+    def _open(self):
+        """Open the database in WAL mode and create the schema (executor thread)."""
+        os.makedirs(os.path.dirname(self._db_path), exist_ok=True)
+        connection = sqlite3.connect(self._db_path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL") # Readers never block the inserts
+        connection.execute("PRAGMA synchronous=NORMAL") # Safe with WAL, one fsync per checkpoint
+        with connection:
+            for statement in SCHEMA:
+                connection.execute(statement)
+        self._connection = connection
+
+    def _close(self):
+        if self._connection is not None:
+            with self._db_lock:
+                self._connection.close()
+                self._connection = None
+
+    def _insert(self, rows):
+        with self._db_lock, self._connection:
+            self._connection.executemany(INSERT_SQL, rows)
+
+    def _query(self, start, end, column, resolution, limit):
+        if resolution:
+            # SQLite returns the bare columns of the row holding MAX(), i.e. the last reading of the bucket
+            sql = (
+                f"SELECT ({column} / ?) * ? AS bucket, MAX(ha_ts), device_ts, value, raw, pre, error, rate, COUNT(*) "
+                f"FROM readings WHERE {column} BETWEEN ? AND ? GROUP BY bucket ORDER BY bucket LIMIT ?"
+            )
+            params = (int(resolution), int(resolution), start, end, limit)
+        else:
+            sql = f"SELECT {', '.join(COLUMNS)} FROM readings WHERE {column} BETWEEN ? AND ? ORDER BY {column} LIMIT ?"
+            params = (start, end, limit)
+        with self._db_lock:
+            cursor = self._connection.execute(sql, params)
+            rows = cursor.fetchall()
+        if resolution:
+            return [dict(zip(("bucket",) + COLUMNS + ("count",), row)) for row in rows]
+        return [dict(zip(COLUMNS, row)) for row in rows]
+
+    def _import_csv(self, log_dir):
+        read = inserted = 0
+        batch = []
+        for csv_row in iter_csv_rows(log_dir): # Streams across the rotated segments
+            row = csv_history_row(csv_row)
+            if row is None:
+                continue
+            batch.append(row)
+            read += 1
+            if len(batch) >= HISTORY_IMPORT_BATCH_SIZE:
+                inserted += self._insert_counted(batch)
+                batch = []
+        if batch:
+            inserted += self._insert_counted(batch)
+        _LOGGER.info(f"Imported {inserted} of {read} CSV rows from {log_dir} into the history of {self._instance_name}")
+        return read, inserted
+
+    def _insert_counted(self, rows):
+        with self._db_lock, self._connection:
+            before = self._connection.total_changes
+            self._connection.executemany(INSERT_SQL, rows)
+            return self._connection.total_changes - before
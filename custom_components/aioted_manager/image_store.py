@@ -0,0 +1,234 @@
+import hashlib
+import logging
+import os
+import re
+from datetime import date, datetime, timedelta
+
+from .const import DOMAIN, IMAGE_HASH_LENGTH, IMAGE_DEDUP_DAYS, MIGRATION_BATCH_SIZE
+
+_LOGGER = logging.getLogger(__name__)
+
+LATEST_IMAGE = "latest.jpg"
+
+# <epoch>_<raw value>_<content hash>[_err].jpg
+IMAGE_NAME_RE = re.compile(r"^(\d+)_(.+)_([0-9a-f]{%d})(_err)?\.jpg$" % IMAGE_HASH_LENGTH)
+# Any saved frame, including the <epoch>_<raw value>[_err].jpg names written before content hashing
+FRAME_NAME_RE = re.compile(r"^(\d+)_.+?(_err)?\.jpg$")
+
+
+def shard_dir(unix_epoch):
+    """Return the YYYY/MM/DD folder (relative, local date) holding the frames saved at unix_epoch."""
+    return datetime.fromtimestamp(unix_epoch).strftime("%Y/%m/%d")
+
+
+def _digit_dirs(path, width):
+    """Return the sorted sub folder names of path made of `width` digits."""
+    try:
+        with os.scandir(path) as entries:
+            return sorted(entry.name for entry in entries if len(entry.name) == width and entry.name.isdigit() and entry.is_dir())
+    except FileNotFoundError:
+        return []
+
+
+def iter_shards(image_dir, start=None, end=None):
+    """
+    Yield (date, relative folder) for the YYYY/MM/DD shards between start and end (dates, inclusive), oldest first.
+    Years and months outside the range are never listed.
+    """
+    for year in _digit_dirs(image_dir, 4):
+        if (start and int(year) < start.year) or (end and int(year) > end.year):
+            continue
+        for month in _digit_dirs(os.path.join(image_dir, year), 2):
+            if (start and (int(year), int(month)) < (start.year, start.month)) or (end and (int(year), int(month)) > (end.year, end.month)):
+                continue
+            for day in _digit_dirs(os.path.join(image_dir, year, month), 2):
+                try:
+                    shard_date = date(int(year), int(month), int(day))
+                except ValueError:
+                    continue
+                if (start and shard_date < start) or (end and shard_date > end):
+                    continue
+                yield shard_date, f"{year}/{month}/{day}"
+
+
+def iter_shard_files(image_dir, name_re, start=None, end=None, include_flat=True):
+    """
+    Yield (relative path, DirEntry, name_re match) for the matching files of the shards between start and end,
+    and for those still in the flat instance folder when include_flat is set.
+    """
+    if include_flat:
+        try:
+            with os.scandir(image_dir) as entries:
+                for entry in entries:
+                    match = name_re.match(entry.name)
+                    if match and entry.is_file():
+                        yield entry.name, entry, match
+        except FileNotFoundError:
+            return
+    for _shard_date, shard in iter_shards(image_dir, start, end):
+        with os.scandir(os.path.join(image_dir, shard)) as entries:
+            for entry in entries:
+                match = name_re.match(entry.name)
+                if match and entry.is_file():
+                    yield f"{shard}/{entry.name}", entry, match
+
+
+def iter_frames(image_dir, start=None, end=None, include_flat=True):
+    """Yield (relative path, DirEntry, FRAME_NAME_RE match) for the frames, see iter_shard_files."""
+    return iter_shard_files(image_dir, FRAME_NAME_RE, start, end, include_flat)
+
+
+def list_flat_frames(image_dir):
+    """Return the frame names still stored in the flat instance folder (executor thread)."""
+    try:
+        with os.scandir(image_dir) as entries:
+            return [entry.name for entry in entries if FRAME_NAME_RE.match(entry.name) and entry.is_file()]
+    except FileNotFoundError:
+        return []
+
+
+async def async_migrate_flat_layout(hass, image_dir, instance_name):
+    """
+    One-time move of the frames of the flat layout into date shards, in small executor batches
+    so a folder with hundreds of thousands of files never holds an executor thread for long.
+    Nothing to do (a single listing of the top folder) once migrated.
+    """
+    names = await hass.async_add_executor_job(list_flat_frames, image_dir)
+    if not names:
+        return 0
+    _LOGGER.info(f"Moving {len(names)} images of {instance_name} into the YYYY/MM/DD layout")
+    moved = 0
+    for index in range(0, len(names), MIGRATION_BATCH_SIZE):
+        moved += await hass.async_add_executor_job(migrate_flat_frames, image_dir, names[index:index + MIGRATION_BATCH_SIZE])
+    _LOGGER.info(f"Moved {moved} images of {instance_name} into the YYYY/MM/DD layout")
+    return moved
+
+
+def migrate_flat_frames(image_dir, names):
+    """Move frames from the flat instance folder into their date shard (executor thread). Returns the number moved."""
+    moved = 0
+    for name in names:
+        target_dir = os.path.join(image_dir, shard_dir(int(FRAME_NAME_RE.match(name).group(1))))
+        try:
+            os.makedirs(target_dir, exist_ok=True)
+            os.replace(os.path.join(image_dir, name), os.path.join(target_dir, name))
+            moved += 1
+        except FileNotFoundError:
+            pass # Deleted meanwhile
+        except OSError as e:
+            _LOGGER.warning(f"Could not move {name} into {target_dir}: {e}")
+    return moved
+
+
+def instance_www_dir(instance_name):
+    """Return the www/aioted_manager/<instance> folder holding images, logs and archives."""
+    return os.path.abspath(os.path.join(os.path.dirname(__file__), f"../../www/{DOMAIN}", instance_name))
+
+
+def image_digest(image_data):
+    """Return the content hash used in image file names."""
+    return hashlib.sha256(image_data).hexdigest()[:IMAGE_HASH_LENGTH]
+
+
+class ImageStore:
+    """Content-addressed image store for one instance directory.
+
+    Frames are named after their content hash and written to a YYYY/MM/DD shard, identical
+    frames of the last IMAGE_DEDUP_DAYS days are written only once and latest.jpg (top level)
+    is an atomically swapped hardlink to the last stored frame.
+    """
+
+    def __init__(self, hass, image_dir, instance_name, timings=None):
+        """Initialize the store."""
+        self._hass = hass
+        self._timings = timings # Optional UpdateTimings recording the executor wait of the writes
+        self._image_dir = image_dir
+        self._instance_name = instance_name
+        self._files_by_digest = {} # digest -> path of the stored frame, relative to image_dir
+        self._latest_digest = None # Digest latest.jpg currently points to
+        self._loaded = False
+
+    async def async_load(self):
+        """Index the frames already on disk (executor job, done once)."""
+        if self._loaded:
+            return
+        self._files_by_digest = await self._hass.async_add_executor_job(self._scan)
+        self._loaded = True
+        _LOGGER.debug(f"Indexed {len(self._files_by_digest)} stored images for {self._instance_name}")
+
+    @property
+    def latest_digest(self):
+        """Return the digest of the frame latest.jpg points to."""
+        return self._latest_digest
+
+    def forget(self, filename):
+        """Drop a file (path relative to image_dir) from the index (called when the file is deleted)."""
+        match = IMAGE_NAME_RE.match(os.path.basename(filename))
+        if match and self._files_by_digest.get(match.group(3)) == filename:
+            del self._files_by_digest[match.group(3)]
+            if self._latest_digest == match.group(3):
+                self._latest_digest = None
+
+    async def async_store(self, image_data, unix_epoch, raw_value, is_error):
+        """Store a frame and point latest.jpg to it.
+
+        Returns a tuple (path relative to image_dir, written) where written is False for a duplicate frame.
+        """
+        if not self._loaded:
+            await self.async_load()
+
+        digest = image_digest(image_data)
+        existing = self._files_by_digest.get(digest)
+        if existing:
+            if self._latest_digest != digest:
+                await self._async_run_job(self._link_latest, existing)
+                self._latest_digest = digest
+            _LOGGER.debug(f"Skipping duplicate frame for {self._instance_name}, same content as {existing}")
+            return existing, False
+
+        suffix = "_err.jpg" if is_error else ".jpg"
+        filename = f"{shard_dir(unix_epoch)}/{unix_epoch}_{raw_value}_{digest}{suffix}"
+        await self._async_run_job(self._write_frame, filename, image_data)
+        self._files_by_digest[digest] = filename
+        self._latest_digest = digest
+        return filename, True
+
+    async def _async_run_job(self, target, *args):
+        if self._timings:
+            return await self._timings.async_add_executor_job(self._hass, target, *args)
+        return await self._hass.async_add_executor_job(target, *args)
+
+    def _scan(self):
+        """Return the digest index for the frames of the recent shards (executor thread)."""
+        index = {}
+        start = date.today() - timedelta(days=IMAGE_DEDUP_DAYS)
+        for relpath, _entry, _match in iter_frames(self._image_dir, start=start, include_flat=False):
+            match = IMAGE_NAME_RE.match(os.path.basename(relpath))
+            if match:
+                index[match.group(3)] = relpath
+        return index
+
+    def _write_frame(self, filename, image_data):
+        """Write a new frame atomically and link latest.jpg to it (executor thread)."""
+        path = os.path.join(self._image_dir, filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as imgfile:
+            imgfile.write(image_data)
+        os.replace(tmp_path, path)
+        self._link_latest(filename)
+
+    def _link_latest(self, filename):
+        """Atomically point latest.jpg to a stored frame (executor thread)."""
+        path = os.path.join(self._image_dir, filename)
+        latest_path = os.path.join(self._image_dir, LATEST_IMAGE)
+        tmp_latest = f"{latest_path}.tmp"
+        try:
+            if os.path.lexists(tmp_latest):
+                os.remove(tmp_latest)
+            os.link(path, tmp_latest)
+        except OSError:
+            # Filesystem without hardlink support, fall back to a copy
+            with open(path, "rb") as src, open(tmp_latest, "wb") as dst:
+                dst.write(src.read())
+        os.replace(tmp_latest, latest_path)
@@ -0,0 +1,73 @@
+import logging
+
+from aiohttp import web
+from homeassistant.components import webhook
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+# Keys of a single reading, as published by the firmware on its MQTT <number>/json topic
+READING_KEYS = ("value", "raw")
+
+
+def push_webhook_id(config_entry):
+    """Return the webhook id of a config entry (the entry id is random, so the id is not guessable)."""
+    return f"{DOMAIN}_{config_entry.entry_id}"
+
+
+def parse_push_payload(payload, number):
+    """
+    Return (data, number) for a pushed payload, data shaped like the /json answer.
+
+    A full /json answer ({number: reading, ...}) is returned as is with number None (all numbers).
+    A single reading (MQTT json topic) is wrapped under `number`. Returns (None, None) otherwise.
+    """
+    if not isinstance(payload, dict) or not payload:
+        return None, None
+    if any(key in payload for key in READING_KEYS):
+        return {number: payload}, number
+    if all(isinstance(reading, dict) for reading in payload.values()):
+        return payload, None
+    return None, None
+
+
+def async_register_push_webhook(hass, config_entry):
+    """Register the webhook receiving the readings pushed by the device, returns the unregister callback."""
+    instance_name = config_entry.data["instance_name"]
+    webhook_id = push_webhook_id(config_entry)
+
+    async def _async_handle_webhook(hass, webhook_id, request):
+        sensor = hass.data[DOMAIN].get(instance_name)
+        if sensor is None:
+            return web.Response(status=503, text="Sensor not ready")
+        try:
+            payload = await request.json()
+        except ValueError:
+            return web.Response(status=400, text="Invalid JSON")
+        data, number = parse_push_payload(payload, request.query.get("number", instance_name))
+        if data is None:
+            return web.Response(status=400, text="No reading in payload")
+        if number is not None and number not in sensor.numbers:
+            _LOGGER.warning(f"Reading pushed for unknown number {number} of {instance_name}, known numbers: {', '.join(sensor.numbers)}")
+            return web.Response(status=404, text="Unknown number")
+        _LOGGER.debug(f"Reading pushed for {instance_name} ({number or 'all numbers'})")
+        # Answer right away, the image download must not hold the device's request
+        hass.async_create_task(sensor.async_push_json(data, number), f"{DOMAIN}_{instance_name}_push")
+        return web.Response(text="OK")
+
+    webhook.async_register(
+        hass,
+        DOMAIN,
+        f"AIOTED {instance_name}",
+        webhook_id,
+        _async_handle_webhook,
+        local_only=True, # Devices live on the local network
+        allowed_methods=("POST", "PUT"),
+    )
+    _LOGGER.info(f"Push mode enabled for {instance_name}, readings are accepted on {webhook.async_generate_path(webhook_id)}")
+
+    def _unregister():
+        webhook.async_unregister(hass, webhook_id)
+
+    return _unregister
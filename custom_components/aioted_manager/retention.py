@@ -0,0 +1,199 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from datetime import timedelta
+
+from homeassistant.helpers.event import async_track_time_interval
+
+from .const import RETENTION_PRUNE_INTERVAL
+from .image_store import iter_frames
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class _IndexedImage:
+    """A stored frame known to the retention index."""
+
+    __slots__ = ("epoch", "size", "filename")
+
+    def __init__(self, epoch, size, filename):
+        self.epoch = epoch
+        self.size = size
+        self.filename = filename
+
+
+def _remove_images(image_dir, filenames):
+    """
+    Delete frames (paths relative to image_dir), ignoring files that are already gone,
+    then the shard folders left empty. Returns the paths actually deleted (executor thread).
+    """
+    removed = []
+    folders = set()
+    for filename in filenames:
+        try:
+            os.remove(os.path.join(image_dir, filename))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            _LOGGER.warning(f"Could not delete {filename}: {e}")
+            continue
+        removed.append(filename)
+        folders.add(os.path.dirname(filename))
+    # Deepest first: day, then month, then year folders
+    for folder in sorted(folders, reverse=True):
+        while folder:
+            try:
+                os.rmdir(os.path.join(image_dir, folder))
+            except OSError:
+                break # Not empty
+            folder = os.path.dirname(folder)
+    return removed
+
+
+class RetentionManager:
+    """
+    Disk budget for the saved images of one instance.
+
+    Frames are indexed once at startup, then kept in two time-ordered deques (normal and _err
+    frames) so each prune only looks at the oldest entries. Limits: total bytes (normal frames
+    are evicted before _err frames) and maximum age, with a separate age for _err frames.
+    A limit of 0 disables it.
+    """
+
+    def __init__(self, hass, image_store, image_dir, instance_name, max_bytes=0, max_age_days=0, error_max_age_days=0):
+        """Initialize the manager (call async_start before use)."""
+        self._hass = hass
+        self._image_store = image_store
+        self._image_dir = image_dir
+        self._instance_name = instance_name
+        self._max_bytes = max_bytes
+        self._max_age = max_age_days * 86400
+        self._error_max_age = error_max_age_days * 86400
+        self._images = deque() # Normal frames, oldest first
+        self._error_images = deque() # _err frames, oldest first
+        self._total_bytes = 0
+        self._pruned_files = 0
+        self._loaded = False
+        self._added_while_loading = [] # Frames written while the startup scan runs
+        self._prune_lock = asyncio.Lock()
+        self._cancel_timer = None
+
+    @property
+    def enabled(self):
+        """Return True if at least one limit is set."""
+        return bool(self._max_bytes or self._max_age or self._error_max_age)
+
+    @property
+    def total_bytes(self):
+        """Return the size of the indexed frames."""
+        return self._total_bytes
+
+    @property
+    def image_count(self):
+        """Return the number of indexed frames."""
+        return len(self._images) + len(self._error_images)
+
+    @property
+    def pruned_files(self):
+        """Return the number of frames deleted since startup."""
+        return self._pruned_files
+
+    async def async_start(self):
+        """Build the index, prune once and start the periodic age check."""
+        if not self.enabled:
+            return
+        images = await self._hass.async_add_executor_job(self._scan)
+        for image, is_error in images:
+            self._append(image, is_error)
+        # The scan may or may not have listed the frames written meanwhile
+        scanned = {image.filename for image, _is_error in images}
+        for image, is_error in self._added_while_loading:
+            if image.filename not in scanned:
+                self._append(image, is_error)
+        self._added_while_loading = []
+        self._loaded = True
+        _LOGGER.debug(f"Retention index of {self._instance_name}: {self.image_count} frames, {self._total_bytes} bytes")
+        # Age limits must apply even when no new frame arrives
+        self._cancel_timer = async_track_time_interval(self._hass, self._async_timer, timedelta(seconds=RETENTION_PRUNE_INTERVAL))
+        await self.async_prune()
+
+    async def async_stop(self):
+        """Stop the periodic age check."""
+        if self._cancel_timer:
+            self._cancel_timer()
+            self._cancel_timer = None
+
+    async def async_add(self, filename, unix_epoch, size, is_error):
+        """Index a newly written frame and prune if a limit is exceeded."""
+        if not self.enabled:
+            return
+        image = _IndexedImage(unix_epoch, size, filename)
+        if not self._loaded:
+            self._added_while_loading.append((image, is_error)) # Indexed once the scan is done
+            return
+        self._append(image, is_error)
+        await self.async_prune()
+
+    async def async_prune(self):
+        """Delete the frames exceeding the age and byte limits, oldest first."""
+        if not self._loaded:
+            return
+        async with self._prune_lock:
+            victims = self._select_victims(time.time())
+            if not victims:
+                return
+            removed = set(await self._hass.async_add_executor_job(_remove_images, self._image_dir, [image.filename for image, _is_error in victims]))
+            for image, is_error in victims:
+                if image.filename in removed:
+                    self._image_store.forget(image.filename)
+                    self._pruned_files += 1
+                else:
+                    self._append(image, is_error) # Still on disk: keep counting it and retry on the next prune
+            _LOGGER.debug(f"Retention pruned {len(removed)} frames of {self._instance_name}, {self._total_bytes} bytes left")
+
+    def _select_victims(self, now):
+        """
+        Pop the frames to delete from the index as (image, is_error) (the deletion itself runs in the executor,
+        frames it could not delete are put back).
+        """
+        victims = []
+        for images, max_age, is_error in ((self._images, self._max_age, False), (self._error_images, self._error_max_age, True)):
+            while max_age and images and images[0].epoch < now - max_age:
+                victims.append((self._pop(images), is_error))
+        # Byte budget: normal frames go first, _err frames only once no normal frame is left
+        while self._max_bytes and self._total_bytes > self._max_bytes:
+            if self.image_count <= 1:
+                break # Never delete the last frame
+            if self._images:
+                victims.append((self._pop(self._images), False))
+            else:
+                victims.append((self._pop(self._error_images), True))
+        return victims
+
+    def _append(self, image, is_error):
+        images = self._error_images if is_error else self._images
+        if images and image.epoch < images[-1].epoch:
+            # Out of order (clock change): keep the deque sorted, rare enough for a linear insert
+            index = next(i for i, other in enumerate(images) if other.epoch > image.epoch)
+            images.insert(index, image)
+        else:
+            images.append(image)
+        self._total_bytes += image.size
+
+    def _pop(self, images):
+        image = images.popleft()
+        self._total_bytes -= image.size
+        return image
+
+    def _scan(self):
+        """Return (image, is_error) for the frames on disk, oldest first (executor thread)."""
+        images = []
+        for relpath, entry, match in iter_frames(self._image_dir):
+            images.append((_IndexedImage(int(match.group(1)), entry.stat().st_size, relpath), bool(match.group(2))))
+        images.sort(key=lambda item: item[0].epoch)
+        return images
+
+    async def _async_timer(self, _now):
+        await self.async_prune()
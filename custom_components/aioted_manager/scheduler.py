@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import math
+import time
+
+from homeassistant.core import callback
+from homeassistant.helpers.event import async_call_later
+
+from .const import DOMAIN, DEFAULT_MAX_CONCURRENT_POLLS
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class _PollJob:
+    """A registered poll target."""
+
+    def __init__(self, name, interval, job):
+        self.name = name
+        self.interval = interval # Seconds
+        self.job = job # Coroutine function called without arguments
+        self.phase = 0.0 # Offset inside the interval, spread across instances sharing the interval
+        self.next_run = None # Epoch seconds
+        self.last_run = None
+        self.task = None
+
+
+class PollScheduler:
+    """
+    Integration-wide poll scheduler owned by the aioted_manager domain.
+
+    Instances sharing the same interval get evenly spread phases, a single timer
+    dispatches the due polls and a semaphore bounds how many devices are polled at once.
+    """
+
+    def __init__(self, hass, max_concurrent=DEFAULT_MAX_CONCURRENT_POLLS):
+        """Initialize the scheduler."""
+        self._hass = hass
+        self._jobs = {}
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._max_concurrent = max_concurrent
+        self._cancel_timer = None
+
+    @callback
+    def async_register(self, name, interval, job):
+        """Register (or replace) the poll job of an instance."""
+        if name in self._jobs:
+            self.async_unregister(name)
+        self._jobs[name] = _PollJob(name, interval, job)
+        self._spread_phases(interval)
+        _LOGGER.debug(f"Registered poll job {name} every {interval} seconds, next run at {self._jobs[name].next_run}")
+        self._schedule()
+
+    @callback
+    def async_unregister(self, name):
+        """Remove the poll job of an instance and cancel a running poll."""
+        poll = self._jobs.pop(name, None)
+        if poll is None:
+            return
+        if poll.task and not poll.task.done():
+            poll.task.cancel()
+        self._spread_phases(poll.interval)
+        self._schedule()
+
+    @callback
+    def async_set_interval(self, name, interval):
+        """Change the interval of an instance without disturbing the phases of the others."""
+        poll = self._jobs.get(name)
+        if poll is None or poll.interval == interval:
+            return
+        now = time.time()
+        poll.interval = interval
+        poll.next_run = max(now, (poll.last_run or now) + interval)
+        poll.phase = poll.next_run % interval # Keep the grid anchored on the new next run
+        _LOGGER.debug(f"Poll interval of {name} set to {interval} seconds, next run at {poll.next_run}")
+        self._schedule()
+
+    def interval(self, name):
+        """Return the current interval (seconds) of an instance, None if not registered."""
+        poll = self._jobs.get(name)
+        return poll.interval if poll else None
+
+    def next_run(self, name):
+        """Return the next scheduled run (epoch seconds) of an instance, None if not registered."""
+        poll = self._jobs.get(name)
+        return poll.next_run if poll else None
+
+    def snapshot(self):
+        """Return the schedule of all instances (diagnostics)."""
+        return {
+            "max_concurrent": self._max_concurrent,
+            "jobs": {
+                poll.name: {
+                    "interval": poll.interval,
+                    "phase": round(poll.phase, 3),
+                    "next_run": poll.next_run,
+                    "last_run": poll.last_run,
+                    "running": bool(poll.task and not poll.task.done()),
+                }
+                for poll in self._jobs.values()
+            },
+        }
+
+    def _spread_phases(self, interval):
+        """Spread the phases of the instances sharing an interval evenly across it."""
+        group = sorted((poll for poll in self._jobs.values() if poll.interval == interval), key=lambda poll: poll.name)
+        now = time.time()
+        for index, poll in enumerate(group):
+            poll.phase = interval * index / len(group)
+            poll.next_run = self._next_aligned(now, poll.interval, poll.phase)
+
+    @staticmethod
+    def _next_aligned(now, interval, phase):
+        """Return the first time after now matching phase modulo interval."""
+        return phase + interval * (math.floor((now - phase) / interval) + 1)
+
+    @callback
+    def _schedule(self):
+        """Arm the single timer for the earliest due job."""
+        if self._cancel_timer:
+            self._cancel_timer()
+            self._cancel_timer = None
+        if not self._jobs:
+            return
+        earliest = min(poll.next_run for poll in self._jobs.values())
+        self._cancel_timer = async_call_later(self._hass, max(0, earliest - time.time()), self._async_dispatch)
+
+    @callback
+    def _async_dispatch(self, _now):
+        """Start the due polls and re-arm the timer."""
+        self._cancel_timer = None
+        now = time.time()
+        for poll in self._jobs.values():
+            if poll.next_run > now:
+                continue
+            # Advance first so the next run stays on the phase grid even if this poll is slow
+            poll.next_run = self._next_aligned(now, poll.interval, poll.phase)
+            if poll.task and not poll.task.done():
+                _LOGGER.debug(f"Poll of {poll.name} still running, skipping this slot")
+                continue
+            poll.task = self._hass.async_create_background_task(self._async_run(poll), f"{DOMAIN}_poll_{poll.name}")
+        self._schedule()
+
+    async def _async_run(self, poll):
+        """Run a poll job under the global concurrency limit."""
+        async with self._semaphore:
+            poll.last_run = time.time()
+            try:
+                await poll.job()
+            except Exception as e:
+                _LOGGER.error(f"Scheduled poll of {poll.name} failed: {e}", exc_info=True)
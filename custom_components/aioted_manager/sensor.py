@@ -1,15 +1,41 @@
+import asyncio
 import logging
 import os
-import csv
+import time
 from datetime import datetime, timedelta
+from urllib.parse import quote
+from homeassistant.components.sensor import SensorEntity, SensorDeviceClass, SensorStateClass
+from homeassistant.const import EntityCategory, UnitOfTime
+from homeassistant.core import callback
 from homeassistant.helpers.entity import Entity
-from homeassistant.helpers.aiohttp_client import async_get_clientsession
-from homeassistant.helpers.event import async_track_time_interval
 # from homeassistant.util import Throttle
 from .const import * # Import DOMAIN and other constants
+from .aggregates import ConsumptionAggregator
+from .anomaly import UNCHANGED, AnomalyFilter, default_max_rate
+from .breaker import CircuitBreaker
+from .csv_logger import CsvLogWriter
+from .flow import async_run_flow_round
+from .history import history_row
+from .image_store import LATEST_IMAGE, ImageStore, async_migrate_flat_layout, instance_www_dir
+from .retention import RetentionManager
+from .timing import (
+    PHASES,
+    PHASE_EXECUTOR_WAIT,
+    PHASE_EXTRACT,
+    PHASE_FETCH_IMAGE,
+    PHASE_FETCH_JSON,
+    PHASE_PREVALUE,
+    PHASE_SAVE_CSV,
+    PHASE_STORE_IMAGE,
+    PHASE_UPDATE,
+    PHASE_WRITE_STATE,
+    UpdateTimings,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
+NOT_MODIFIED = object() # Returned by _fetch_json_data when the device answered 304
+
 async def async_setup_entry(hass, config_entry, async_add_entities):
     """Set up the Meter Collector sensor from a config entry."""
     _LOGGER.debug("Setting up sensor entry")
@@ -20,13 +46,38 @@ async def async_setup_entry(hass, config_entry, async_add_entities):
     scan_interval = config_entry.options.get("scan_interval", DEFAULT_SCAN_INTERVAL)
     log_as_csv = config_entry.options.get("log_as_csv", True)
     save_images = config_entry.options.get("save_images", True)
-    www_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), f"../../www/{DOMAIN}", instance_name))
+    www_dir = instance_www_dir(instance_name)
     device_class = config_entry.data["device_class"]
     unit_of_measurement = config_entry.data["unit_of_measurement"]
     enable_upload = config_entry.options.get("enable_upload", False)
     upload_url = config_entry.options.get("upload_url", "")
     api_key = config_entry.options.get("api_key", "")
+    upload_mode = config_entry.options.get("upload_mode", UPLOAD_MODE_FILE)
     disable_error_checking = config_entry.options.get("disable_error_checking", False) 
+    adaptive_polling = config_entry.options.get("adaptive_polling", False)
+    min_scan_interval = config_entry.options.get("min_scan_interval", DEFAULT_MIN_SCAN_INTERVAL)
+    max_scan_interval = config_entry.options.get("max_scan_interval", DEFAULT_MAX_SCAN_INTERVAL)
+    client = hass.data[DOMAIN]["clients"][instance_name] # Per-device HTTP client created in __init__.py
+    breaker_threshold = config_entry.options.get("breaker_threshold", DEFAULT_BREAKER_THRESHOLD)
+    anomaly_filter = config_entry.options.get("anomaly_filter", False)
+    anomaly_window = config_entry.options.get("anomaly_window", DEFAULT_ANOMALY_WINDOW)
+    anomaly_mad_threshold = config_entry.options.get("anomaly_mad_threshold", DEFAULT_ANOMALY_MAD_THRESHOLD)
+    max_rate_per_hour = config_entry.options.get("max_rate_per_hour", 0) # 0: default of the device class
+    retention_max_mb = config_entry.options.get("retention_max_mb", DEFAULT_RETENTION_MAX_MB)
+    retention_max_age_days = config_entry.options.get("retention_max_age_days", DEFAULT_RETENTION_MAX_AGE_DAYS)
+    retention_error_max_age_days = config_entry.options.get("retention_error_max_age_days", DEFAULT_RETENTION_ERROR_MAX_AGE_DAYS)
+    additional_numbers = parse_numbers(config_entry.options.get("additional_numbers", ""))
+    push_mode = config_entry.options.get("push_mode", False)
+    watchdog_interval = config_entry.options.get("watchdog_interval", DEFAULT_WATCHDOG_INTERVAL)
+
+    def _anomaly_filter(number):
+        return AnomalyFilter(
+            number,
+            enabled=anomaly_filter,
+            window=anomaly_window,
+            mad_threshold=anomaly_mad_threshold,
+            max_rate=max_rate_per_hour or default_max_rate(device_class, unit_of_measurement),
+        )
 
     # Create the www directory if it doesn't exist
     os.makedirs(www_dir, exist_ok=True)
@@ -47,9 +98,28 @@ async def async_setup_entry(hass, config_entry, async_add_entities):
         enable_upload=enable_upload,
         upload_url=upload_url,
         api_key=api_key,
+        upload_mode=upload_mode,
         disable_error_checking=disable_error_checking,
+        adaptive_polling=adaptive_polling and not push_mode, # Pushed readings set the pace
+        min_scan_interval=min_scan_interval,
+        max_scan_interval=max_scan_interval,
+        client=client,
+        breaker_threshold=breaker_threshold,
+        push_mode=push_mode,
+        watchdog_interval=watchdog_interval,
+        retention_max_mb=retention_max_mb,
+        retention_max_age_days=retention_max_age_days,
+        retention_error_max_age_days=retention_error_max_age_days,
+        anomaly_filter=_anomaly_filter(instance_name),
         config_entry=config_entry 
     )
+    # Consumption aggregates fed by the sensor, restored before its first reading
+    aggregator = None
+    if config_entry.options.get("consumption_sensors", False):
+        aggregator = ConsumptionAggregator(hass, instance_name)
+        await aggregator.async_load()
+        sensor.set_aggregator(aggregator)
+
     async_add_entities([sensor]) # Add the sensor first
     _LOGGER.debug(f"Added sensor entity for instance: {instance_name}")
 
@@ -60,21 +130,58 @@ async def async_setup_entry(hass, config_entry, async_add_entities):
     hass.data[DOMAIN][instance_name] = sensor
     _LOGGER.debug(f"Stored sensor in hass.data[{DOMAIN}][{instance_name}]")
 
-    # Set up the time-based update (cron-like)
-    # This will schedule the *next* update after the initial one in async_added_to_hass
-    async def async_update_wrapper(now):
-        """Wrapper to update the sensor data."""
-        # await sensor.async_update() ## if call by throttle
-        await sensor._async_update() # # Call the internal update method directly
+    # Diagnostic sensors for the persistent upload queue (only when upload is enabled)
+    upload_queue = hass.data[DOMAIN].get("upload_queues", {}).get(instance_name)
+    if upload_queue:
+        async_add_entities([
+            UploadQueueDepthSensor(instance_name, upload_queue),
+            UploadQueueAgeSensor(instance_name, upload_queue),
+        ])
+        _LOGGER.debug(f"Added upload queue diagnostic sensors for instance: {instance_name}")
+
+    # Other numbers of the same device: no extra requests, they follow the main sensor
+    other_instances = {entry.data.get("instance_name") for entry in hass.config_entries.async_entries(DOMAIN)}
+    followers = []
+    for number in additional_numbers:
+        if number == instance_name or number in other_instances:
+            _LOGGER.warning(f"Number {number} of {instance_name} is already configured as an instance, ignored")
+            continue
+        followers.append(MeterNumberSensor(sensor, number, _anomaly_filter(number)))
+    if followers:
+        async_add_entities(followers)
+        _LOGGER.debug(f"Added sensors for the numbers {', '.join(follower._instance_name for follower in followers)} of instance: {instance_name}")
+
+    # Per-phase update timings (diagnostic)
+    async_add_entities([UpdateTimingSensor(instance_name, sensor.timings, phase) for phase in PHASES])
+
+    if aggregator:
+        async_add_entities([
+            sensor_class(instance_name, aggregator, device_class, unit_of_measurement)
+            for sensor_class in (LastHourConsumptionSensor, TodayConsumptionSensor, MonthConsumptionSensor, ConsumptionRateSensor)
+        ])
+        _LOGGER.debug(f"Added consumption sensors for instance: {instance_name}")
+
+    # Subsequent updates are driven by the integration-wide PollScheduler,
+    # the sensor registers itself once its initial update in async_added_to_hass is done
 
-    async_track_time_interval(hass, async_update_wrapper, timedelta(seconds=scan_interval))
-    _LOGGER.debug(f"Scheduled subsequent time-based updates every {scan_interval} seconds for sensor: {instance_name}")
+
+def parse_numbers(text):
+    """Return the number names of a comma-separated option, without blanks and duplicates."""
+    numbers = []
+    for number in (text or "").split(","):
+        number = number.strip()
+        if number and number not in numbers:
+            numbers.append(number)
+    return numbers
 
 
 class MeterCollectorSensor(Entity):
     """Representation of a Meter Collector sensor."""
 
-    def __init__(self, hass, ip_address, json_url, image_url, www_dir, scan_interval, instance_name, log_as_csv, save_images, device_class, unit_of_measurement, enable_upload, upload_url, api_key, disable_error_checking, config_entry):
+    # Diagnostics only, kept out of the recorder database
+    _unrecorded_attributes = frozenset({"http_latency_ms"})
+
+    def __init__(self, hass, ip_address, json_url, image_url, www_dir, scan_interval, instance_name, log_as_csv, save_images, device_class, unit_of_measurement, enable_upload, upload_url, api_key, disable_error_checking, config_entry, upload_mode=UPLOAD_MODE_FILE, adaptive_polling=False, min_scan_interval=DEFAULT_MIN_SCAN_INTERVAL, max_scan_interval=DEFAULT_MAX_SCAN_INTERVAL, client=None, breaker_threshold=DEFAULT_BREAKER_THRESHOLD, push_mode=False, watchdog_interval=DEFAULT_WATCHDOG_INTERVAL, retention_max_mb=DEFAULT_RETENTION_MAX_MB, retention_max_age_days=DEFAULT_RETENTION_MAX_AGE_DAYS, retention_error_max_age_days=DEFAULT_RETENTION_ERROR_MAX_AGE_DAYS, anomaly_filter=None):
         """Initialize the sensor."""
         _LOGGER.debug(f"Initializing sensor for instance: {instance_name}")
         self._hass = hass
@@ -97,10 +204,48 @@ class MeterCollectorSensor(Entity):
         self.enable_upload = enable_upload
         self.upload_url = upload_url
         self.api_key = api_key
+        self.upload_mode = upload_mode
         self._disable_error_checking = disable_error_checking # Store the new option
+        # Adaptive polling: fast while consumption is active, backing off while the reading is flat
+        self._adaptive_polling = adaptive_polling
+        self._min_scan_interval = min(min_scan_interval, max_scan_interval)
+        self._max_scan_interval = max(min_scan_interval, max_scan_interval)
         self._config_entry = config_entry # Keep config_entry if needed elsewhere
+        self._client = client # Serialized keep-alive HTTP client shared with the buttons of this device
+        self._breaker = CircuitBreaker(instance_name, breaker_threshold) # Replaces polls by a cheap probe while the device is offline
+        # Push mode: the device posts its readings to a webhook, polls only catch missed pushes
+        self._push_mode = push_mode
+        self._watchdog_interval = watchdog_interval
+        self._process_lock = asyncio.Lock() # A push and a watchdog poll must not process the same round twice
         self._enabled = True  # Default to enabled, _async_update will set if needed
         self._last_run_timestamp = None # Track the last run timestamp
+        # Change detection: device round timestamp and HTTP validators of the last /json response
+        self._last_device_timestamp = None
+        self._json_validators = {}
+        self._unchanged_polls = 0
+        # Duration of each phase of the update pipeline (diagnostic sensors and diagnostics download)
+        self._timings = UpdateTimings(instance_name)
+        # Buffered CSV writer keeping log.csv open between polls
+        self._csv_writer = CsvLogWriter(hass, os.path.join(www_dir, "log.csv"), instance_name, timings=self._timings) if log_as_csv else None
+        self._image_store = ImageStore(hass, www_dir, instance_name, timings=self._timings)
+        self._storage_task = None # Background layout migration and retention indexing
+        # Plausibility checks replacing the plain "not greater than the last value" skip
+        self._anomaly_filter = anomaly_filter or AnomalyFilter(instance_name)
+        self._aggregator = None # Consumption aggregates (optional)
+        # Multi-number devices: one /json fetch feeds the sensors of the other numbers
+        self._followers = []
+        self._last_json = None
+        self._first_number_fallback = True # Read the first number when the instance name is not a key of the JSON
+        # Disk budget for the saved images (disabled while all limits are 0)
+        self._retention = RetentionManager(
+            hass,
+            self._image_store,
+            www_dir,
+            instance_name,
+            max_bytes=retention_max_mb * 1024 * 1024,
+            max_age_days=retention_max_age_days,
+            error_max_age_days=retention_error_max_age_days,
+        )
         _LOGGER.debug(f"Sensor initialized for instance: {instance_name}")
         # Add Throttle
         # self.async_update = Throttle(self._scan_interval)(self._async_update) #remove throttle as duplicate with async_track_time_interval
@@ -112,10 +257,102 @@ class MeterCollectorSensor(Entity):
         This is the ideal place to fetch the initial state.
         """
         _LOGGER.debug(f"Sensor {self.unique_id} added to HASS. Performing initial update.")
+        if self._csv_writer:
+            await self._csv_writer.async_start()
+        # Layout migration and retention index run in the background, they must not delay the first poll
+        self._storage_task = self._hass.async_create_background_task(self._async_prepare_storage(), f"{DOMAIN}_{self._instance_name}_storage")
         # Call the update method immediately after being added
         await self._async_update()
-        # Note: The scheduled update via async_track_time_interval in async_setup_entry
-        # will handle subsequent updates.
+        # Subsequent updates: staggered with the other instances and bounded in concurrency
+        interval = self._watchdog_interval if self._push_mode else int(self._scan_interval.total_seconds())
+        self._scheduler.async_register(self._instance_name, interval, self._async_update)
+
+    async def async_will_remove_from_hass(self) -> None:
+        """Stop polling, flush and close the CSV log when the entity is removed."""
+        self._scheduler.async_unregister(self._instance_name)
+        if self._storage_task and not self._storage_task.done():
+            self._storage_task.cancel()
+        await self._retention.async_stop()
+        if self._aggregator:
+            await self._aggregator.async_shutdown()
+        if self._csv_writer:
+            await self._csv_writer.async_close()
+        await super().async_will_remove_from_hass()
+
+    async def _async_prepare_storage(self):
+        """Move the frames of the flat layout into date shards, then start the retention engine."""
+        try:
+            await async_migrate_flat_layout(self._hass, self._www_dir, self._instance_name)
+        except Exception as e:
+            _LOGGER.error(f"Image layout migration failed for {self._instance_name}: {e}", exc_info=True)
+        await self._retention.async_start()
+
+    def set_aggregator(self, aggregator):
+        """Feed the accepted readings to the consumption aggregates."""
+        self._aggregator = aggregator
+
+    @property
+    def numbers(self):
+        """Return the device numbers read by this sensor and its followers."""
+        return [self._instance_name] + [follower._instance_name for follower in self._followers]
+
+    @callback
+    def async_add_follower(self, follower):
+        """Feed the device JSON to the sensor of another number, returns the remover."""
+        self._followers.append(follower)
+
+        @callback
+        def _remove():
+            self._followers.remove(follower)
+
+        return _remove
+
+    async def async_trigger_round(self, timeout=DEFAULT_FLOW_ROUND_TIMEOUT):
+        """Start a round on the device, wait until it is finished and read its result right away."""
+        try:
+            round_seconds = await async_run_flow_round(self._client, self._instance_name, timeout)
+        except TimeoutError:
+            _LOGGER.warning(f"Flow round of {self._instance_name} not finished after {timeout}s, reading the device anyway")
+            round_seconds = None
+        await self._async_update()
+        return {
+            "instance_name": self._instance_name,
+            "round_completed": round_seconds is not None,
+            "round_seconds": round(round_seconds, 1) if round_seconds is not None else None,
+            "available": self._enabled,
+            "value": self._state,
+            "raw": self._attributes.get("raw"),
+            "error": self._attributes.get("error"),
+            "timestamp": self._attributes.get("timestamp"),
+            "numbers": {follower._instance_name: follower.state for follower in self._followers},
+        }
+
+    @property
+    def followers(self):
+        """Return the sensors of the other numbers of the device."""
+        return tuple(self._followers)
+
+    @property
+    def timings(self):
+        """Return the update pipeline timings."""
+        return self._timings
+
+    @property
+    def last_json(self):
+        """Return the last full JSON answer of the device."""
+        return self._last_json
+
+    async def async_rotate_csv_log(self):
+        """Close the CSV log segment of the previous day, if any (called before the nightly upload)."""
+        if self._csv_writer:
+            await self._csv_writer.async_rotate_if_due()
+        for follower in list(self._followers):
+            await follower.async_rotate_csv_log()
+
+    @property
+    def _scheduler(self):
+        """Return the integration-wide poll scheduler."""
+        return self._hass.data[DOMAIN]["scheduler"]
 
     @property
     def name(self):
@@ -180,88 +417,177 @@ class MeterCollectorSensor(Entity):
         self._last_run_timestamp = datetime.now().isoformat()
         _LOGGER.debug(f"Starting _async_update for {self._instance_name} at {self._last_run_timestamp}")
 
+        write_state = True # False when the device has not finished a new round since the last poll
+        started = time.monotonic()
         try:
-            data = await self._fetch_json_data()
-            if not data:
-                # Fetch failed, mark as unavailable if not already
-                if self._enabled:
-                    _LOGGER.warning(f"Marking sensor {self._instance_name} as unavailable due to fetch failure.")
-                    self._enabled = False
-                # Update attributes even on failure to show the last run time
-                self._attributes["last_run"] = self._last_run_timestamp
-                # Keep existing attributes if possible, otherwise just set last_run
-                if "error" not in self._attributes: # Avoid overwriting specific fetch error
-                     self._attributes["error"] = "Fetch failed"
-                # self.async_write_ha_state() # Update HA state - moved to finally block
-                return
-
-            values = self._extract_values(data)
-            if not values:
-                # Extraction failed, mark as unavailable if not already
-                if self._enabled:
-                    _LOGGER.warning(f"Marking sensor {self._instance_name} as unavailable due to data extraction failure.")
-                    self._enabled = False
-                # Update attributes even on failure to show the last run time
-                self._attributes["last_run"] = self._last_run_timestamp
-                # Keep existing attributes if possible, otherwise just set last_run
-                if "error" not in self._attributes: # Avoid overwriting specific extract error
-                     self._attributes["error"] = "Extraction failed"
-                # self.async_write_ha_state() # Update HA state - moved to finally block
+            if self._breaker.is_open and not await self._async_probe_device():
+                # Device still offline: skip the full poll, only the breaker attributes change
                 return
 
-            # If we got this far, the connection and basic data structure are okay. Mark as available.
-            if not self._enabled:
-                 _LOGGER.info(f"Marking sensor {self._instance_name} as available again.")
-                 self._enabled = True
-
-            if not self._validate_raw_value(values["raw_value"]):
-                # Validation failed, mark as unavailable
-                # Error message already logged in _validate_raw_value
-                if self._enabled: # Check before logging redundant message
-                    _LOGGER.warning(f"Marking sensor {self._instance_name} as unavailable due to invalid raw value.")
-                    self._enabled = False
-                # Update attributes even on failure to show the last run time
-                self._attributes["last_run"] = self._last_run_timestamp
-                # Keep existing attributes if possible, otherwise just set last_run
-                if "error" not in self._attributes: # Avoid overwriting specific validation error
-                     self._attributes["error"] = "Validation failed"
-                # self.async_write_ha_state() # Update HA state - moved to finally block
+            data = await self._fetch_json_data()
+            recovered = self._record_poll_result(data is not None)
+            if data is NOT_MODIFIED and self._enabled:
+                # HTTP validators matched: nothing to download, log or write
+                write_state = self._skip_unchanged_round(None) or recovered
+                async with self._process_lock:
+                    await self._async_fan_out(NOT_MODIFIED)
                 return
+            if data is NOT_MODIFIED:
+                # Unavailable sensor: drop the validators and fetch the full reading to recover
+                self._json_validators = {}
+                data = await self._fetch_json_data()
 
-            # Check for skip *only if* there's no device error in the current payload.
-            # This ensures that updates with errors, or updates where errors just cleared, are processed.
-            if values["error_value"].lower() == "no error" and self._should_skip_update(values["raw_value"]):
-                # Update last_run timestamp even if skipping value update
-                self._attributes["last_run"] = self._last_run_timestamp
-                _LOGGER.debug(f"Skipping update for {self._instance_name} due to non-increasing value and no device error.")
-                # No need to call async_write_ha_state here, finally block handles it.
-                return # Exit early ONLY if no error AND value hasn't increased
+            write_state = await self._async_handle_json(data)
 
-            # Handle prevalue setting on error (this runs even if value decreased, if error exists)
-            if values["error_value"].lower() != "no error":
-                if not self._disable_error_checking: # Check the new option
-                    await self._set_prevalue_on_error(values["pre"])
-                else:
-                    _LOGGER.debug(f"Skipping prevalue set for {self._instance_name} due to 'disable error checking' option.")
+        except Exception as e:
+            self._handle_update_error(e)
+        finally:
+            if write_state:
+                self._write_poll_state()
+            self._timings.record(PHASE_UPDATE, time.monotonic() - started)
+            self._timings.async_notify()
 
+    def _write_poll_state(self):
+        """Write the state after a poll, with the schedule and breaker attributes."""
+        # Ensure HA state is updated after every attempt, reflecting availability and state changes
+        # This is crucial for the initial update in async_added_to_hass as well
+        next_run = self._scheduler.next_run(self._instance_name)
+        if next_run:
+            self._attributes["next_run"] = datetime.fromtimestamp(next_run).isoformat()
+            self._attributes["scan_interval"] = self._scheduler.interval(self._instance_name)
+        self._attributes["breaker_state"] = self._breaker.state
+        self._attributes["consecutive_failures"] = self._breaker.consecutive_failures
+        # While open, the next scheduled run is the probe
+        self._attributes["next_probe"] = self._attributes.get("next_run") if self._breaker.is_open else None
+        _LOGGER.debug(f"Updating HA state for {self._instance_name} after _async_update attempt.")
+        self._write_state_timed()
 
-            # Save data and update state (this will now run if error cleared or if value increased)
-            await self._save_data(values)
-            self._update_state(values) # This will now set error attribute based on current values
+    def _write_state_timed(self):
+        """Write the HA state, recording how long the event loop spent on it."""
+        with self._timings.measure(PHASE_WRITE_STATE):
+            self.async_write_ha_state()
 
+    async def async_push_json(self, data, number=None):
+        """Process a reading pushed by the device (number: only this number), same pipeline as a poll."""
+        self._last_run_timestamp = datetime.now().isoformat()
+        write_state = True
+        started = time.monotonic()
+        try:
+            self._record_poll_result(True) # A push proves the device is online
+            write_state = await self._async_handle_json(data, number)
         except Exception as e:
-            _LOGGER.error(f"Unexpected error during update for {self._instance_name}: {e}", exc_info=True) # Add exc_info for full traceback
-            self._state = "Error"
-            self._attributes = {"error": str(e), "last_run": self._last_run_timestamp} # Include last run time
-            # Mark as unavailable on unexpected error
+            self._handle_update_error(e)
+        finally:
+            if write_state:
+                self._attributes["last_push"] = self._last_run_timestamp
+                self._write_state_timed()
+            self._timings.record(PHASE_UPDATE, time.monotonic() - started)
+            self._timings.async_notify()
+
+    async def _async_handle_json(self, data, number=None):
+        """Process a device JSON for all numbers (or only `number`), one poll or push at a time."""
+        async with self._process_lock:
+            if number is None and data is not NOT_MODIFIED:
+                self._last_json = data
+            # The other numbers of the device are read from the same response
+            await self._async_fan_out(data, number)
+            if number is not None and number != self._instance_name:
+                return False # Pushed reading of another number only
+            return await self._async_process_json(data)
+
+    async def _async_fan_out(self, data, number=None):
+        """Hand the device JSON (None when the fetch failed) to the sensors of the other numbers."""
+        for follower in list(self._followers):
+            if number is None or number == follower._instance_name:
+                await follower.async_process_json(data)
+
+    def _handle_update_error(self, e):
+        """Put the sensor in error after an unexpected exception."""
+        _LOGGER.error(f"Unexpected error during update for {self._instance_name}: {e}", exc_info=True) # Add exc_info for full traceback
+        self._state = "Error"
+        self._attributes = {"error": str(e), "last_run": self._last_run_timestamp} # Include last run time
+        # Mark as unavailable on unexpected error
+        if self._enabled:
+            _LOGGER.warning(f"Marking sensor {self._instance_name} as unavailable due to unexpected error.")
+            self._enabled = False
+
+    async def _async_process_json(self, data):
+        """Validate, save and apply the reading of this number. Returns False when the state must not be written."""
+        if not data:
+            # Fetch failed, mark as unavailable if not already
             if self._enabled:
-                _LOGGER.warning(f"Marking sensor {self._instance_name} as unavailable due to unexpected error.")
+                _LOGGER.warning(f"Marking sensor {self._instance_name} as unavailable due to fetch failure.")
                 self._enabled = False
-        finally:
-            # Ensure HA state is updated after every attempt, reflecting availability and state changes
-            # This is crucial for the initial update in async_added_to_hass as well
-            _LOGGER.debug(f"Updating HA state for {self._instance_name} after _async_update attempt.")
-            self.async_write_ha_state()
+            # Update attributes even on failure to show the last run time
+            self._attributes["last_run"] = self._last_run_timestamp
+            # Keep existing attributes if possible, otherwise just set last_run
+            if "error" not in self._attributes: # Avoid overwriting specific fetch error
+                 self._attributes["error"] = "Fetch failed"
+            return True
+
+        with self._timings.measure(PHASE_EXTRACT):
+            values = self._extract_values(data)
+        if not values:
+            # Extraction failed, mark as unavailable if not already
+            if self._enabled:
+                _LOGGER.warning(f"Marking sensor {self._instance_name} as unavailable due to data extraction failure.")
+                self._enabled = False
+            # Update attributes even on failure to show the last run time
+            self._attributes["last_run"] = self._last_run_timestamp
+            # Keep existing attributes if possible, otherwise just set last_run
+            if "error" not in self._attributes: # Avoid overwriting specific extract error
+                 self._attributes["error"] = "Extraction failed"
+            return True
+
+        # Fast path: same device round as the last poll (device timestamp unchanged)
+        if self._enabled and values["timestamp"] and values["timestamp"] == self._last_device_timestamp:
+            return self._skip_unchanged_round(values)
+        self._last_device_timestamp = values["timestamp"]
+
+        # If we got this far, the connection and basic data structure are okay. Mark as available.
+        if not self._enabled:
+             _LOGGER.info(f"Marking sensor {self._instance_name} as available again.")
+             self._enabled = True
+
+        if not self._validate_raw_value(values["raw_value"]):
+            # Validation failed, mark as unavailable
+            # Error message already logged in _validate_raw_value
+            if self._enabled: # Check before logging redundant message
+                _LOGGER.warning(f"Marking sensor {self._instance_name} as unavailable due to invalid raw value.")
+                self._enabled = False
+            # Update attributes even on failure to show the last run time
+            self._attributes["last_run"] = self._last_run_timestamp
+            # Keep existing attributes if possible, otherwise just set last_run
+            if "error" not in self._attributes: # Avoid overwriting specific validation error
+                 self._attributes["error"] = "Validation failed"
+            return True
+
+        if self._adaptive_polling:
+            self._adapt_scan_interval(values)
+
+        # Check for skip *only if* there's no device error in the current payload.
+        # This ensures that updates with errors, or updates where errors just cleared, are processed.
+        # Readings with a device error are shown but never accepted by the filter (no baseline, no rate)
+        accepted = values["error_value"].lower() == "no error"
+        if accepted and self._should_skip_update(values["raw_value"]):
+            # Update last_run timestamp even if skipping value update
+            self._attributes["last_run"] = self._last_run_timestamp
+            _LOGGER.debug(f"Skipping update for {self._instance_name} due to non-increasing value and no device error.")
+            return True # Exit early ONLY if no error AND value hasn't increased
+
+        # Handle prevalue setting on error (this runs even if value decreased, if error exists)
+        if values["error_value"].lower() != "no error":
+            if not self._disable_error_checking: # Check the new option
+                with self._timings.measure(PHASE_PREVALUE):
+                    await self._set_prevalue_on_error(values["number"], values["pre"])
+            else:
+                _LOGGER.debug(f"Skipping prevalue set for {self._instance_name} due to 'disable error checking' option.")
+
+
+        # Save data and update state (this will now run if error cleared or if value increased)
+        await self._save_data(values)
+        self._update_state(values, accepted) # This will now set error attribute based on current values
+        return True
 
 
     async def _fetch_json_data(self):
@@ -269,10 +595,22 @@ class MeterCollectorSensor(Entity):
         # self._last_run_timestamp is set in _async_update now
         _LOGGER.debug(f"Attempting to fetch JSON data for {self._instance_name}")
         try:
-            session = async_get_clientsession(self._hass)
-            async with session.get(self._json_url, timeout=10) as response:
-                response.raise_for_status()
-                return await response.json()
+            # Conditional request when the firmware sent validators with the previous reading
+            headers = {}
+            if "etag" in self._json_validators:
+                headers["If-None-Match"] = self._json_validators["etag"]
+            if "last_modified" in self._json_validators:
+                headers["If-Modified-Since"] = self._json_validators["last_modified"]
+            with self._timings.measure(PHASE_FETCH_JSON):
+                response = await self._client.async_get_json(API_json, API_json, headers=headers)
+            if response.status == 304:
+                return NOT_MODIFIED
+            self._json_validators = {}
+            if response.headers.get("ETag"):
+                self._json_validators["etag"] = response.headers["ETag"]
+            if response.headers.get("Last-Modified"):
+                self._json_validators["last_modified"] = response.headers["Last-Modified"]
+            return response.body
         except Exception as e:
             _LOGGER.error(f"Failed to fetch JSON data from {self._json_url} for {self._instance_name}: {e}")
             # self._state = "Error" # State is handled by caller (_async_update)
@@ -280,6 +618,33 @@ class MeterCollectorSensor(Entity):
             # No need to set self._enabled here, the caller (_async_update) handles it
             return None
 
+    async def _async_probe_device(self):
+        """Probe an offline device with a cheap request. Returns True if a full poll should follow (half-open)."""
+        self._breaker.begin_probe()
+        try:
+            await self._client.async_get_text(API_statusflow, API_statusflow, timeout=BREAKER_PROBE_TIMEOUT)
+        except Exception as e:
+            _LOGGER.debug(f"Probe of {self._instance_name} failed: {e}")
+            self._record_poll_result(False)
+            self._attributes["last_run"] = self._last_run_timestamp
+            return False
+        _LOGGER.debug(f"Probe of {self._instance_name} answered, trying a full poll.")
+        return True
+
+    def _record_poll_result(self, success):
+        """Feed the circuit breaker and adjust the schedule. Returns True when the breaker just closed."""
+        if success:
+            base_interval = self._breaker.record_success()
+            if base_interval is None:
+                return False
+            self._scheduler.async_set_interval(self._instance_name, base_interval)
+            return True
+        current = self._scheduler.interval(self._instance_name) or int(self._scan_interval.total_seconds())
+        probe_interval = self._breaker.record_failure(current)
+        if probe_interval is not None:
+            self._scheduler.async_set_interval(self._instance_name, probe_interval)
+        return False
+
     def _extract_values(self, data):
         """Extract values from the JSON data."""
         if not data or not isinstance(data, dict):
@@ -289,16 +654,20 @@ class MeterCollectorSensor(Entity):
             # No need to set self._enabled here, the caller (_async_update) handles it
             return None
 
-        top_level_key = next(iter(data.keys()), None)
+        # Top-level keys are the numbers of the device, the instance name is the number of this sensor
+        top_level_key = self._instance_name if self._instance_name in data else None
+        if top_level_key is None and self._first_number_fallback:
+            top_level_key = next(iter(data.keys()), None) # Single-number setups named differently on the device
         if not top_level_key:
-            _LOGGER.error(f"No top-level key found in JSON data for {self._instance_name}")
+            _LOGGER.error(f"Number {self._instance_name} not found in JSON data (numbers: {', '.join(data.keys())})")
             # self._state = "Error" # State is handled by caller (_async_update)
-            self._attributes = {"error": "No top-level key found in JSON data"}
+            self._attributes = {"error": f"Number {self._instance_name} not found in JSON data"}
             # No need to set self._enabled here, the caller (_async_update) handles it
             return None
 
         nested_data = data.get(top_level_key, {})
         return {
+            "number": top_level_key, # Name used by setPreValue
             "value": nested_data.get("value"),
             "raw_value": nested_data.get("raw"),
             "pre": nested_data.get("pre"),
@@ -320,36 +689,66 @@ class MeterCollectorSensor(Entity):
             # No need to set self._enabled here, the caller (_async_update) handles it
             return False
 
+    def _skip_unchanged_round(self, values):
+        """Handle a poll where the device has not finished a new round. Returns False (no state write)."""
+        self._unchanged_polls += 1
+        _LOGGER.debug(f"No new device round for {self._instance_name} (unchanged polls: {self._unchanged_polls}), skipping image, CSV and state write.")
+        if self._adaptive_polling:
+            self._adapt_scan_interval(values)
+        return False
+
+    def _adapt_scan_interval(self, values):
+        """Poll faster while the meter is moving, back off while the reading stays flat (values None: unchanged round)."""
+        values = values or {}
+        try:
+            rate = abs(float(values.get("rate") or 0))
+        except (ValueError, TypeError):
+            rate = 0
+        try:
+            raw_changed = self._last_raw_value is not None and float(values["raw_value"]) != self._last_raw_value
+        except (KeyError, ValueError, TypeError):
+            raw_changed = False
+
+        current = self._scheduler.interval(self._instance_name) or int(self._scan_interval.total_seconds())
+        if rate > 0 or raw_changed:
+            interval = self._min_scan_interval
+        else:
+            interval = min(self._max_scan_interval, max(self._min_scan_interval, int(current * ADAPTIVE_BACKOFF_FACTOR)))
+        if interval != current:
+            _LOGGER.debug(f"Adaptive polling for {self._instance_name}: interval {current}s -> {interval}s (rate {rate}, changed {raw_changed})")
+            self._scheduler.async_set_interval(self._instance_name, interval)
+
     def _should_skip_update(self, raw_value):
-        """Check if the update should be skipped."""
+        """Check if the update should be skipped (unchanged or implausible reading)."""
         try:
             raw_value_float = float(raw_value)
-            # Check if last_raw_value exists and the new value is not greater
-            if self._last_raw_value is not None and raw_value_float <= self._last_raw_value:
-                _LOGGER.debug(f"Skipping update for {self._instance_name}: New value {raw_value} is not greater than last value {self._last_raw_value}")
-                return True
         except (ValueError, TypeError):
              # If raw_value is invalid, validation should have caught it, but handle defensively
              _LOGGER.warning(f"Could not compare raw value {raw_value} for {self._instance_name}")
              return False # Don't skip if comparison fails
-        return False
+        verdict = self._anomaly_filter.check(time.time(), raw_value_float)
+        if verdict is None:
+            return False
+        if verdict != UNCHANGED:
+            # Rejected readings never become the new baseline, only the counters change
+            self._attributes["rejected_readings"] = self._anomaly_filter.rejected
+            self._attributes["last_rejection"] = verdict
+        _LOGGER.debug(f"Skipping update for {self._instance_name}: value {raw_value} ({verdict}), last value {self._last_raw_value}")
+        return True
 
-    async def _set_prevalue_on_error(self, pre):
-        """Set the prevalue when an error is detected."""
+    async def _set_prevalue_on_error(self, number, pre):
+        """Set the prevalue of a number when an error is detected."""
         try:
-            session = async_get_clientsession(self._hass)
             # Ensure 'pre' is a valid number before formatting the URL
             #prevalue = round(float(pre))
             prevalue = float(pre)
             # Construct URL using constant if available, otherwise hardcoded path
             # Assuming API_setPreValue is not defined in const.py, using hardcoded path
-            prevalue_url = f"http://{self._ip_address}/setPreValue?numbers={self._instance_name}&value={prevalue}"
-            _LOGGER.warning(f"Error detected for {self._instance_name}, setting prevalue with URL: {prevalue_url}")
+            prevalue_path = f"setPreValue?numbers={quote(number)}&value={prevalue}"
+            _LOGGER.warning(f"Error detected for {self._instance_name}, setting prevalue with URL: http://{self._ip_address}/{prevalue_path}")
 
-            async with session.get(prevalue_url, timeout=10) as prevalue_response:
-                prevalue_response.raise_for_status()
-                response_text = await prevalue_response.text()
-                _LOGGER.debug(f"Set prevalue response for {self._instance_name}: {response_text}")
+            response_text = await self._client.async_get_text("setPreValue", prevalue_path)
+            _LOGGER.debug(f"Set prevalue response for {self._instance_name}: {response_text}")
 
         except (ValueError, TypeError) as e:
             _LOGGER.error(f"Invalid prevalue received for {self._instance_name}: {pre} ({e})")
@@ -363,58 +762,71 @@ class MeterCollectorSensor(Entity):
         if self.log_as_csv:
             await self._save_csv(unix_epoch, values)
 
+        history = self._hass.data[DOMAIN]["history"].get(self._instance_name)
+        if history:
+            await history.async_write(history_row(unix_epoch, values))
+
         if self.save_images:
             await self._save_image(unix_epoch, values)
 
     async def _save_csv(self, unix_epoch, values):
-        """Save data to a CSV file."""
-        csv_file = os.path.join(self._www_dir, "log.csv")
+        """Queue a row for the buffered CSV log."""
+        if not self._csv_writer:
+            return
         try:
-            await self._hass.async_add_executor_job(
-                self._write_csv,
-                csv_file,
-                unix_epoch, # Timestamp when HA saved the record
-                values["value"],
-                values["raw_value"],
-                values["pre"],
-                values["error_value"],
-                values["rate"],
-                values["timestamp"], # Original timestamp from the device's JSON payload
-            )
-            _LOGGER.debug(f"Successfully wrote to CSV file for {self._instance_name}: {csv_file}")
+            with self._timings.measure(PHASE_SAVE_CSV):
+                await self._csv_writer.async_write([
+                    unix_epoch, # Timestamp when HA saved the record
+                    values["value"],
+                    values["raw_value"],
+                    values["pre"],
+                    values["error_value"],
+                    values["rate"],
+                    values["timestamp"], # Original timestamp from the device's JSON payload
+                ])
+            _LOGGER.debug(f"Buffered CSV row for {self._instance_name} ({self._csv_writer.buffer_depth} pending)")
         except Exception as e:
-            _LOGGER.error(f"Failed to write to CSV file {csv_file} for {self._instance_name}: {e}")
+            _LOGGER.error(f"Failed to write CSV row for {self._instance_name}: {e}")
+
+    async def _fetch_image(self):
+        """Download the last aligned image from the device."""
+        try:
+            with self._timings.measure(PHASE_FETCH_IMAGE):
+                return await self._client.async_get_bytes(API_img_alg, API_img_alg)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            _LOGGER.error(f"Failed to fetch image from {self._image_url} for {self._instance_name}: {e}")
+            return None
 
     async def _save_image(self, unix_epoch, values):
-        """Save image data."""
-        image_file_base = f"{unix_epoch}_{values['raw_value']}"
+        """Download and save the image of the reading."""
         # Use error_value from the current values dict to determine suffix
-        image_file_suffix = "_err.jpg" if values["error_value"] != "no error" else ".jpg"
-        image_filename = f"{image_file_base}{image_file_suffix}"
-        image_file_full_path = os.path.join(self._www_dir, image_filename)
-        latest_image_full_path = os.path.join(self._www_dir, "latest.jpg")
-        # Use relative path for HA frontend access
-        self._latest_image_path = f"/local/{DOMAIN}/{self._instance_name}/{image_filename}"
+        is_error = values["error_value"] != "no error"
 
         try:
-            session = async_get_clientsession(self._hass)
-            async with session.get(self._image_url, timeout=10) as image_response:
-                image_response.raise_for_status()
-                image_data = await image_response.read()
+            image_data = await self._fetch_image()
+            if image_data is None:
+                self._latest_image_path = None # Download failed, already logged
+                return
 
-            # Write specific image
-            await self._hass.async_add_executor_job(self._write_image, image_file_full_path, image_data)
-            # Write latest image
-            await self._hass.async_add_executor_job(self._write_image, latest_image_full_path, image_data)
+            # Content-addressed write: duplicate frames are not written again and latest.jpg is relinked
+            with self._timings.measure(PHASE_STORE_IMAGE):
+                image_filename, written = await self._image_store.async_store(image_data, unix_epoch, values["raw_value"], is_error)
+            # latest.jpg is a hardlink, it survives the retention deleting the (possibly older, deduplicated) frame.
+            # The digest changes the URL for each new content so the frontend reloads the picture.
+            self._latest_image_path = f"/local/{DOMAIN}/{self._instance_name}/{LATEST_IMAGE}?v={self._image_store.latest_digest}"
 
-            _LOGGER.debug(f"Successfully saved image to: {image_file_full_path} for {self._instance_name}")
+            if written:
+                _LOGGER.debug(f"Successfully saved image {image_filename} for {self._instance_name}")
+                await self._retention.async_add(image_filename, unix_epoch, len(image_data), is_error)
         except Exception as e:
             _LOGGER.error(f"Failed to fetch or save image for {self._instance_name}: {e}")
             # Clear the image path attribute on error?
             self._latest_image_path = None # Clear path if save fails
 
-    def _update_state(self, values):
-        """Update the sensor state and attributes."""
+    def _update_state(self, values, accepted=True):
+        """Update the sensor state and attributes, `accepted` readings also become the filter baseline."""
         try:
             # Ensure raw_value can be converted to float before updating state
             current_raw_float = float(values["raw_value"])
@@ -422,6 +834,10 @@ class MeterCollectorSensor(Entity):
             # --- End consideration ---
             self._current_raw_value = current_raw_float
             self._last_raw_value = self._current_raw_value # Update last known good value
+            if accepted:
+                self._anomaly_filter.add(time.time(), current_raw_float)
+                if self._aggregator: # Readings with a device error would count a dip and its recovery twice
+                    self._aggregator.async_add_reading(time.time(), current_raw_float)
 
             # Set attributes based *only* on the current values dictionary
             self._attributes = {
@@ -435,8 +851,20 @@ class MeterCollectorSensor(Entity):
                 "last_updated": datetime.now().isoformat(), # Timestamp of this specific state update
                 "last_raw_value": self._last_raw_value,
                 "current_raw_value": self._current_raw_value,
+                "unchanged_polls": self._unchanged_polls,
+                "rejected_readings": self._anomaly_filter.rejected,
+                "last_rejection": self._anomaly_filter.last_rejection,
                 # "entity_picture": self._latest_image_path, # entity_picture is set directly, not via attribute
             }
+            self._attributes["http_latency_ms"] = self._client.latency_histograms()
+            if self._csv_writer:
+                self._attributes["csv_buffer_depth"] = self._csv_writer.buffer_depth
+                if self._csv_writer.last_flush_duration is not None:
+                    self._attributes["csv_last_flush_ms"] = round(self._csv_writer.last_flush_duration * 1000, 1)
+            if self._retention.enabled:
+                self._attributes["image_bytes"] = self._retention.total_bytes
+                self._attributes["image_count"] = self._retention.image_count
+                self._attributes["images_pruned"] = self._retention.pruned_files
 
         except (ValueError, TypeError) as e:
             _LOGGER.error(f"Failed to update state for {self._instance_name} due to invalid raw value '{values['raw_value']}': {e}")
@@ -447,44 +875,300 @@ class MeterCollectorSensor(Entity):
                  self._enabled = False
 
 
-    def _write_csv(self, csv_file, unix_epoch, value, raw_value, pre, error_value, rate, timestamp):
-        """Helper method to write all values to a CSV file in an executor thread."""
-        try:
-            os.makedirs(os.path.dirname(csv_file), exist_ok=True)
-            file_exists = os.path.isfile(csv_file)
-
-            with open(csv_file, "a", newline="") as csvfile:
-                csv_writer = csv.writer(csvfile)
-                if not file_exists:
-                    csv_writer.writerow([
-                        "Timestamp",
-                        "Value",
-                        "Raw Value",
-                        "Pre",
-                        "Error",
-                        "Rate",
-                        "Timestamp (JSON)"
-                    ])
-                csv_writer.writerow([
-                    unix_epoch, # HA's timestamp
-                    value,
-                    raw_value,
-                    pre,
-                    error_value,
-                    rate,
-                    timestamp # Device's timestamp from JSON
-                ])
-        except Exception as e:
-            # Log error but don't re-raise to avoid crashing the update loop
-            _LOGGER.error(f"Failed to write to CSV file {csv_file}: {e}")
+class MeterNumberSensor(MeterCollectorSensor):
+    """
+    Another number of a multi-number device (e.g. a secondary meter read by the same device).
+
+    It never polls: the main sensor hands it every /json answer. Skip and validation state,
+    CSV log and prevalue handling are its own, the images are saved by the main sensor.
+    """
+
+    def __init__(self, primary, number, anomaly_filter):
+        """Initialize the sensor from the main sensor of the device."""
+        super().__init__(
+            hass=primary._hass,
+            ip_address=primary._ip_address,
+            json_url=primary._json_url,
+            image_url=primary._image_url,
+            www_dir=instance_www_dir(number),
+            scan_interval=int(primary._scan_interval.total_seconds()),
+            instance_name=number,
+            log_as_csv=primary.log_as_csv,
+            save_images=False,
+            device_class=primary._device_class,
+            unit_of_measurement=primary._unit_of_measurement,
+            enable_upload=False,
+            upload_url="",
+            api_key="",
+            disable_error_checking=primary._disable_error_checking,
+            config_entry=primary._config_entry,
+            client=primary._client,
+            anomaly_filter=anomaly_filter,
+        )
+        self._primary = primary
+        self._first_number_fallback = False
+
+    async def async_added_to_hass(self) -> None:
+        """Start the CSV log and follow the main sensor."""
+        if self._csv_writer:
+            await self._csv_writer.async_start()
+        self.async_on_remove(self._primary.async_add_follower(self))
+        # The main sensor may have polled before this entity was added
+        if self._primary.last_json:
+            await self.async_process_json(self._primary.last_json)
 
-    def _write_image(self, image_file, image_data):
-        """Helper method to write image data to a file in an executor thread."""
+    async def async_process_json(self, data):
+        """Process the device JSON fetched by the main sensor (None: fetch failed, NOT_MODIFIED: same round)."""
+        self._last_run_timestamp = datetime.now().isoformat()
+        if data is NOT_MODIFIED:
+            self._skip_unchanged_round(None)
+            return
+        write_state = True
+        started = time.monotonic()
         try:
-            # Ensure directory exists before writing
-            os.makedirs(os.path.dirname(image_file), exist_ok=True)
-            with open(image_file, "wb") as imgfile:
-                imgfile.write(image_data)
+            write_state = await self._async_process_json(data)
         except Exception as e:
-            # Log error but don't re-raise to avoid crashing the update loop
-            _LOGGER.error(f"Failed to write image to file {image_file}: {e}")
+            self._handle_update_error(e)
+        finally:
+            if write_state:
+                self._write_state_timed()
+            self._timings.record(PHASE_UPDATE, time.monotonic() - started)
+            self._timings.async_notify()
+
+    @property
+    def entity_picture(self):
+        """Return the latest image of the device, saved by the main sensor."""
+        return self._primary.entity_picture
+
+    @property
+    def device_info(self):
+        """Return device information to link this entity to the main device."""
+        return {
+            "identifiers": {(DOMAIN, self._primary._instance_name)},
+        }
+
+
+class UploadQueueSensor(SensorEntity):
+    """Base class for the upload queue diagnostic sensors."""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_should_poll = False
+
+    def __init__(self, instance_name, upload_queue):
+        """Initialize the sensor."""
+        self._instance_name = instance_name
+        self._upload_queue = upload_queue
+
+    async def async_added_to_hass(self) -> None:
+        """Refresh the state whenever the queue changes."""
+        self.async_on_remove(self._upload_queue.async_add_listener(self.async_write_ha_state))
+
+    @property
+    def device_info(self):
+        """Return device information to link this entity to the main device."""
+        return {
+            "identifiers": {(DOMAIN, self._instance_name)},
+        }
+
+
+class UploadQueueDepthSensor(UploadQueueSensor):
+    """Number of archives waiting in the upload queue."""
+
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_icon = "mdi:tray-full"
+
+    def __init__(self, instance_name, upload_queue):
+        """Initialize the sensor."""
+        super().__init__(instance_name, upload_queue)
+        self._attr_name = f"Upload Queue Depth ({instance_name})"
+        self._attr_unique_id = f"{DOMAIN}_{instance_name}_upload_queue_depth"
+
+    @property
+    def native_value(self):
+        """Return the number of queued archives."""
+        return self._upload_queue.depth
+
+    @property
+    def extra_state_attributes(self):
+        """Return the queued bytes and the next retry time."""
+        next_attempt = self._upload_queue.next_attempt
+        return {
+            "queued_bytes": self._upload_queue.queued_bytes,
+            "next_attempt": datetime.fromtimestamp(next_attempt).isoformat() if next_attempt else None,
+        }
+
+
+class UploadQueueAgeSensor(UploadQueueSensor):
+    """Age of the oldest archive waiting in the upload queue."""
+
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_native_unit_of_measurement = UnitOfTime.SECONDS
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_should_poll = True # The age grows between queue changes
+
+    def __init__(self, instance_name, upload_queue):
+        """Initialize the sensor."""
+        super().__init__(instance_name, upload_queue)
+        self._attr_name = f"Upload Queue Oldest Pending Age ({instance_name})"
+        self._attr_unique_id = f"{DOMAIN}_{instance_name}_upload_queue_oldest_age"
+
+    @property
+    def native_value(self):
+        """Return the age in seconds of the oldest queued archive."""
+        age = self._upload_queue.oldest_pending_age
+        return round(age) if age is not None else None
+
+
+# Timing sensors enabled by default: whole poll, Wi-Fi (JSON request), storage and executor wait
+TIMING_SENSORS_ENABLED = {PHASE_UPDATE, PHASE_FETCH_JSON, PHASE_STORE_IMAGE, PHASE_EXECUTOR_WAIT}
+
+
+class UpdateTimingSensor(SensorEntity):
+    """95th percentile duration of one phase of the update pipeline, with p50, max and count as attributes."""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_should_poll = False
+    _attr_icon = "mdi:timer-outline"
+    # Rolling statistics change on every poll, only the p95 state is worth recording
+    _unrecorded_attributes = frozenset({"count", "last_ms", "p50_ms", "max_ms"})
+
+    def __init__(self, instance_name, timings, phase):
+        """Initialize the sensor."""
+        self._instance_name = instance_name
+        self._timings = timings
+        self._phase = phase
+        self._attr_name = f"Timing {phase.replace('_', ' ').title()} p95 ({instance_name})"
+        self._attr_unique_id = f"{DOMAIN}_{instance_name}_timing_{phase}"
+        self._attr_entity_registry_enabled_default = phase in TIMING_SENSORS_ENABLED
+
+    async def async_added_to_hass(self) -> None:
+        """Refresh the state after every update of the instance."""
+        self.async_on_remove(self._timings.async_add_listener(self.async_write_ha_state))
+
+    @property
+    def native_value(self):
+        """Return the 95th percentile duration in ms."""
+        return self._timings.summary(self._phase)["p95_ms"]
+
+    @property
+    def extra_state_attributes(self):
+        """Return count, last, p50 and max durations."""
+        summary = self._timings.summary(self._phase)
+        summary.pop("p95_ms")
+        return summary
+
+    @property
+    def device_info(self):
+        """Return device information to link this entity to the main device."""
+        return {
+            "identifiers": {(DOMAIN, self._instance_name)},
+        }
+
+
+# Consumption device classes for the meter device classes (power meters report power units, no energy class)
+CONSUMPTION_DEVICE_CLASSES = {
+    "water": SensorDeviceClass.WATER,
+    "gas": SensorDeviceClass.GAS,
+}
+
+
+class ConsumptionSensor(SensorEntity):
+    """Base class for the consumption aggregate sensors."""
+
+    _attr_should_poll = False
+
+    def __init__(self, instance_name, aggregator, device_class, unit_of_measurement):
+        """Initialize the sensor."""
+        self._instance_name = instance_name
+        self._aggregator = aggregator
+        self._attr_device_class = CONSUMPTION_DEVICE_CLASSES.get(device_class)
+        self._attr_native_unit_of_measurement = unit_of_measurement
+
+    async def async_added_to_hass(self) -> None:
+        """Refresh the state whenever the aggregates change."""
+        self.async_on_remove(self._aggregator.async_add_listener(self.async_write_ha_state))
+
+    @property
+    def device_info(self):
+        """Return device information to link this entity to the main device."""
+        return {
+            "identifiers": {(DOMAIN, self._instance_name)},
+        }
+
+
+class LastHourConsumptionSensor(ConsumptionSensor):
+    """Consumption of the last 60 minutes (rolling)."""
+
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_icon = "mdi:clock-outline"
+
+    def __init__(self, instance_name, aggregator, device_class, unit_of_measurement):
+        """Initialize the sensor."""
+        super().__init__(instance_name, aggregator, device_class, unit_of_measurement)
+        self._attr_device_class = None # Rolling window, not a meter total
+        self._attr_name = f"Consumption Last Hour ({instance_name})"
+        self._attr_unique_id = f"{DOMAIN}_{instance_name}_consumption_last_hour"
+
+    @property
+    def native_value(self):
+        """Return the consumption of the last hour."""
+        return self._aggregator.last_hour
+
+
+class TodayConsumptionSensor(ConsumptionSensor):
+    """Consumption since local midnight."""
+
+    _attr_state_class = SensorStateClass.TOTAL_INCREASING
+    _attr_icon = "mdi:calendar-today"
+
+    def __init__(self, instance_name, aggregator, device_class, unit_of_measurement):
+        """Initialize the sensor."""
+        super().__init__(instance_name, aggregator, device_class, unit_of_measurement)
+        self._attr_name = f"Consumption Today ({instance_name})"
+        self._attr_unique_id = f"{DOMAIN}_{instance_name}_consumption_today"
+
+    @property
+    def native_value(self):
+        """Return the consumption of today."""
+        return self._aggregator.today
+
+
+class MonthConsumptionSensor(ConsumptionSensor):
+    """Consumption since the first day of the month."""
+
+    _attr_state_class = SensorStateClass.TOTAL_INCREASING
+    _attr_icon = "mdi:calendar-month"
+
+    def __init__(self, instance_name, aggregator, device_class, unit_of_measurement):
+        """Initialize the sensor."""
+        super().__init__(instance_name, aggregator, device_class, unit_of_measurement)
+        self._attr_name = f"Consumption This Month ({instance_name})"
+        self._attr_unique_id = f"{DOMAIN}_{instance_name}_consumption_month"
+
+    @property
+    def native_value(self):
+        """Return the consumption of this month."""
+        return self._aggregator.this_month
+
+
+class ConsumptionRateSensor(ConsumptionSensor):
+    """Moving-average consumption rate."""
+
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_icon = "mdi:speedometer"
+
+    def __init__(self, instance_name, aggregator, device_class, unit_of_measurement):
+        """Initialize the sensor."""
+        super().__init__(instance_name, aggregator, device_class, unit_of_measurement)
+        self._attr_device_class = None
+        self._attr_native_unit_of_measurement = f"{unit_of_measurement}/h"
+        self._attr_name = f"Consumption Rate ({instance_name})"
+        self._attr_unique_id = f"{DOMAIN}_{instance_name}_consumption_rate"
+
+    @property
+    def native_value(self):
+        """Return the moving-average rate per hour."""
+        return self._aggregator.rate
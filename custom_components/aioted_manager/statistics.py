@@ -0,0 +1,133 @@
+import logging
+from datetime import datetime, timezone
+
+from homeassistant.helpers.storage import Store
+from homeassistant.util import slugify
+
+from .const import DOMAIN, STATISTICS_IMPORT_BATCH_HOURS
+from .csv_logger import iter_csv_rows
+
+_LOGGER = logging.getLogger(__name__)
+
+PROGRESS_VERSION = 1
+HOUR = 3600
+
+
+def statistic_id(instance_name):
+    """Return the external statistic id of an instance (e.g. aioted_manager:water_meter)."""
+    return f"{DOMAIN}:{slugify(instance_name)}" # Statistic ids only allow lowercase letters, digits and _
+
+
+def iter_hourly_batches(log_dir, resume_hour, last_value, total, until):
+    """
+    Stream the CSV log of an instance and yield lists of completed hourly statistics
+    (hour start epoch, last raw value, cumulative sum), at most STATISTICS_IMPORT_BATCH_HOURS per list.
+
+    Rows before resume_hour (epoch of the first hour still to import) are skipped, hours starting
+    at or after `until` are not complete yet and never yielded. Memory: one batch. Runs in the
+    executor, the caller pulls one batch per executor job.
+    """
+    batch = []
+    bucket = None # Hour start of the rows being aggregated
+    bucket_value = None
+    for row in iter_csv_rows(log_dir, start=resume_hour):
+        try:
+            epoch = int(row[0])
+            value = float(row[2])
+            accepted = row[4].strip().lower() == "no error"
+        except (ValueError, IndexError):
+            continue
+        if not accepted:
+            continue # Readings the device flagged as errors never count
+        hour = epoch - epoch % HOUR
+        if bucket is not None and hour != bucket:
+            batch.append((bucket, bucket_value, total))
+            if len(batch) >= STATISTICS_IMPORT_BATCH_HOURS:
+                yield batch
+                batch = []
+        if hour >= until:
+            break
+        if last_value is None:
+            last_value = value
+        elif value > last_value:
+            total += value - last_value
+            last_value = value
+        # Decreases (meter replaced, misreads) add nothing and keep the baseline, like the aggregates
+        bucket = hour
+        bucket_value = last_value
+    else:
+        if bucket is not None and bucket + HOUR <= until:
+            batch.append((bucket, bucket_value, total))
+    if batch:
+        yield batch
+
+
+class StatisticsImporter:
+    """Resumable backfill of the CSV log of one instance into external long-term statistics."""
+
+    def __init__(self, hass, instance_name, log_dir, unit_of_measurement):
+        """Initialize the importer."""
+        self._hass = hass
+        self._instance_name = instance_name
+        self._log_dir = log_dir
+        self._unit_of_measurement = unit_of_measurement
+        self._store = Store(hass, PROGRESS_VERSION, f"{DOMAIN}.{instance_name}.statistics_import")
+
+    async def async_run(self, restart=False, progress_callback=None):
+        """Import the completed hours not imported yet. Returns a summary dict."""
+        from homeassistant.components.recorder.statistics import async_add_external_statistics
+
+        progress = {} if restart else (await self._store.async_load() or {})
+        resume_hour = progress.get("next_hour")
+        total = progress.get("sum", 0.0)
+        now = int(datetime.now().timestamp())
+        until = now - now % HOUR # Current hour is not complete
+
+        metadata = self._metadata()
+        batches = iter_hourly_batches(self._log_dir, resume_hour, progress.get("last_value"), total, until)
+        hours = 0
+        try:
+            while True:
+                batch = await self._hass.async_add_executor_job(next, batches, None)
+                if batch is None:
+                    break
+                async_add_external_statistics(self._hass, metadata, [
+                    {
+                        "start": datetime.fromtimestamp(hour, tz=timezone.utc),
+                        "state": value,
+                        "sum": hour_sum,
+                    }
+                    for hour, value, hour_sum in batch
+                ])
+                last_hour, last_value, total = batch[-1]
+                hours += len(batch)
+                # Saved after each batch: an interrupted import resumes at the next hour
+                await self._store.async_save({"next_hour": last_hour + HOUR, "last_value": last_value, "sum": total})
+                _LOGGER.info(f"Statistics import of {self._instance_name}: {hours} hours imported, up to {datetime.fromtimestamp(last_hour + HOUR).isoformat()}")
+                if progress_callback:
+                    progress_callback(self._instance_name, hours, last_hour + HOUR)
+        finally:
+            batches.close()
+        return {
+            "instance_name": self._instance_name,
+            "statistic_id": metadata["statistic_id"],
+            "hours_imported": hours,
+            "sum": total,
+        }
+
+    def _metadata(self):
+        metadata = {
+            "has_mean": False,
+            "has_sum": True,
+            "name": f"{self._instance_name} consumption",
+            "source": DOMAIN,
+            "statistic_id": statistic_id(self._instance_name),
+            "unit_of_measurement": self._unit_of_measurement,
+        }
+        try:
+            # Newer recorders describe the mean with mean_type instead of has_mean
+            from homeassistant.components.recorder.models import StatisticMeanType
+            metadata["mean_type"] = StatisticMeanType.NONE
+        except ImportError:
+            pass
+        return metadata
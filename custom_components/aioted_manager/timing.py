@@ -0,0 +1,120 @@
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from homeassistant.core import callback
+
+from .const import TIMING_WINDOW
+
+# Phases of the update pipeline
+PHASE_UPDATE = "update" # Whole poll, from the first request to the state write
+PHASE_FETCH_JSON = "fetch_json" # Device /json request (Wi-Fi, device load)
+PHASE_EXTRACT = "extract" # _extract_values
+PHASE_PREVALUE = "prevalue" # setPreValue request after a device error
+PHASE_SAVE_CSV = "save_csv" # CSV row buffered, flush included when the batch is full
+PHASE_FETCH_IMAGE = "fetch_image" # Device image download (Wi-Fi)
+PHASE_STORE_IMAGE = "store_image" # Frame written to disk (SD card / storage)
+PHASE_WRITE_STATE = "write_state" # async_write_ha_state (event loop)
+PHASE_EXECUTOR_WAIT = "executor_wait" # Time file jobs waited for an executor thread
+PHASES = (
+    PHASE_UPDATE,
+    PHASE_FETCH_JSON,
+    PHASE_EXTRACT,
+    PHASE_PREVALUE,
+    PHASE_SAVE_CSV,
+    PHASE_FETCH_IMAGE,
+    PHASE_STORE_IMAGE,
+    PHASE_WRITE_STATE,
+    PHASE_EXECUTOR_WAIT,
+)
+
+
+def _percentile(sorted_values, fraction):
+    """Nearest-rank percentile of a sorted, non-empty list."""
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+class UpdateTimings:
+    """
+    Rolling durations of the update pipeline phases of one instance.
+
+    Each phase keeps its last TIMING_WINDOW durations, percentiles are computed on demand
+    (a sort of at most TIMING_WINDOW values), so recording stays O(1) in the poll path.
+    """
+
+    def __init__(self, instance_name, window=TIMING_WINDOW):
+        """Initialize the timings."""
+        self._instance_name = instance_name
+        self._durations = {phase: deque(maxlen=window) for phase in PHASES}
+        self._max = dict.fromkeys(PHASES, 0.0) # Since startup, not only the window
+        self._listeners = []
+
+    def record(self, phase, seconds):
+        """Record the duration of a phase."""
+        self._durations[phase].append(seconds)
+        self._max[phase] = max(self._max[phase], seconds)
+
+    @contextmanager
+    def measure(self, phase):
+        """Record the duration of the wrapped block, also when it fails (not when it is cancelled)."""
+        start = time.monotonic()
+        try:
+            yield
+        except asyncio.CancelledError:
+            raise # e.g. discarded speculative image download, not a duration of the phase
+        except Exception:
+            self.record(phase, time.monotonic() - start)
+            raise
+        else:
+            self.record(phase, time.monotonic() - start)
+
+    async def async_add_executor_job(self, hass, target, *args):
+        """Run a job in the executor, recording how long it waited for a thread."""
+        submitted = time.monotonic()
+        started = []
+
+        def _run():
+            started.append(time.monotonic())
+            return target(*args)
+
+        try:
+            return await hass.async_add_executor_job(_run)
+        finally:
+            if started: # Recorded from the event loop, the deques are not shared with the threads
+                self.record(PHASE_EXECUTOR_WAIT, started[0] - submitted)
+
+    def summary(self, phase):
+        """Return count, last, p50, p95 and max (ms) of a phase, None values before the first record."""
+        durations = sorted(self._durations[phase])
+        if not durations:
+            return {"count": 0, "last_ms": None, "p50_ms": None, "p95_ms": None, "max_ms": None}
+        return {
+            "count": len(durations),
+            "last_ms": round(self._durations[phase][-1] * 1000, 1),
+            "p50_ms": round(_percentile(durations, 0.5) * 1000, 1),
+            "p95_ms": round(_percentile(durations, 0.95) * 1000, 1),
+            "max_ms": round(self._max[phase] * 1000, 1),
+        }
+
+    def as_dict(self):
+        """Return the summaries of all phases."""
+        return {phase: self.summary(phase) for phase in PHASES}
+
+    @callback
+    def async_add_listener(self, update_callback):
+        """Register a callback run after each update, returns the remover."""
+        self._listeners.append(update_callback)
+
+        @callback
+        def _remove():
+            self._listeners.remove(update_callback)
+
+        return _remove
+
+    @callback
+    def async_notify(self):
+        """Tell the listeners an update was recorded."""
+        for update_callback in list(self._listeners):
+            update_callback()
@@ -1,20 +1,94 @@
+import itertools
 import os
+import time
+import threading
 import zipfile
+import concurrent.futures
 import logging
 import aiohttp
-from datetime import datetime
+from datetime import date, datetime, timedelta
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.storage import Store
 from homeassistant.util.dt import now
 import asyncio
 
+from .const import (
+    DOMAIN,
+    UPLOAD_MODE_STREAM,
+    STREAM_CHUNK_SIZE,
+    STREAM_QUEUE_CHUNKS,
+    CHUNKED_UPLOAD_PART_SIZE,
+    UPLOAD_STATUS_FAILED,
+    UPLOAD_STATUS_NOTHING,
+    UPLOAD_STATUS_PENDING,
+    UPLOAD_STATUS_QUEUED,
+    UPLOAD_STATUS_UPLOADED,
+    UPLOAD_SETTLE_TIME,
+)
+from .csv_logger import SEGMENT_NAME_RE
+from .image_store import iter_frames, iter_shard_files
+
 _LOGGER = logging.getLogger(__name__)
 
 MAX_RETRIES = 3
 RETRY_DELAY = 5
 
-def create_zip_file(image_dir, zip_dir, instance_name):
+ZIP_DIR = "zip"
+MANIFEST_VERSION = 1
+
+
+def get_manifest_store(hass, instance_name):
+    """Return the storage holding the upload manifest of an instance."""
+    return Store(hass, MANIFEST_VERSION, f"{DOMAIN}.{instance_name}.upload_manifest")
+
+
+async def async_commit_manifest(manifest_store, watermark, recent, archive_name, file_count):
+    """Advance the manifest watermark once the server acknowledged an archive."""
+    await manifest_store.async_save({
+        "watermark": watermark,
+        "recent": recent, # Uploaded files modified after the watermark
+        "last_upload": now().isoformat(),
+        "last_archive": archive_name,
+        "last_file_count": file_count,
+    })
+
+
+def collect_upload_files(image_dir, since, cutoff, uploaded=()):
     """
-    Creates a zip file containing all images from the specified directory.
+    Returns the images and closed CSV log segments modified after `since` and up to `cutoff` (epoch seconds),
+    skipping the relative paths in `uploaded`, and the relative paths modified in the last UPLOAD_SETTLE_TIME
+    seconds before `cutoff`. The watermark is committed UPLOAD_SETTLE_TIME before the cutoff with those paths,
+    so a frame renamed into place after the scan but dated before the cutoff is picked up by the next upload.
+    Only the date shards of that range are listed (one day of margin on each side for
+    clock and time zone changes), plus the flat folder while it is not migrated.
+    The live log.csv, latest.jpg, temporary files and the zip folder are never included.
+    """
+    start = (date.fromtimestamp(since) - timedelta(days=1)) if since else None
+    end = date.fromtimestamp(cutoff) + timedelta(days=1)
+    uploaded = set(uploaded)
+    files = []
+    recent = []
+    candidates = itertools.chain(
+        iter_frames(image_dir, start=start, end=end),
+        iter_shard_files(image_dir, SEGMENT_NAME_RE, start=start, end=end, include_flat=False),
+    )
+    for relpath, entry, _match in candidates:
+        try:
+            mtime = entry.stat().st_mtime
+        except OSError:
+            continue # Deleted while walking
+        if since < mtime <= cutoff and relpath not in uploaded:
+            files.append(os.path.join(image_dir, relpath))
+            if mtime > cutoff - UPLOAD_SETTLE_TIME:
+                recent.append(relpath)
+    files.sort()
+    recent.sort()
+    return files, recent
+
+
+def create_zip_file(image_dir, zip_dir, instance_name, files):
+    """
+    Creates a zip file containing the given files from the specified directory.
     """
     # Ensure the zip directory exists
     os.makedirs(zip_dir, exist_ok=True)
@@ -25,14 +99,127 @@ def create_zip_file(image_dir, zip_dir, instance_name):
 
     # Create the zip file
     with zipfile.ZipFile(zip_filename, 'w') as zipf:
-        for root, _, files in os.walk(image_dir):
-            for file in files:
-                file_path = os.path.join(root, file)
+        for file_path in files:
+            try:
                 zipf.write(file_path, os.path.relpath(file_path, image_dir)) # Use os.path.relpath to only include the filename
+            except FileNotFoundError:
+                _LOGGER.debug(f"Skipping {file_path}, deleted before it could be archived")
 
     _LOGGER.info(f"Created zip file: {zip_filename}")
     return zip_filename
 
+async def _check_upload_response(response):
+    """Raise if the upload server did not reply 200 with OK in the body."""
+    if response.status == 200:
+        text = await response.text()
+        if "OK" not in text:
+            _LOGGER.error(f"Upload failed: Server responded with {text}")
+            raise ValueError(f"Server response: {text}")
+    else:
+        response_text = await response.text()
+        _LOGGER.error(f"Upload failed with status {response.status}: {response_text}")
+        raise aiohttp.ClientResponseError(response.request_info, response.history, status=response.status)
+
+
+class _ZipStreamSink:
+    """
+    Write-only file object handing zip output to the event loop in bounded chunks.
+    Used from the executor thread building the archive; blocks while the queue is full.
+    """
+
+    def __init__(self, loop, queue, cancelled):
+        self._loop = loop
+        self._queue = queue
+        self._cancelled = cancelled
+        self._buffer = bytearray()
+
+    def write(self, data):
+        self._buffer += data
+        if len(self._buffer) >= STREAM_CHUNK_SIZE:
+            self._push(bytes(self._buffer))
+            self._buffer.clear()
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def finish(self):
+        """Push the remaining bytes followed by the end-of-stream marker."""
+        if self._buffer:
+            self._push(bytes(self._buffer))
+            self._buffer.clear()
+        self._push(None)
+
+    def _push(self, chunk):
+        future = asyncio.run_coroutine_threadsafe(self._queue.put(chunk), self._loop)
+        while True:
+            if self._cancelled.is_set():
+                future.cancel()
+                raise OSError("Upload stream cancelled by consumer")
+            try:
+                future.result(timeout=1)
+                return
+            except concurrent.futures.TimeoutError:
+                continue
+
+
+def _write_zip_stream(sink, image_dir, files):
+    """Build the archive into the stream sink (executor thread)."""
+    try:
+        # zipfile falls back to data descriptors because the sink is not seekable
+        with zipfile.ZipFile(sink, "w") as zipf:
+            for file_path in files:
+                try:
+                    zipf.write(file_path, os.path.relpath(file_path, image_dir))
+                except FileNotFoundError:
+                    _LOGGER.debug(f"Skipping {file_path}, deleted before it could be streamed")
+    finally:
+        sink.finish() # Always end the stream so the request never waits forever
+
+
+async def upload_zip_stream(hass, image_dir, files, upload_url, api_key, instance_name):
+    """
+    Uploads the files as a zip archive built on the fly, without a temporary file.
+    Memory is bounded to STREAM_QUEUE_CHUNKS chunks of STREAM_CHUNK_SIZE bytes.
+    Returns False on any failure so the caller can fall back to the file-based upload.
+    """
+    headers = {
+        "X-API-Key": api_key,
+        "instance_name": instance_name,
+    }
+    archive_name = f"{instance_name}_images_{now().strftime('%Y%m%d_%H%M%S')}.zip"
+    queue = asyncio.Queue(maxsize=STREAM_QUEUE_CHUNKS)
+    cancelled = threading.Event()
+    sink = _ZipStreamSink(hass.loop, queue, cancelled)
+    producer = hass.async_add_executor_job(_write_zip_stream, sink, image_dir, files)
+
+    async def _chunks():
+        while True:
+            chunk = await queue.get()
+            if chunk is None:
+                break
+            yield chunk
+        await producer # Surface archive errors before the body is completed
+
+    try:
+        session = async_get_clientsession(hass)
+        data = aiohttp.FormData()
+        data.add_field("file", _chunks(), filename=archive_name, content_type="application/zip")
+        async with session.post(upload_url, data=data, headers=headers) as response:
+            await _check_upload_response(response)
+        _LOGGER.info(f"Streamed {archive_name} ({len(files)} files) successfully.")
+        return True
+    except Exception as e:
+        _LOGGER.error(f"Streaming upload of {archive_name} failed: {e}")
+        return False
+    finally:
+        cancelled.set() # Unblock the producer if the request stopped consuming
+        try:
+            await producer
+        except Exception:
+            pass # Already reported through the failed request
+
+
 async def upload_zip_file(hass, zip_file_path, upload_url, api_key, instance_name):
     """Uploads a zip file to the specified URL with retry logic."""
     retries = 0
@@ -47,17 +234,9 @@ async def upload_zip_file(hass, zip_file_path, upload_url, api_key, instance_nam
                 data = aiohttp.FormData()
                 data.add_field("file", f, filename=os.path.basename(zip_file_path))
                 async with session.post(upload_url, data=data, headers=headers) as response:
-                    if response.status == 200:
-                        text = await response.text()
-                        if "OK" not in text:
-                            _LOGGER.error(f"Upload failed: Server responded with {text}")
-                            raise ValueError(f"Server response: {text}")
-                        _LOGGER.info(f"Uploaded {zip_file_path} successfully.")
-                        return True
-                    else:
-                        response_text = await response.text()
-                        _LOGGER.error(f"Upload failed with status {response.status}: {response_text}")
-                        raise aiohttp.ClientResponseError(response.request_info, response.history, status=response.status)
+                    await _check_upload_response(response)
+                    _LOGGER.info(f"Uploaded {zip_file_path} successfully.")
+                    return True
         except (aiohttp.ClientError, ValueError, aiohttp.ClientResponseError) as e:
             _LOGGER.error(f"Attempt {retries + 1}/{MAX_RETRIES} failed to upload {zip_file_path}: {str(e)}")
             retries += 1
@@ -67,25 +246,126 @@ async def upload_zip_file(hass, zip_file_path, upload_url, api_key, instance_nam
     _LOGGER.error(f"Failed to upload {zip_file_path} after {MAX_RETRIES} retries.")
     return False
 
-async def daily_upload_task(hass, www_dir, upload_url, api_key, instance_name):
+def _read_part(file_path, offset, size):
+    """Read one part of an archive (executor thread)."""
+    with open(file_path, "rb") as f:
+        f.seek(offset)
+        return f.read(size)
+
+
+async def _read_chunked_status(response):
+    """Return the {"offset": int, "complete": bool} status sent by the chunked upload server."""
+    if response.status != 200:
+        response_text = await response.text()
+        _LOGGER.error(f"Chunked upload failed with status {response.status}: {response_text}")
+        raise aiohttp.ClientResponseError(response.request_info, response.history, status=response.status)
+    status = await response.json(content_type=None)
+    if not isinstance(status, dict) or not isinstance(status.get("offset"), int):
+        raise ValueError(f"Invalid chunked upload status: {status}")
+    return status
+
+
+async def upload_zip_chunked(hass, zip_file_path, upload_url, api_key, instance_name, state, save_state):
     """
-    Performs the daily upload task: zips images and uploads the zip file.
+    Uploads a zip file in fixed-size parts, resuming from the last offset the server confirmed.
+
+    Protocol (see tools/upload_server.py for the reference receiver):
+      - GET upload_url with X-Upload-Id / X-Upload-Size returns {"offset": n, "complete": bool}
+      - POST upload_url with a Content-Range header and the raw part returns the same status
+      - the archive is accepted once the server reports complete (status "OK")
+    `state` is the persisted entry of this archive, `save_state` persists it after each part.
     """
-    zip_dir = os.path.join(www_dir, "zip")
+    upload_id = os.path.basename(zip_file_path)
+    size = state["size"]
+    headers = {
+        "X-API-Key": api_key,
+        "instance_name": instance_name,
+        "X-Upload-Id": upload_id,
+        "X-Upload-Size": str(size),
+    }
+    session = async_get_clientsession(hass)
+    retries = 0
+    status = None
+    while retries < MAX_RETRIES:
+        try:
+            if status is None:
+                # (Re)synchronise with the server: it is authoritative after a failure or a restart
+                async with session.get(upload_url, headers=headers) as response:
+                    status = await _read_chunked_status(response)
+                _LOGGER.debug(f"Chunked upload {upload_id} resuming at offset {status['offset']}/{size}")
+
+            while not status.get("complete"):
+                offset = status["offset"]
+                part = await hass.async_add_executor_job(_read_part, zip_file_path, offset, CHUNKED_UPLOAD_PART_SIZE)
+                if not part:
+                    raise ValueError(f"Server reports offset {offset}/{size} but upload is not complete")
+                part_headers = {
+                    **headers,
+                    "Content-Range": f"bytes {offset}-{offset + len(part) - 1}/{size}",
+                    "Content-Type": "application/octet-stream",
+                }
+                async with session.post(upload_url, data=part, headers=part_headers) as response:
+                    status = await _read_chunked_status(response)
+                state["offset"] = status["offset"]
+                await save_state()
+                retries = 0 # Progress was made, reset the retry budget
+
+            _LOGGER.info(f"Uploaded {zip_file_path} in parts successfully.")
+            return True
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            _LOGGER.error(f"Attempt {retries + 1}/{MAX_RETRIES} failed to upload {zip_file_path} in parts: {str(e)}")
+            status = None
+            retries += 1
+            if retries < MAX_RETRIES:
+                _LOGGER.info(f"Retrying in {RETRY_DELAY} seconds...")
+                await asyncio.sleep(RETRY_DELAY)
+    _LOGGER.error(f"Failed to upload {zip_file_path} in parts after {MAX_RETRIES} retries, will resume at offset {state.get('offset', 0)}.")
+    return False
+
+
+async def daily_upload_task(hass, www_dir, upload_url, api_key, instance_name, upload_mode, upload_queue):
+    """
+    Performs the daily upload task: zips the images added since the last
+    successful upload and hands the zip file to the persistent upload queue.
+    In stream mode the archive is built on the fly, falling back to the
+    queued file-based path if the stream fails.
+    Returns {"status", "files"}, status being one of the UPLOAD_STATUS_* constants.
+    """
+    zip_dir = os.path.join(www_dir, ZIP_DIR)
+    manifest_store = get_manifest_store(hass, instance_name)
     try:
-        # Step 1: Create the zip file in an executor thread
+        # Step 0: Retry queued archives first, a queued archive holds the files right after the watermark
+        await upload_queue.async_drain(force=True)
+        if upload_queue.has_pending_manifest:
+            _LOGGER.warning(f"Previous archive for {instance_name} is still queued, no new archive created.")
+            return {"status": UPLOAD_STATUS_PENDING, "files": 0}
+
+        # Step 1: Select the files added since the last successful upload
+        manifest = await manifest_store.async_load() or {}
+        since = manifest.get("watermark", 0)
+        cutoff = time.time()
+        files, recent = await hass.async_add_executor_job(collect_upload_files, www_dir, since, cutoff, manifest.get("recent", []))
+        watermark = cutoff - UPLOAD_SETTLE_TIME
+        if not files:
+            _LOGGER.info(f"No new images to upload for {instance_name} since last upload.")
+            return {"status": UPLOAD_STATUS_NOTHING, "files": 0}
+
+        if upload_mode == UPLOAD_MODE_STREAM:
+            if await upload_zip_stream(hass, www_dir, files, upload_url, api_key, instance_name):
+                await async_commit_manifest(manifest_store, watermark, recent, None, len(files)) # Streamed, never written to disk
+                return {"status": UPLOAD_STATUS_UPLOADED, "files": len(files)}
+            _LOGGER.warning(f"Streaming upload failed for {instance_name}, falling back to file-based upload.")
+
+        # Step 2: Create the zip file in an executor thread
         zip_file_path = await hass.async_add_executor_job(
-            create_zip_file, www_dir, zip_dir, instance_name
+            create_zip_file, www_dir, zip_dir, instance_name, files
         )
 
-        # Step 2: Upload the zip file
-        upload_success = await upload_zip_file(hass, zip_file_path, upload_url, api_key, instance_name)
-
-        # Clean up the zip file after upload only if successful
-        if upload_success:
-            await hass.async_add_executor_job(os.remove, zip_file_path)
-            _LOGGER.info(f"Deleted {zip_file_path} after successful upload.")
-        else:
-            _LOGGER.error(f"Upload failed, {zip_file_path} not deleted.")
+        # Step 3: Queue and upload the zip file, the queue commits the manifest once the server replied OK
+        await upload_queue.async_enqueue(zip_file_path, watermark, recent, len(files))
+        await upload_queue.async_drain(force=True)
+        # Still queued: the queue retries it with backoff
+        return {"status": UPLOAD_STATUS_QUEUED if upload_queue.has_pending_manifest else UPLOAD_STATUS_UPLOADED, "files": len(files)}
     except Exception as e:
         _LOGGER.error(f"An error occurred during daily upload task: {e}")
+        return {"status": UPLOAD_STATUS_FAILED, "files": 0}
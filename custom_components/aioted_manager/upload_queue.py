@@ -0,0 +1,224 @@
+import asyncio
+import logging
+import os
+import random
+import time
+
+from homeassistant.core import callback
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.storage import Store
+
+from .const import (
+    DOMAIN,
+    UPLOAD_MODE_CHUNKED,
+    UPLOAD_QUEUE_BACKOFF_BASE,
+    UPLOAD_QUEUE_BACKOFF_MAX,
+    UPLOAD_QUEUE_MAX_BYTES,
+)
+from .upload import (
+    ZIP_DIR,
+    async_commit_manifest,
+    get_manifest_store,
+    upload_zip_chunked,
+    upload_zip_file,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+QUEUE_VERSION = 1
+
+
+def _list_zip_files(zip_dir):
+    """Return (path, size, mtime) of the archives in the zip folder (executor thread)."""
+    archives = []
+    if not os.path.isdir(zip_dir):
+        return archives
+    with os.scandir(zip_dir) as entries:
+        for entry in entries:
+            if entry.name.endswith(".zip") and entry.is_file():
+                stat = entry.stat()
+                archives.append((entry.path, stat.st_size, stat.st_mtime))
+    return archives
+
+
+def _remove_file(path):
+    """Delete a file, ignoring a file that is already gone (executor thread)."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class UploadQueue:
+    """
+    Durable per-instance queue of archives waiting for upload.
+
+    Items survive restarts in Home Assistant storage, failed uploads are retried
+    with exponential backoff and jitter, and the total queued bytes are capped.
+    """
+
+    def __init__(self, hass, instance_name, www_dir, upload_url, api_key, upload_mode):
+        """Initialize the queue (call async_load before use)."""
+        self._hass = hass
+        self._instance_name = instance_name
+        self._zip_dir = os.path.join(www_dir, ZIP_DIR)
+        self._upload_url = upload_url
+        self._api_key = api_key
+        self._upload_mode = upload_mode
+        self._store = Store(hass, QUEUE_VERSION, f"{DOMAIN}.{instance_name}.upload_queue")
+        self._manifest_store = get_manifest_store(hass, instance_name)
+        self._items = [] # Oldest first
+        self._drain_lock = asyncio.Lock()
+        self._cancel_timer = None
+        self._listeners = []
+
+    @property
+    def depth(self):
+        """Return the number of queued archives."""
+        return len(self._items)
+
+    @property
+    def queued_bytes(self):
+        """Return the total size of the queued archives."""
+        return sum(item["size"] for item in self._items)
+
+    @property
+    def oldest_pending_age(self):
+        """Return the age in seconds of the oldest queued archive, None when empty."""
+        if not self._items:
+            return None
+        return max(0, time.time() - self._items[0]["created"])
+
+    @property
+    def next_attempt(self):
+        """Return the epoch of the next scheduled retry, None when empty."""
+        if not self._items:
+            return None
+        return self._items[0]["next_attempt"] # Archives are uploaded in order, only the head waits
+
+    @property
+    def has_pending_manifest(self):
+        """Return True if a queued archive will advance the upload manifest."""
+        return any(item.get("cutoff") is not None for item in self._items)
+
+    @callback
+    def async_add_listener(self, update_callback):
+        """Register a callback run when the queue changes, returns the remover."""
+        self._listeners.append(update_callback)
+
+        @callback
+        def _remove():
+            self._listeners.remove(update_callback)
+
+        return _remove
+
+    async def async_load(self):
+        """Restore the queue and adopt archives left over from earlier failures."""
+        data = await self._store.async_load() or {}
+        self._items = data.get("items", [])
+
+        known = {item["path"] for item in self._items}
+        for path, size, mtime in await self._hass.async_add_executor_job(_list_zip_files, self._zip_dir):
+            if path in known:
+                continue
+            _LOGGER.info(f"Adopting leftover archive {path} into the upload queue of {self._instance_name}")
+            # Leftovers have no manifest information, their upload never moves the watermark
+            self._items.append(self._new_item(path, size, None, None, None, created=mtime))
+        self._items.sort(key=lambda item: item["created"])
+
+        await self._async_enforce_cap()
+        await self._async_save()
+        self._schedule()
+
+    async def async_enqueue(self, zip_file_path, cutoff, recent, file_count):
+        """Add a freshly built archive to the queue, `cutoff` and `recent` being the manifest to commit once uploaded."""
+        size = await self._hass.async_add_executor_job(os.path.getsize, zip_file_path)
+        self._items.append(self._new_item(zip_file_path, size, cutoff, recent, file_count))
+        await self._async_enforce_cap()
+        await self._async_save()
+        _LOGGER.debug(f"Queued {zip_file_path} ({size} bytes) for {self._instance_name}, depth {self.depth}")
+
+    async def async_drain(self, force=False):
+        """
+        Upload the queued archives whose retry time has come, oldest first.
+        With force, backoff delays are ignored (nightly run or manual service call).
+        """
+        async with self._drain_lock:
+            while self._items:
+                item = self._items[0]
+                if not force and item["next_attempt"] > time.time():
+                    break
+                if not await self._hass.async_add_executor_job(os.path.isfile, item["path"]):
+                    _LOGGER.warning(f"Dropping queued archive {item['path']}: file no longer exists.")
+                    self._items.pop(0)
+                    await self._async_save()
+                    continue
+
+                if await self._async_upload(item):
+                    if item.get("cutoff") is not None:
+                        await async_commit_manifest(self._manifest_store, item["cutoff"], item.get("recent", []), os.path.basename(item["path"]), item["file_count"])
+                    self._items.remove(item)
+                    await self._async_save()
+                    await self._hass.async_add_executor_job(_remove_file, item["path"])
+                    _LOGGER.info(f"Deleted {item['path']} after successful upload.")
+                    continue
+
+                item["attempts"] += 1
+                delay = min(UPLOAD_QUEUE_BACKOFF_MAX, UPLOAD_QUEUE_BACKOFF_BASE * 2 ** (item["attempts"] - 1))
+                item["next_attempt"] = time.time() + random.uniform(delay / 2, delay) # Equal jitter
+                await self._async_save()
+                _LOGGER.error(f"Upload of {item['path']} failed ({item['attempts']} attempts), next retry in {round(item['next_attempt'] - time.time())} seconds.")
+                break # Keep the order, the server is probably unreachable for the next items too
+        self._schedule()
+
+    async def async_shutdown(self):
+        """Cancel the retry timer."""
+        if self._cancel_timer:
+            self._cancel_timer()
+            self._cancel_timer = None
+
+    def _new_item(self, path, size, cutoff, recent, file_count, created=None):
+        now = time.time()
+        return {
+            "path": path,
+            "size": size,
+            "created": created if created is not None else now,
+            "attempts": 0,
+            "next_attempt": now,
+            "offset": 0, # Confirmed bytes in chunked mode
+            "cutoff": cutoff,
+            "recent": recent,
+            "file_count": file_count,
+        }
+
+    async def _async_upload(self, item):
+        if self._upload_mode == UPLOAD_MODE_CHUNKED:
+            return await upload_zip_chunked(self._hass, item["path"], self._upload_url, self._api_key, self._instance_name, item, self._async_save)
+        return await upload_zip_file(self._hass, item["path"], self._upload_url, self._api_key, self._instance_name)
+
+    async def _async_enforce_cap(self):
+        """Drop the oldest archives while the queue exceeds UPLOAD_QUEUE_MAX_BYTES (the newest is always kept)."""
+        while len(self._items) > 1 and self.queued_bytes > UPLOAD_QUEUE_MAX_BYTES:
+            item = self._items.pop(0)
+            _LOGGER.warning(f"Upload queue of {self._instance_name} exceeds {UPLOAD_QUEUE_MAX_BYTES} bytes, dropping {item['path']}.")
+            await self._hass.async_add_executor_job(_remove_file, item["path"])
+
+    async def _async_save(self):
+        await self._store.async_save({"items": self._items})
+        for update_callback in list(self._listeners):
+            update_callback()
+
+    @callback
+    def _schedule(self):
+        """Arm the retry timer for the next due archive."""
+        if self._cancel_timer:
+            self._cancel_timer()
+            self._cancel_timer = None
+        next_attempt = self.next_attempt
+        if next_attempt is None:
+            return
+        self._cancel_timer = async_call_later(self._hass, max(1, next_attempt - time.time()), self._async_timer)
+
+    async def _async_timer(self, _now):
+        self._cancel_timer = None
+        await self.async_drain()
@@ -0,0 +1 @@
+"""Tests for the aioted_manager integration."""
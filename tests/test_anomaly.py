@@ -0,0 +1,74 @@
+"""Tests of the reading plausibility filter."""
+import random
+
+from custom_components.aioted_manager.anomaly import (
+    DECREASE,
+    OUTLIER,
+    RATE,
+    UNCHANGED,
+    AnomalyFilter,
+    _median,
+    _median_absolute_deviation,
+)
+
+
+def _feed(anomaly_filter, readings):
+    """Add (epoch, value) readings as accepted."""
+    for epoch, value in readings:
+        assert anomaly_filter.check(epoch, value) is None
+        anomaly_filter.add(epoch, value)
+
+
+def test_first_reading_is_accepted():
+    assert AnomalyFilter("meter").check(0, 100.0) is None
+
+
+def test_decrease_and_unchanged_are_skipped_even_when_disabled():
+    anomaly_filter = AnomalyFilter("meter", enabled=False)
+    anomaly_filter.add(0, 100.0)
+    assert anomaly_filter.check(60, 100.0) == UNCHANGED
+    assert anomaly_filter.check(60, 99.5) == DECREASE
+    assert anomaly_filter.rejected == 1 # Unchanged readings are not counted as rejections
+    assert anomaly_filter.last_rejection == DECREASE
+
+
+def test_rate_above_max_rate_is_rejected():
+    anomaly_filter = AnomalyFilter("meter", enabled=True, max_rate=1.0)
+    anomaly_filter.add(0, 100.0)
+    assert anomaly_filter.check(3600, 100.5) is None
+    assert anomaly_filter.check(3600, 102.0) == RATE
+
+
+def test_spike_is_rejected_once_the_window_is_filled():
+    anomaly_filter = AnomalyFilter("meter", enabled=True, window=10)
+    value = 100.0
+    readings = []
+    for index in range(1, 11):
+        value += 0.01 + 0.001 * (index % 3) # Steady consumption with a little spread
+        readings.append((index * 60, value))
+    _feed(anomaly_filter, readings)
+
+    assert anomaly_filter.check(11 * 60, value + 5.0) == OUTLIER
+    assert anomaly_filter.check(11 * 60, value + 0.012) is None
+
+
+def test_spike_is_accepted_before_enough_samples():
+    anomaly_filter = AnomalyFilter("meter", enabled=True)
+    _feed(anomaly_filter, [(0, 100.0), (60, 100.01), (120, 100.02)])
+    assert anomaly_filter.check(180, 150.0) is None
+
+
+def test_window_keeps_the_latest_rates_only():
+    anomaly_filter = AnomalyFilter("meter", enabled=True, window=5)
+    _feed(anomaly_filter, [(index * 3600, float(index)) for index in range(20)])
+    assert len(anomaly_filter._sorted_rates) == 5
+    assert anomaly_filter._sorted_rates == sorted(anomaly_filter._rates)
+
+
+def test_median_absolute_deviation_matches_the_sorted_reference():
+    generator = random.Random(42)
+    for _ in range(2000):
+        values = sorted(generator.choice((generator.random(), generator.randint(0, 5))) for _ in range(generator.randint(1, 40)))
+        median = _median(values)
+        expected = _median(sorted(abs(value - median) for value in values))
+        assert _median_absolute_deviation(values, median) == expected
@@ -0,0 +1,53 @@
+"""Tests of the per-device circuit breaker."""
+from custom_components.aioted_manager.breaker import CircuitBreaker
+from custom_components.aioted_manager.const import (
+    BREAKER_BACKOFF_FACTOR,
+    BREAKER_CLOSED,
+    BREAKER_HALF_OPEN,
+    BREAKER_OPEN,
+    BREAKER_PROBE_MAX_INTERVAL,
+)
+
+
+def test_opens_after_threshold_failures():
+    breaker = CircuitBreaker("meter", failure_threshold=3)
+    assert breaker.record_failure(60) is None
+    assert breaker.record_failure(60) is None
+    assert breaker.state == BREAKER_CLOSED
+    assert breaker.record_failure(60) == 60
+    assert breaker.is_open
+    assert breaker.opened_at is not None
+
+
+def test_probe_interval_grows_and_is_capped():
+    breaker = CircuitBreaker("meter", failure_threshold=1)
+    intervals = [breaker.record_failure(60)]
+    for _ in range(11):
+        breaker.begin_probe()
+        assert breaker.state == BREAKER_HALF_OPEN
+        intervals.append(breaker.record_failure(60))
+    assert intervals[:3] == [60, 60 * BREAKER_BACKOFF_FACTOR, 60 * BREAKER_BACKOFF_FACTOR ** 2]
+    assert intervals == sorted(intervals)
+    assert intervals[-1] == BREAKER_PROBE_MAX_INTERVAL
+    assert breaker.state == BREAKER_OPEN
+
+
+def test_success_restores_the_interval_in_use_when_opening():
+    breaker = CircuitBreaker("meter", failure_threshold=2)
+    breaker.record_failure(30)
+    breaker.record_failure(30)
+    breaker.begin_probe()
+    breaker.record_failure(120) # Probe interval, not the poll interval
+    breaker.begin_probe()
+    assert breaker.record_success() == 30
+    assert breaker.state == BREAKER_CLOSED
+    assert breaker.trips == 0
+    assert breaker.consecutive_failures == 0
+
+
+def test_success_while_closed_resets_the_failures():
+    breaker = CircuitBreaker("meter", failure_threshold=3)
+    breaker.record_failure(60)
+    breaker.record_failure(60)
+    assert breaker.record_success() is None
+    assert breaker.record_failure(60) is None # Counting starts again
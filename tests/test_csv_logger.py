@@ -0,0 +1,75 @@
+"""Tests of the CSV log writer rotation."""
+import os
+from datetime import datetime, timedelta
+
+from custom_components.aioted_manager.csv_logger import CsvLogWriter, iter_csv_rows, list_segments
+from custom_components.aioted_manager.image_store import shard_dir
+
+
+def _noon(days_ago):
+    """Return the epoch of local noon `days_ago` days ago."""
+    day = datetime.now().replace(hour=12, minute=0, second=0, microsecond=0) - timedelta(days=days_ago)
+    return int(day.timestamp())
+
+
+def _row(epoch, value):
+    return [epoch, value, value, value, "no error", 0, datetime.fromtimestamp(epoch).isoformat()]
+
+
+async def _write(writer, *rows):
+    for row in rows:
+        await writer.async_write(row)
+    await writer.async_flush()
+
+
+async def test_new_day_rotates_the_live_log(hass, tmp_path):
+    writer = CsvLogWriter(hass, str(tmp_path / "log.csv"), "meter")
+    first, last, next_day = _noon(3), _noon(3) + 60, _noon(2)
+
+    await _write(writer, _row(first, 1.0), _row(last, 2.0))
+    await _write(writer, _row(next_day, 3.0))
+    await writer.async_close()
+
+    segments = list_segments(str(tmp_path))
+    assert [epoch for epoch, _path in segments] == [first]
+    assert os.path.dirname(segments[0][1]) == str(tmp_path / shard_dir(last))
+    assert writer.segments_rotated == 1
+    assert [int(row[0]) for row in iter_csv_rows(str(tmp_path))] == [first, last, next_day]
+
+
+async def test_failed_rotation_is_retried_without_duplicates(hass, tmp_path, monkeypatch):
+    writer = CsvLogWriter(hass, str(tmp_path / "log.csv"), "meter")
+    first, next_day, later = _noon(3), _noon(2), _noon(2) + 60
+    await _write(writer, _row(first, 1.0))
+
+    real_remove = os.remove
+    failures = []
+
+    def _remove_failing_once(path):
+        if path.endswith(".rotating") and not failures:
+            failures.append(path)
+            raise OSError("busy")
+        real_remove(path)
+
+    monkeypatch.setattr(os, "remove", _remove_failing_once)
+    await _write(writer, _row(next_day, 2.0)) # Segment written, moved-aside log not deleted
+    assert failures
+    assert writer.buffer_depth == 1 # The row of the new day is kept for the next flush
+
+    await _write(writer, _row(later, 3.0))
+    await writer.async_rotate_if_due() # Retries the pending rotation, then rotates the stale live log
+    await writer.async_close()
+
+    assert [epoch for epoch, _path in list_segments(str(tmp_path))] == [first, next_day]
+    assert not os.path.exists(tmp_path / "log.csv.rotating")
+    assert [int(row[0]) for row in iter_csv_rows(str(tmp_path))] == [first, next_day, later]
+
+
+async def test_large_live_log_rotates_before_the_end_of_the_day(hass, tmp_path):
+    writer = CsvLogWriter(hass, str(tmp_path / "log.csv"), "meter", max_rows=1, rotate_max_bytes=1)
+    epochs = [_noon(1) + offset for offset in (0, 60, 120)]
+    await _write(writer, *(_row(epoch, float(index)) for index, epoch in enumerate(epochs)))
+    await writer.async_close()
+
+    assert [epoch for epoch, _path in list_segments(str(tmp_path))] == epochs[:2]
+    assert [int(row[0]) for row in iter_csv_rows(str(tmp_path))] == epochs
@@ -0,0 +1,63 @@
+"""Tests of the flow_start / statusflow round trigger."""
+import pytest
+
+from custom_components.aioted_manager import flow
+from custom_components.aioted_manager.flow import async_run_flow_round, is_flow_idle
+
+
+class FakeClient:
+    """Device client answering statusflow from a script (None: request dropped)."""
+
+    def __init__(self, statuses):
+        self._statuses = list(statuses)
+        self.status_requests = 0
+        self.started = False
+
+    async def async_get_text(self, endpoint, path, timeout=None):
+        self.status_requests += 1
+        status = self._statuses.pop(0) if len(self._statuses) > 1 else self._statuses[0]
+        if status is None:
+            raise TimeoutError
+        return status
+
+    async def async_request(self, endpoint, path, read="text", headers=None, timeout=None):
+        self.started = True
+
+
+@pytest.fixture(autouse=True)
+def no_poll_delay(monkeypatch):
+    """Check statusflow without waiting."""
+    monkeypatch.setattr(flow, "FLOW_POLL_INITIAL", 0)
+
+
+def test_idle_states():
+    assert is_flow_idle("Flow finished (15:56:34)")
+    assert is_flow_idle(" Wait for next round")
+    assert not is_flow_idle("Take image")
+    assert not is_flow_idle(None)
+
+
+async def test_round_completes_when_idle_after_busy():
+    client = FakeClient(["Flow finished (10:00:00)", "Take image", "Digitization", "Flow finished (10:00:00)"])
+    assert await async_run_flow_round(client, "meter") >= 0
+    assert client.started
+    assert client.status_requests == 4
+
+
+async def test_round_completes_when_the_idle_status_changes():
+    client = FakeClient(["Flow finished (10:00:00)", "Flow finished (10:00:00)", "Flow finished (10:00:20)"])
+    await async_run_flow_round(client, "meter")
+    assert client.status_requests == 3
+
+
+async def test_round_without_baseline_waits_for_busy():
+    # Both baseline requests dropped: an idle status cannot tell the old round from the new one
+    client = FakeClient([None, None, "Flow finished (10:00:00)", "Flow finished (10:00:00)", "Take image", "Flow finished (10:00:30)"])
+    await async_run_flow_round(client, "meter")
+    assert client.status_requests == 6
+
+
+async def test_round_times_out_when_the_device_stays_idle():
+    client = FakeClient(["Flow finished (10:00:00)"])
+    with pytest.raises(TimeoutError):
+        await async_run_flow_round(client, "meter", timeout=0.1)
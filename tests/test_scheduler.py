@@ -0,0 +1,54 @@
+"""Tests of the integration-wide poll scheduler."""
+from unittest.mock import AsyncMock
+
+import pytest
+
+from custom_components.aioted_manager.scheduler import PollScheduler
+
+
+def _phases(scheduler, interval):
+    jobs = scheduler.snapshot()["jobs"].values()
+    return sorted(job["phase"] for job in jobs if job["interval"] == interval)
+
+
+async def test_instances_sharing_an_interval_are_staggered(hass):
+    scheduler = PollScheduler(hass)
+    for name in ("a", "b", "c", "d"):
+        scheduler.async_register(name, 60, AsyncMock())
+    scheduler.async_register("slow", 300, AsyncMock())
+
+    assert _phases(scheduler, 60) == [0, 15, 30, 45]
+    assert _phases(scheduler, 300) == [0]
+    for job in scheduler.snapshot()["jobs"].values():
+        assert job["next_run"] % job["interval"] == pytest.approx(job["phase"])
+
+    for name in ("a", "b", "c", "d", "slow"):
+        scheduler.async_unregister(name)
+
+
+async def test_phases_are_spread_again_on_unregister(hass):
+    scheduler = PollScheduler(hass)
+    for name in ("a", "b", "c", "d"):
+        scheduler.async_register(name, 60, AsyncMock())
+    scheduler.async_unregister("b")
+
+    assert _phases(scheduler, 60) == [0, 20, 40]
+    assert scheduler.next_run("b") is None
+
+    for name in ("a", "c", "d"):
+        scheduler.async_unregister(name)
+
+
+async def test_set_interval_keeps_the_other_phases(hass):
+    scheduler = PollScheduler(hass)
+    for name in ("a", "b", "c"):
+        scheduler.async_register(name, 60, AsyncMock())
+    before = {name: scheduler.next_run(name) for name in ("a", "c")}
+
+    scheduler.async_set_interval("b", 120)
+
+    assert scheduler.interval("b") == 120
+    assert {name: scheduler.next_run(name) for name in ("a", "c")} == before
+
+    for name in ("a", "b", "c"):
+        scheduler.async_unregister(name)
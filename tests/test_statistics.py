@@ -0,0 +1,62 @@
+"""Tests of the hourly statistics batching of the CSV log."""
+from custom_components.aioted_manager import statistics
+from custom_components.aioted_manager.csv_logger import CSV_HEADER
+from custom_components.aioted_manager.statistics import HOUR, iter_hourly_batches
+
+START = 1_700_000_000 - 1_700_000_000 % HOUR
+
+
+def _write_log(log_dir, rows):
+    """Write (epoch, raw value, error) rows to the live log."""
+    with open(log_dir / "log.csv", "w", newline="") as f:
+        f.write(",".join(CSV_HEADER) + "\n")
+        for epoch, value, error in rows:
+            f.write(f"{epoch},{value},{value},{value},{error},0,x\n")
+
+
+def _hours(log_dir, until, resume_hour=None, last_value=None, total=0.0):
+    return [hour for batch in iter_hourly_batches(str(log_dir), resume_hour, last_value, total, until) for hour in batch]
+
+
+def test_error_rows_and_dips_add_nothing(tmp_path):
+    _write_log(tmp_path, [
+        (START, 100, "no error"),
+        (START + HOUR, 99, "E91: Wrong digit"),
+        (START + 2 * HOUR, 100.5, "no error"),
+        (START + 3 * HOUR, 101, "no error"),
+    ])
+    assert _hours(tmp_path, START + 4 * HOUR) == [
+        (START, 100.0, 0.0),
+        (START + 2 * HOUR, 100.5, 0.5),
+        (START + 3 * HOUR, 101.0, 1.0),
+    ]
+
+
+def test_accepted_dip_keeps_the_baseline(tmp_path):
+    _write_log(tmp_path, [
+        (START, 100, "no error"),
+        (START + 60, 98, "no error"), # Misread
+        (START + HOUR, 100.5, "no error"),
+    ])
+    assert _hours(tmp_path, START + 2 * HOUR) == [(START, 100.0, 0.0), (START + HOUR, 100.5, 0.5)]
+
+
+def test_incomplete_hour_is_not_yielded(tmp_path):
+    _write_log(tmp_path, [(START, 1, "no error"), (START + HOUR, 2, "no error"), (START + HOUR + 60, 3, "no error")])
+    assert _hours(tmp_path, START + HOUR) == [(START, 1.0, 0.0)]
+
+
+def test_resume_continues_the_sum(tmp_path):
+    _write_log(tmp_path, [(START, 10, "no error"), (START + HOUR, 12, "no error"), (START + 2 * HOUR, 15, "no error")])
+    assert _hours(tmp_path, START + 3 * HOUR, resume_hour=START + HOUR, last_value=10.0, total=4.0) == [
+        (START + HOUR, 12.0, 6.0),
+        (START + 2 * HOUR, 15.0, 9.0),
+    ]
+
+
+def test_batches_are_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(statistics, "STATISTICS_IMPORT_BATCH_HOURS", 2)
+    _write_log(tmp_path, [(START + index * HOUR, index, "no error") for index in range(5)])
+    batches = list(iter_hourly_batches(str(tmp_path), None, None, 0.0, START + 5 * HOUR))
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert batches[-1][-1] == (START + 4 * HOUR, 4.0, 4.0)
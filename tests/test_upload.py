@@ -0,0 +1,84 @@
+"""Tests of the resumable chunked upload against the reference upload server."""
+import os
+from unittest.mock import AsyncMock
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from custom_components.aioted_manager import upload
+from custom_components.aioted_manager.upload import upload_zip_chunked
+from tools.upload_server import CONTENT_RANGE_RE, UploadServer
+
+PART_SIZE = 1000
+API_KEY = "secret"
+
+
+class FlakyUploadServer(UploadServer):
+    """Reference server answering 503 once to the parts starting at the given offsets."""
+
+    def __init__(self, out_dir, fail_at=()):
+        super().__init__(out_dir, API_KEY)
+        self._fail_at = set(fail_at)
+
+    async def _handle_part(self, request):
+        start = int(CONTENT_RANGE_RE.match(request.headers["Content-Range"]).group(1))
+        if start in self._fail_at:
+            self._fail_at.remove(start)
+            raise web.HTTPServiceUnavailable(text="Simulated failure")
+        return await super()._handle_part(request)
+
+
+@pytest.fixture(autouse=True)
+def small_parts(monkeypatch):
+    monkeypatch.setattr(upload, "CHUNKED_UPLOAD_PART_SIZE", PART_SIZE)
+    monkeypatch.setattr(upload, "RETRY_DELAY", 0)
+
+
+@pytest.fixture
+def archive(tmp_path):
+    path = tmp_path / "meter_images_20240101_000000.zip"
+    path.write_bytes(os.urandom(3 * PART_SIZE + 123))
+    return path
+
+
+async def _serve(server):
+    test_server = TestServer(server.app())
+    await test_server.start_server()
+    return test_server
+
+
+async def test_upload_resumes_at_the_server_offset(hass, tmp_path, archive):
+    received = tmp_path / "received"
+    server = FlakyUploadServer(str(received))
+    # A previous run got the first part through before Home Assistant restarted
+    (received / "meter").mkdir(parents=True)
+    (received / "meter" / f"{archive.name}.part").write_bytes(archive.read_bytes()[:PART_SIZE])
+    test_server = await _serve(server)
+    state = {"size": archive.stat().st_size, "offset": 0}
+    save_state = AsyncMock()
+
+    try:
+        assert await upload_zip_chunked(hass, str(archive), str(test_server.make_url("/upload")), API_KEY, "meter", state, save_state)
+    finally:
+        await test_server.close()
+
+    assert server.bytes_received == state["size"] - PART_SIZE # The confirmed part is not sent again
+    assert (received / "meter" / archive.name).read_bytes() == archive.read_bytes()
+    assert state["offset"] == state["size"]
+    assert save_state.await_count == 3
+
+
+async def test_failed_part_is_resent_after_resynchronising(hass, tmp_path, archive):
+    received = tmp_path / "received"
+    server = FlakyUploadServer(str(received), fail_at=(2 * PART_SIZE,))
+    test_server = await _serve(server)
+    state = {"size": archive.stat().st_size, "offset": 0}
+
+    try:
+        assert await upload_zip_chunked(hass, str(archive), str(test_server.make_url("/upload")), API_KEY, "meter", state, AsyncMock())
+    finally:
+        await test_server.close()
+
+    assert server.bytes_received == state["size"] # Every byte sent exactly once
+    assert (received / "meter" / archive.name).read_bytes() == archive.read_bytes()
@@ -0,0 +1,62 @@
+"""Tests of the persistent upload queue."""
+import os
+import time
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from custom_components.aioted_manager.const import UPLOAD_MODE_FILE, UPLOAD_QUEUE_BACKOFF_BASE, UPLOAD_QUEUE_BACKOFF_MAX
+from custom_components.aioted_manager.upload import ZIP_DIR, get_manifest_store
+from custom_components.aioted_manager.upload_queue import UploadQueue
+
+
+@pytest.fixture
+async def queue(hass, tmp_path):
+    upload_queue = UploadQueue(hass, "meter", str(tmp_path), "http://127.0.0.1/upload", "key", UPLOAD_MODE_FILE)
+    await upload_queue.async_load()
+    yield upload_queue
+    await upload_queue.async_shutdown()
+
+
+@pytest.fixture
+def archive(queue, tmp_path):
+    """An archive built after the queue was loaded."""
+    zip_dir = tmp_path / ZIP_DIR
+    zip_dir.mkdir()
+    path = zip_dir / "meter_images_20240101_000000.zip"
+    path.write_bytes(b"PK" + b"\0" * 100)
+    return str(path)
+
+
+async def test_failed_uploads_back_off_exponentially(hass, queue, archive):
+    await queue.async_enqueue(archive, 100.0, [], 1)
+
+    delays = []
+    with patch("custom_components.aioted_manager.upload_queue.upload_zip_file", AsyncMock(return_value=False)) as upload:
+        for _ in range(12):
+            await queue.async_drain(force=True)
+            delays.append(queue.next_attempt - time.time())
+    assert upload.await_count == 12
+    assert queue.depth == 1
+
+    for attempt, delay in enumerate(delays):
+        expected = min(UPLOAD_QUEUE_BACKOFF_MAX, UPLOAD_QUEUE_BACKOFF_BASE * 2 ** attempt)
+        assert expected / 2 - 1 <= delay <= expected # Equal jitter
+
+    with patch("custom_components.aioted_manager.upload_queue.upload_zip_file", AsyncMock(return_value=False)) as upload:
+        await queue.async_drain() # Not due yet
+    upload.assert_not_awaited()
+
+
+async def test_success_commits_the_manifest_and_deletes_the_archive(hass, queue, archive):
+    await queue.async_enqueue(archive, 100.0, ["2024/01/01/1704067190_1_0123456789abcdef.jpg"], 3)
+
+    with patch("custom_components.aioted_manager.upload_queue.upload_zip_file", AsyncMock(return_value=True)):
+        await queue.async_drain(force=True)
+
+    assert queue.depth == 0
+    assert not os.path.exists(archive)
+    manifest = await get_manifest_store(hass, "meter").async_load()
+    assert manifest["watermark"] == 100.0
+    assert manifest["recent"] == ["2024/01/01/1704067190_1_0123456789abcdef.jpg"]
+    assert manifest["last_file_count"] == 3
@@ -0,0 +1,421 @@
+"""
+Benchmark of the aioted_manager integration against simulated devices (tools/device_sim.py).
+
+Boots a throw-away Home Assistant in a temporary config folder (the integration is linked into its
+custom_components), adds one config entry per simulated device and drives them through the real
+integration code: config entry setup, DeviceClient, sensor update pipeline, CSV log, image store,
+scheduler and services. Needs homeassistant and aiohttp installed (a Home Assistant dev environment).
+
+poll:   N devices polled in rounds through the collect_data service (--drive service, all instances at
+        once with --max-concurrent, measures the throughput ceiling) or by the integration scheduler
+        at --scan-interval for --duration seconds (--drive scheduler, the production path).
+        Reports polls/s, update latency percentiles, event loop lag, per-phase p95 and bytes written.
+upload: seeds --images frames per instance and runs the upload_data service against a local
+        tools/upload_server.py, once per upload mode. Reports duration, throughput and event loop lag.
+
+Usage:
+  python tools/benchmark.py poll --devices 50 --rounds 20 --max-concurrent 8 --latency 80 --failure-rate 0.02
+  python tools/benchmark.py poll --devices 200 --drive scheduler --scan-interval 30 --duration 300
+  python tools/benchmark.py poll --devices 20 --option consumption_sensors=true --option history_store=true
+  python tools/benchmark.py upload --instances 4 --images 2000 --modes file,stream,chunked
+Add --json results.json to keep the results, --keep to keep the config folder.
+"""
+import argparse
+import asyncio
+import importlib
+import inspect
+import json
+import logging
+import math
+import os
+import shutil
+import socket
+import tempfile
+import time
+from types import MappingProxyType
+
+from device_sim import DeviceFarm, DeviceProfile
+from upload_server import UploadServer
+
+_LOGGER = logging.getLogger("benchmark")
+
+DOMAIN = "aioted_manager"
+COMPONENT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "custom_components", DOMAIN))
+LOG_FILE = "home-assistant.log"
+LAG_INTERVAL = 0.05 # Seconds between two event loop lag samples
+UPLOAD_API_KEY = "benchmark"
+
+CONFIGURATION_YAML = """\
+homeassistant:
+  name: aioted_manager benchmark
+  time_zone: UTC
+  unit_system: metric
+http:
+  server_host: 127.0.0.1
+  server_port: {http_port}
+logger:
+  default: warning
+"""
+
+
+def _percentile(values, fraction):
+    """Nearest-rank percentile, None for no values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def _distribution(values_ms):
+    """Return count, p50, p95, p99 and max of millisecond values."""
+    return {
+        "count": len(values_ms),
+        "p50_ms": _round(_percentile(values_ms, 0.5)),
+        "p95_ms": _round(_percentile(values_ms, 0.95)),
+        "p99_ms": _round(_percentile(values_ms, 0.99)),
+        "max_ms": _round(max(values_ms, default=None)),
+    }
+
+
+def _round(value):
+    return None if value is None else round(value, 1)
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _dir_bytes(path, exclude=(LOG_FILE,)):
+    """Return the size of the files below path."""
+    total = 0
+    for root, _dirs, files in os.walk(path):
+        for name in files:
+            if name in exclude:
+                continue
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass # Rotated or deleted while walking
+    return total
+
+
+def _parse_options(pairs):
+    """Parse --option key=value pairs, values as JSON when possible (true, 30, "x")."""
+    options = {}
+    for pair in pairs or ():
+        key, _, value = pair.partition("=")
+        try:
+            options[key] = json.loads(value)
+        except ValueError:
+            options[key] = value
+    return options
+
+
+class LoopLagMonitor:
+    """Samples how late the event loop wakes up a sleeping task."""
+
+    def __init__(self, interval=LAG_INTERVAL):
+        self._interval = interval
+        self._task = None
+        self.samples_ms = []
+
+    def start(self):
+        self.samples_ms = []
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        return _distribution(self.samples_ms)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self._interval
+            await asyncio.sleep(self._interval)
+            self.samples_ms.append(max(0.0, loop.time() - expected) * 1000)
+
+
+class BenchmarkHass:
+    """A throw-away Home Assistant with the integration linked into its config folder."""
+
+    def __init__(self, keep=False):
+        self.config_dir = tempfile.mkdtemp(prefix="aioted_benchmark_")
+        self._keep = keep
+        self.hass = None
+
+    async def async_start(self):
+        """Write a minimal configuration and start Home Assistant."""
+        from homeassistant import bootstrap, runner
+
+        os.makedirs(os.path.join(self.config_dir, "custom_components"))
+        os.symlink(COMPONENT_DIR, os.path.join(self.config_dir, "custom_components", DOMAIN))
+        with open(os.path.join(self.config_dir, "configuration.yaml"), "w") as f:
+            f.write(CONFIGURATION_YAML.format(http_port=_free_port()))
+        self.hass = await bootstrap.async_setup_hass(runner.RuntimeConfig(config_dir=self.config_dir, skip_pip=True))
+        if self.hass is None:
+            raise RuntimeError(f"Home Assistant did not start, see {os.path.join(self.config_dir, LOG_FILE)}")
+        await self.hass.async_start()
+        _LOGGER.info(f"Home Assistant started in {self.config_dir}")
+
+    async def async_add_instance(self, instance_name, ip, options):
+        """Add and set up a config entry, returns its sensor."""
+        from homeassistant.config_entries import SOURCE_USER, ConfigEntry
+
+        kwargs = {
+            "version": 1,
+            "minor_version": 1,
+            "domain": DOMAIN,
+            "title": instance_name,
+            "data": {"instance_name": instance_name, "ip": ip, "device_class": "water", "unit_of_measurement": "m³"},
+            "options": options,
+            "source": SOURCE_USER,
+            "unique_id": instance_name,
+        }
+        # Keyword-only arguments added by later Home Assistant versions
+        parameters = inspect.signature(ConfigEntry).parameters
+        if "discovery_keys" in parameters:
+            kwargs["discovery_keys"] = MappingProxyType({})
+        if "subentries_data" in parameters:
+            kwargs["subentries_data"] = None
+        await self.hass.config_entries.async_add(ConfigEntry(**kwargs))
+        await self.hass.async_block_till_done()
+        sensor = self.hass.data.get(DOMAIN, {}).get(instance_name)
+        if sensor is None:
+            raise RuntimeError(f"Instance {instance_name} was not set up, see {os.path.join(self.config_dir, LOG_FILE)}")
+        return sensor
+
+    async def async_call(self, service, data):
+        """Call a service of the integration and return its response."""
+        return await self.hass.services.async_call(DOMAIN, service, data, blocking=True, return_response=True)
+
+    async def async_stop(self):
+        """Stop Home Assistant, which flushes the CSV buffers and the stores."""
+        if self.hass is not None:
+            await self.hass.async_stop()
+            self.hass = None
+
+    def cleanup(self):
+        """Remove the config folder unless kept."""
+        if self._keep:
+            _LOGGER.info(f"Config folder kept: {self.config_dir}")
+        else:
+            shutil.rmtree(self.config_dir, ignore_errors=True)
+
+
+def _integration_module(sensor, name):
+    """Return a module of the integration as loaded by Home Assistant."""
+    return importlib.import_module(f"{type(sensor).__module__.rpartition('.')[0]}.{name}")
+
+
+def _phase_p95(sensors):
+    """Return the median over the instances of the p95 of each update phase."""
+    phases = {}
+    for phase in _integration_module(sensors[0], "timing").PHASES:
+        values = [sensor.timings.summary(phase)["p95_ms"] for sensor in sensors]
+        values = [value for value in values if value is not None]
+        if values:
+            phases[phase] = _percentile(values, 0.5)
+    return phases
+
+
+async def run_poll_benchmark(args):
+    """Drive the simulated devices through the sensor update pipeline."""
+    profile = DeviceProfile.from_args(args)
+    farm = DeviceFarm(args.devices, profile, args.host, args.base_port)
+    bench = BenchmarkHass(args.keep)
+    update_ms = []
+    available = []
+    await farm.async_start()
+    try:
+        await bench.async_start()
+        options = {
+            "scan_interval": args.scan_interval if args.drive == "scheduler" else 86400, # Service drive: no scheduled poll in the way
+            **_parse_options(args.option),
+        }
+        sensors = []
+        for device in farm.devices:
+            # Not a number of the device: the sensor reads the first number of the JSON
+            sensors.append(await bench.async_add_instance(f"bench_{device.port}", device.address, options))
+        _LOGGER.info(f"{len(sensors)} instances set up")
+
+        def _listener(sensor):
+            def _on_update():
+                update_ms.append(sensor.timings.summary("update")["last_ms"])
+                available.append(sensor.available)
+            return _on_update
+
+        removers = [sensor.timings.async_add_listener(_listener(sensor)) for sensor in sensors]
+        requests_before = farm.totals()["requests"].get("json", 0)
+        bytes_before = _dir_bytes(bench.config_dir)
+        lag = LoopLagMonitor()
+        lag.start()
+        started = time.monotonic()
+        if args.drive == "service":
+            for _round in range(args.rounds):
+                await bench.async_call("collect_data", {"instance_name": ["all"], "max_concurrent": args.max_concurrent})
+        else:
+            await asyncio.sleep(args.duration)
+        elapsed = time.monotonic() - started
+        loop_lag = await lag.stop()
+        for remove in removers:
+            remove()
+        phase_p95 = _phase_p95(sensors)
+        polls = farm.totals()["requests"].get("json", 0) - requests_before
+        await bench.async_stop() # Buffered CSV rows and pending stores are written on stop
+        bytes_written = _dir_bytes(bench.config_dir) - bytes_before
+    finally:
+        await bench.async_stop()
+        bench.cleanup()
+        await farm.async_stop()
+
+    return {
+        "benchmark": "poll",
+        "drive": args.drive,
+        "devices": args.devices,
+        "profile": vars(profile),
+        "options": options,
+        "elapsed_s": round(elapsed, 2),
+        "polls": polls,
+        "polls_per_s": round(polls / elapsed, 2) if elapsed else None,
+        "updates": len(update_ms),
+        "available_ratio": round(sum(available) / len(available), 3) if available else None,
+        "update_latency": _distribution(update_ms),
+        "loop_lag": loop_lag,
+        "phase_p95_ms": phase_p95,
+        "bytes_written": bytes_written,
+        "device_totals": farm.totals(),
+    }
+
+
+async def run_upload_benchmark(args):
+    """Seed frames and run the upload_data service against a local receiving server, once per mode."""
+    from aiohttp import web
+
+    received_dir = tempfile.mkdtemp(prefix="aioted_benchmark_received_")
+    server = UploadServer(received_dir, UPLOAD_API_KEY, args.fail_rate)
+    upload_port = _free_port()
+    server_runner = web.AppRunner(server.app(), access_log=None)
+    await server_runner.setup()
+    await web.TCPSite(server_runner, "127.0.0.1", upload_port).start()
+
+    modes = [mode.strip() for mode in args.modes.split(",") if mode.strip()]
+    profile = DeviceProfile(latency=5.0, jitter=1.0)
+    farm = DeviceFarm(args.instances * len(modes), profile, args.host, args.base_port)
+    bench = BenchmarkHass(args.keep)
+    results = {}
+    await farm.async_start()
+    try:
+        await bench.async_start()
+        devices = iter(farm.devices)
+        instances = {}
+        for mode in modes:
+            instances[mode] = []
+            for index in range(args.instances):
+                instance_name = f"bench_{mode}_{index:03d}"
+                sensor = await bench.async_add_instance(instance_name, next(devices).address, {
+                    "scan_interval": 86400,
+                    "save_images": False, # Only the seeded frames are uploaded
+                    "log_as_csv": False,
+                    "enable_upload": True,
+                    "upload_url": f"http://127.0.0.1:{upload_port}/upload",
+                    "api_key": UPLOAD_API_KEY,
+                    "upload_mode": mode,
+                })
+                image_store = _integration_module(sensor, "image_store")
+                await bench.hass.async_add_executor_job(_seed_frames, image_store, image_store.instance_www_dir(instance_name), args.images, args.image_size)
+                instances[mode].append(instance_name)
+
+        for mode in modes:
+            bytes_before = server.bytes_received
+            lag = LoopLagMonitor()
+            lag.start()
+            started = time.monotonic()
+            response = await bench.async_call("upload_data", {"instance_name": instances[mode], "max_concurrent": args.max_concurrent})
+            elapsed = time.monotonic() - started
+            received = server.bytes_received - bytes_before
+            results[mode] = {
+                "elapsed_s": round(elapsed, 2),
+                "files": sum(result.get("files", 0) for result in response["results"].values()),
+                "statuses": {name: result.get("status") for name, result in response["results"].items()},
+                "bytes_received": received,
+                "mib_per_s": round(received / 1048576 / elapsed, 2) if elapsed else None,
+                "loop_lag": await lag.stop(),
+            }
+            _LOGGER.info(f"Upload {mode}: {results[mode]['files']} files in {results[mode]['elapsed_s']}s")
+    finally:
+        await bench.async_stop()
+        bench.cleanup()
+        await farm.async_stop()
+        await server_runner.cleanup()
+        shutil.rmtree(received_dir, ignore_errors=True)
+
+    return {
+        "benchmark": "upload",
+        "instances": args.instances,
+        "images_per_instance": args.images,
+        "image_size": args.image_size,
+        "fail_rate": args.fail_rate,
+        "modes": results,
+    }
+
+
+def _seed_frames(image_store, www_dir, count, size):
+    """Write `count` frames named and sharded like the image store, spread over the last day."""
+    now = int(time.time())
+    for index in range(count):
+        epoch = now - 86400 + index * 86400 // max(count, 1)
+        data = b"\xff\xd8" + os.urandom(max(0, size - 4)) + b"\xff\xd9"
+        folder = os.path.join(www_dir, image_store.shard_dir(epoch))
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"{epoch}_{100 + index / 100:.4f}_{image_store.image_digest(data)}.jpg")
+        with open(path, "wb") as f:
+            f.write(data)
+        os.utime(path, (epoch, epoch))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    poll = subparsers.add_parser("poll", help="Sensor update pipeline")
+    poll.add_argument("--devices", type=int, default=10)
+    poll.add_argument("--drive", choices=("service", "scheduler"), default="service")
+    poll.add_argument("--rounds", type=int, default=10, help="collect_data rounds (service drive)")
+    poll.add_argument("--max-concurrent", type=int, default=4, help="Instances polled at once (service drive, 1-32)")
+    poll.add_argument("--scan-interval", type=int, default=30, help="Poll interval (scheduler drive)")
+    poll.add_argument("--duration", type=float, default=120, help="Seconds to run (scheduler drive)")
+    poll.add_argument("--option", action="append", help="Integration option key=value, repeatable")
+    DeviceProfile.add_arguments(poll)
+
+    upload = subparsers.add_parser("upload", help="daily_upload_task through the upload_data service")
+    upload.add_argument("--instances", type=int, default=2, help="Instances per upload mode")
+    upload.add_argument("--images", type=int, default=500, help="Frames seeded per instance")
+    upload.add_argument("--image-size", type=int, default=60 * 1024)
+    upload.add_argument("--modes", default="file,stream,chunked")
+    upload.add_argument("--max-concurrent", type=int, default=4)
+    upload.add_argument("--fail-rate", type=float, default=0.0, help="Probability of a 503 from the upload server")
+
+    for subparser in (poll, upload):
+        subparser.add_argument("--host", default="127.0.0.1", help="Address the simulated devices listen on")
+        subparser.add_argument("--base-port", type=int, default=8100)
+        subparser.add_argument("--json", dest="json_path", help="Also write the results to this file")
+        subparser.add_argument("--keep", action="store_true", help="Keep the temporary config folder")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    run = run_poll_benchmark if args.benchmark == "poll" else run_upload_benchmark
+    results = asyncio.run(run(args))
+    print(json.dumps(results, indent=2, default=str))
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,396 @@
+"""
+Simulated AI-on-the-edge devices for developing and benchmarking aioted_manager without ESP32 hardware.
+
+Each device listens on its own port of --host and implements the endpoints used by the integration:
+  /json             readings of the device numbers, with ETag/If-None-Match when --etag is set
+  /img_tmp/alg.jpg  JPEG-framed random bytes of --image-size, new content every round
+  /setPreValue      ?numbers=<number>&value=<value>, resets the raw value of a number
+  /flow_start       starts a round taking --flow-duration seconds
+  /statusflow       busy step during a round, "Flow finished (HH:MM:SS)" between rounds
+  /reboot           closes the listening socket for --reboot-time seconds
+
+Value trajectories (--trajectory):
+  linear   raw value grows by --step every round
+  bursty   consumption periods of a few rounds separated by flat periods
+  flat     raw value never changes
+  noisy    linear, with --misread-rate of the rounds reading a digit wrong (spikes and drops)
+
+Faults: --latency/--jitter (ms per request), --bandwidth (KiB/s for the image), --failure-rate (HTTP 503),
+--drop-rate (connection closed without answer), --hang-rate (no answer for --hang-time seconds),
+--device-error-rate (round reported with a device error, e.g. "Neg. Rate").
+Requests are served one at a time per device, like the ESP32 web server.
+
+Usage:
+  python tools/device_sim.py --count 50 --base-port 8100 --trajectory bursty --failure-rate 0.02
+Then configure instances with the IPs 127.0.0.1:8100, 127.0.0.1:8101, ... (tools/benchmark.py does this itself).
+"""
+import argparse
+import asyncio
+import logging
+import random
+from dataclasses import dataclass, field, fields
+from datetime import datetime, timedelta
+
+from aiohttp import web
+
+_LOGGER = logging.getLogger("device_sim")
+
+TRAJECTORIES = ("linear", "bursty", "flat", "noisy")
+FLOW_STEPS = ("Take Image", "Aligning", "Digitization of ROIs", "Post-Processing", "Publish to MQTT")
+DEVICE_TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S%z"
+
+
+@dataclass
+class DeviceProfile:
+    """Behaviour shared by the simulated devices of a farm."""
+
+    numbers: tuple = ("main",)
+    trajectory: str = "linear"
+    start: float = 100.0
+    step: float = 0.01 # Raw value increase per round
+    round_interval: float = 0.0 # Real seconds between two rounds, 0: every /json request sees a new round
+    device_round_seconds: int = 60 # Device clock advance per round, keeps the device timestamps unique
+    flow_duration: float = 2.0
+    latency: float = 20.0 # ms
+    jitter: float = 10.0 # ms
+    bandwidth: float = 0.0 # KiB/s for the image, 0: unlimited
+    image_size: int = 60 * 1024
+    failure_rate: float = 0.0
+    drop_rate: float = 0.0
+    hang_rate: float = 0.0
+    hang_time: float = 30.0
+    device_error_rate: float = 0.0
+    misread_rate: float = 0.05 # noisy trajectory only
+    reboot_time: float = 15.0
+    etag: bool = False
+    seed: int = None
+
+    @classmethod
+    def add_arguments(cls, parser):
+        """Add one --option per field to an argparse parser."""
+        parser.add_argument("--numbers", default="main", help="Comma-separated numbers of each device")
+        parser.add_argument("--trajectory", choices=TRAJECTORIES, default=cls.trajectory)
+        parser.add_argument("--etag", action="store_true", help="Send ETag and answer 304 to an unchanged round")
+        for profile_field in fields(cls):
+            if profile_field.name in ("numbers", "trajectory", "etag"):
+                continue
+            parser.add_argument(f"--{profile_field.name.replace('_', '-')}", type=profile_field.type, default=profile_field.default)
+
+    @classmethod
+    def from_args(cls, args):
+        """Build a profile from parsed arguments."""
+        values = {profile_field.name: getattr(args, profile_field.name) for profile_field in fields(cls)}
+        values["numbers"] = tuple(number.strip() for number in args.numbers.split(",") if number.strip())
+        return cls(**values)
+
+
+@dataclass
+class DeviceStats:
+    """Requests served by a device."""
+
+    requests: dict = field(default_factory=dict) # endpoint -> count
+    faults: int = 0
+    bytes_sent: int = 0
+    not_modified: int = 0
+    prevalues: int = 0
+    reboots: int = 0
+
+
+class SimulatedDevice:
+    """One simulated device: its rounds, its numbers and its web server."""
+
+    def __init__(self, name, host, port, profile, rng=None):
+        self.name = name
+        self.host = host
+        self.port = port
+        self.profile = profile
+        self.stats = DeviceStats()
+        self._rng = rng or random.Random(profile.seed)
+        self._raw = dict.fromkeys(profile.numbers, profile.start)
+        self._readings = {}
+        self._image = b""
+        self._round = 0
+        self._round_started = 0.0 # Loop time of the last round
+        self._device_clock = datetime.now().astimezone().replace(microsecond=0)
+        self._burst_left = 0
+        self._flow_task = None
+        self._flow_step = None
+        self._serve_lock = asyncio.Lock()
+        self._runner = None
+        self._site = None
+        self._new_round()
+
+    @property
+    def address(self):
+        """Return the address to configure as the instance IP."""
+        return f"{self.host}:{self.port}"
+
+    @property
+    def round(self):
+        """Return the number of completed rounds."""
+        return self._round
+
+    def app(self):
+        """Return the aiohttp application of the device."""
+        app = web.Application()
+        app.router.add_get("/json", self.handle_json)
+        app.router.add_get("/img_tmp/alg.jpg", self.handle_image)
+        app.router.add_get("/setPreValue", self.handle_prevalue)
+        app.router.add_get("/flow_start", self.handle_flow_start)
+        app.router.add_get("/statusflow", self.handle_statusflow)
+        app.router.add_get("/reboot", self.handle_reboot)
+        return app
+
+    async def async_start(self):
+        """Start listening."""
+        self._runner = web.AppRunner(self.app(), access_log=None)
+        await self._runner.setup()
+        await self._listen()
+
+    async def async_stop(self):
+        """Stop listening and cancel a running round."""
+        if self._flow_task:
+            self._flow_task.cancel()
+        if self._runner:
+            await self._runner.cleanup()
+
+    async def _listen(self):
+        self._site = web.TCPSite(self._runner, self.host, self.port, reuse_address=True)
+        await self._site.start()
+
+    # --- Rounds ---
+
+    def _advance(self, raw):
+        """Return the next raw value of a number following the trajectory."""
+        profile = self.profile
+        if profile.trajectory == "flat":
+            return raw
+        if profile.trajectory == "bursty":
+            if self._burst_left <= 0 and self._rng.random() < 0.2:
+                self._burst_left = self._rng.randint(2, 10)
+            if self._burst_left <= 0:
+                return raw
+            return raw + profile.step * self._rng.uniform(0.5, 3.0)
+        return raw + profile.step # linear, noisy (misreads only change the reported value)
+
+    def _new_round(self):
+        """Run one device round: new raw values, new device timestamp and new image."""
+        self._round += 1
+        self._round_started = asyncio.get_running_loop().time() if self._round > 1 else 0.0 # First round built before the loop runs
+        self._device_clock += timedelta(seconds=self.profile.device_round_seconds)
+        timestamp = self._device_clock.strftime(DEVICE_TIMESTAMP_FORMAT)
+        device_error = self._rng.random() < self.profile.device_error_rate
+        for number, raw in self._raw.items():
+            previous = raw
+            raw = self._advance(raw)
+            self._raw[number] = raw
+            read = raw
+            if self.profile.trajectory == "noisy" and self._rng.random() < self.profile.misread_rate:
+                read = raw + self._rng.choice((-1, 1)) * 10 ** self._rng.randint(0, 2) # One digit read wrong
+            rate = (raw - previous) * 3600 / self.profile.device_round_seconds
+            if device_error:
+                # The firmware keeps the previous value and reports why the reading was refused
+                self._readings[number] = {
+                    "value": f"{previous:.4f}", "raw": f"{read:.4f}", "pre": f"{previous:.4f}",
+                    "error": f"Neg. Rate - Read: {read:.4f} - Raw: {read:.4f} - Pre: {previous:.4f}",
+                    "rate": "0.0000", "timestamp": timestamp,
+                }
+            else:
+                self._readings[number] = {
+                    "value": f"{read:.4f}", "raw": f"{read:.4f}", "pre": f"{previous:.4f}",
+                    "error": "no error", "rate": f"{rate:.4f}", "timestamp": timestamp,
+                }
+        self._burst_left -= 1
+        # JPEG markers around random content: a new frame (and content hash) every round
+        body = self._rng.randbytes(max(0, self.profile.image_size - 4))
+        self._image = b"\xff\xd8" + body + b"\xff\xd9"
+
+    def _maybe_new_round(self):
+        """Start a new round when the round interval elapsed (every request with round_interval 0)."""
+        if self._flow_task and not self._flow_task.done():
+            return # A triggered round is running
+        if asyncio.get_running_loop().time() - self._round_started >= self.profile.round_interval:
+            self._new_round()
+
+    async def _async_flow_round(self):
+        step_time = self.profile.flow_duration / len(FLOW_STEPS)
+        try:
+            for step in FLOW_STEPS:
+                self._flow_step = step
+                await asyncio.sleep(step_time)
+            self._new_round()
+        finally:
+            self._flow_step = None
+
+    # --- Serving ---
+
+    async def _serve(self, request, endpoint, handler):
+        """Serve one request at a time, with latency and faults."""
+        stats = self.stats
+        stats.requests[endpoint] = stats.requests.get(endpoint, 0) + 1
+        async with self._serve_lock:
+            profile = self.profile
+            await asyncio.sleep(max(0.0, self._rng.gauss(profile.latency, profile.jitter)) / 1000)
+            fault = self._rng.random()
+            if fault < profile.failure_rate:
+                stats.faults += 1
+                raise web.HTTPServiceUnavailable(text="Simulated failure")
+            fault -= profile.failure_rate
+            if fault < profile.drop_rate:
+                stats.faults += 1
+                request.transport.close() # Like a Wi-Fi drop, the client sees a disconnect
+                raise web.HTTPServiceUnavailable()
+            fault -= profile.drop_rate
+            if fault < profile.hang_rate:
+                stats.faults += 1
+                await asyncio.sleep(profile.hang_time)
+            response = await handler(request)
+            if isinstance(response, web.Response) and isinstance(response.body, bytes):
+                stats.bytes_sent += len(response.body) # Streamed images are counted while written
+            return response
+
+    async def handle_json(self, request):
+        async def _json(request):
+            self._maybe_new_round()
+            etag = f'"{self.name}-{self._round}"'
+            if self.profile.etag and request.headers.get("If-None-Match") == etag:
+                self.stats.not_modified += 1
+                return web.Response(status=304, headers={"ETag": etag})
+            response = web.json_response(self._readings)
+            if self.profile.etag:
+                response.headers["ETag"] = etag
+            return response
+
+        return await self._serve(request, "json", _json)
+
+    async def handle_image(self, request):
+        async def _image(request):
+            if not self.profile.bandwidth:
+                return web.Response(body=self._image, content_type="image/jpeg")
+            # Throttled like the ESP32 Wi-Fi, in 4 KiB chunks
+            response = web.StreamResponse(headers={"Content-Type": "image/jpeg", "Content-Length": str(len(self._image))})
+            await response.prepare(request)
+            chunk_size = 4096
+            for offset in range(0, len(self._image), chunk_size):
+                await response.write(self._image[offset:offset + chunk_size])
+                await asyncio.sleep(chunk_size / (self.profile.bandwidth * 1024))
+            self.stats.bytes_sent += len(self._image)
+            await response.write_eof()
+            return response
+
+        return await self._serve(request, "image", _image)
+
+    async def handle_prevalue(self, request):
+        async def _prevalue(request):
+            number = request.query.get("numbers")
+            try:
+                value = float(request.query["value"])
+            except (KeyError, ValueError):
+                raise web.HTTPBadRequest(text="E90: Value not valid")
+            if number not in self._raw:
+                raise web.HTTPBadRequest(text=f"E91: Number {number} not found")
+            self._raw[number] = value
+            self.stats.prevalues += 1
+            return web.Response(text=f"{value:.4f}")
+
+        return await self._serve(request, "setPreValue", _prevalue)
+
+    async def handle_flow_start(self, request):
+        async def _flow_start(request):
+            if self._flow_task and not self._flow_task.done():
+                return web.Response(text="Flow already running")
+            self._flow_task = asyncio.create_task(self._async_flow_round())
+            return web.Response(text="Flow start triggered")
+
+        return await self._serve(request, "flow_start", _flow_start)
+
+    async def handle_statusflow(self, request):
+        async def _statusflow(request):
+            now = datetime.now().strftime("%H:%M:%S")
+            if self._flow_step:
+                return web.Response(text=f"{self._flow_step} ({now})")
+            finished = self._device_clock.strftime("%H:%M:%S")
+            return web.Response(text=f"Flow finished ({finished})")
+
+        return await self._serve(request, "statusflow", _statusflow)
+
+    async def handle_reboot(self, request):
+        async def _reboot(request):
+            self.stats.reboots += 1
+            asyncio.get_running_loop().call_later(0.1, lambda: asyncio.ensure_future(self._async_reboot()))
+            return web.Response(text="Reboot triggered")
+
+        return await self._serve(request, "reboot", _reboot)
+
+    async def _async_reboot(self):
+        """Refuse connections for reboot_time seconds, then start over with the same values."""
+        _LOGGER.info(f"{self.name} rebooting for {self.profile.reboot_time}s")
+        await self._site.stop()
+        await asyncio.sleep(self.profile.reboot_time)
+        await self._listen()
+
+
+class DeviceFarm:
+    """A set of simulated devices on consecutive ports."""
+
+    def __init__(self, count, profile, host="127.0.0.1", base_port=8100, name_prefix="device"):
+        rng = random.Random(profile.seed)
+        self.devices = [
+            SimulatedDevice(f"{name_prefix}_{index:03d}", host, base_port + index, profile, random.Random(rng.random()))
+            for index in range(count)
+        ]
+
+    async def async_start(self):
+        """Start all devices."""
+        await asyncio.gather(*(device.async_start() for device in self.devices))
+
+    async def async_stop(self):
+        """Stop all devices."""
+        await asyncio.gather(*(device.async_stop() for device in self.devices))
+
+    def totals(self):
+        """Return the requests, faults and bytes served by the farm."""
+        requests = {}
+        for device in self.devices:
+            for endpoint, count in device.stats.requests.items():
+                requests[endpoint] = requests.get(endpoint, 0) + count
+        return {
+            "devices": len(self.devices),
+            "requests": requests,
+            "faults": sum(device.stats.faults for device in self.devices),
+            "not_modified": sum(device.stats.not_modified for device in self.devices),
+            "prevalues": sum(device.stats.prevalues for device in self.devices),
+            "bytes_sent": sum(device.stats.bytes_sent for device in self.devices),
+            "rounds": sum(device.round for device in self.devices),
+        }
+
+
+async def run_farm(count, profile, host, base_port):
+    """Run a farm until interrupted, logging its totals every minute."""
+    farm = DeviceFarm(count, profile, host, base_port)
+    await farm.async_start()
+    _LOGGER.info(f"{count} devices listening on {host}:{base_port}-{base_port + count - 1}")
+    try:
+        while True:
+            await asyncio.sleep(60)
+            _LOGGER.info(f"Served: {farm.totals()}")
+    finally:
+        await farm.async_stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=1, help="Number of devices")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--base-port", type=int, default=8100, help="Port of the first device, the others follow")
+    DeviceProfile.add_arguments(parser)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(run_farm(args.count, DeviceProfile.from_args(args), args.host, args.base_port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
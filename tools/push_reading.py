@@ -0,0 +1,80 @@
+"""
+Stand-in device pushing readings to the push mode webhook of an aioted_manager instance.
+
+Posts one reading per round, either as a full /json answer ({"<number>": {...}}) or as the
+single reading the firmware publishes on its MQTT <number>/json topic. The raw value grows
+by --step each round, so every push is a new device round.
+
+Usage:
+  python tools/push_reading.py --url http://<ha>:8123/api/webhook/<webhook_id> --number main --interval 10
+  python tools/push_reading.py --url ... --format mqtt --number secondary --count 5
+The webhook path of an instance is logged by Home Assistant when push mode is enabled.
+"""
+import argparse
+import asyncio
+import logging
+from datetime import datetime
+
+import aiohttp
+
+_LOGGER = logging.getLogger("push_reading")
+
+
+def build_reading(raw_value, rate):
+    """Return a reading shaped like one number of the device /json answer."""
+    return {
+        "value": f"{raw_value:.4f}",
+        "raw": f"{raw_value:.4f}",
+        "pre": f"{raw_value:.4f}",
+        "error": "no error",
+        "rate": f"{rate:.4f}",
+        "timestamp": datetime.now().astimezone().strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+async def push_readings(url, number, payload_format, start, step, interval, count):
+    """Post `count` readings (0: forever), returns the number of accepted pushes."""
+    accepted = 0
+    raw_value = start
+    round_number = 0
+    async with aiohttp.ClientSession() as session:
+        while not count or round_number < count:
+            reading = build_reading(raw_value, step * 3600 / interval if interval else 0)
+            if payload_format == "mqtt":
+                payload, params = reading, {"number": number}
+            else:
+                payload, params = {number: reading}, None
+            started = asyncio.get_running_loop().time()
+            try:
+                async with session.post(url, json=payload, params=params) as response:
+                    text = await response.text()
+                    elapsed_ms = (asyncio.get_running_loop().time() - started) * 1000
+                    if response.status == 200:
+                        accepted += 1
+                    _LOGGER.info(f"Pushed {reading['raw']} for {number}: HTTP {response.status} {text.strip()} in {elapsed_ms:.1f} ms")
+            except aiohttp.ClientError as e:
+                _LOGGER.warning(f"Push failed: {e}")
+            round_number += 1
+            raw_value += step
+            if not count or round_number < count:
+                await asyncio.sleep(interval)
+    return accepted
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", required=True, help="Webhook URL of the instance")
+    parser.add_argument("--number", default="main", help="Number name (instance name for the main number)")
+    parser.add_argument("--format", dest="payload_format", choices=("json", "mqtt"), default="json")
+    parser.add_argument("--start", type=float, default=100.0, help="First raw value")
+    parser.add_argument("--step", type=float, default=0.01, help="Raw value increase per round")
+    parser.add_argument("--interval", type=float, default=10.0, help="Seconds between two rounds")
+    parser.add_argument("--count", type=int, default=0, help="Number of rounds, 0 = until interrupted")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    accepted = asyncio.run(push_readings(args.url, args.number, args.payload_format, args.start, args.step, args.interval, args.count))
+    _LOGGER.info(f"{accepted} readings accepted")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Reference upload server for the aioted_manager upload modes.
+
+Implements the receiving side of:
+  - file / stream mode: multipart POST with a "file" field, answers "OK"
+  - chunked mode: GET returns {"offset", "complete"} for X-Upload-Id,
+    POST with a Content-Range header appends one part and returns the same status
+
+Usage:
+  python tools/upload_server.py --port 8099 --api-key secret --out ./received --fail-rate 0.2
+Then set the upload URL of an instance to http://<host>:8099/upload
+"""
+import argparse
+import logging
+import os
+import random
+import re
+
+from aiohttp import web
+
+_LOGGER = logging.getLogger("upload_server")
+
+CONTENT_RANGE_RE = re.compile(r"^bytes (\d+)-(\d+)/(\d+)$")
+SAFE_NAME_RE = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+def _safe(name):
+    """Return a file-system safe version of a client supplied name."""
+    return SAFE_NAME_RE.sub("_", name or "unknown")
+
+
+class UploadServer:
+    """Receiving side of the upload protocols."""
+
+    def __init__(self, out_dir, api_key=None, fail_rate=0.0):
+        self._out_dir = out_dir
+        self._api_key = api_key
+        self._fail_rate = fail_rate
+        self.bytes_received = 0
+        self.archives_received = 0
+
+    def app(self):
+        """Return the aiohttp application."""
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_get("/upload", self.handle_status)
+        app.router.add_post("/upload", self.handle_post)
+        return app
+
+    def _check(self, request):
+        """Validate the API key and simulate a flaky uplink."""
+        if self._api_key and request.headers.get("X-API-Key") != self._api_key:
+            raise web.HTTPUnauthorized(text="Invalid API key")
+        if self._fail_rate and random.random() < self._fail_rate:
+            raise web.HTTPServiceUnavailable(text="Simulated failure")
+
+    def _instance_dir(self, request):
+        path = os.path.join(self._out_dir, _safe(request.headers.get("instance_name")))
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def _chunked_paths(self, request):
+        upload_id = _safe(request.headers.get("X-Upload-Id"))
+        final_path = os.path.join(self._instance_dir(request), upload_id)
+        return final_path, f"{final_path}.part"
+
+    def _chunked_status(self, final_path, part_path, size):
+        if os.path.isfile(final_path) and os.path.getsize(final_path) == size:
+            return {"offset": size, "complete": True, "status": "OK"}
+        offset = os.path.getsize(part_path) if os.path.isfile(part_path) else 0
+        return {"offset": offset, "complete": False}
+
+    async def handle_status(self, request):
+        """Return the confirmed offset of a chunked upload."""
+        self._check(request)
+        if "X-Upload-Id" not in request.headers:
+            raise web.HTTPBadRequest(text="Missing X-Upload-Id")
+        size = int(request.headers.get("X-Upload-Size", "0"))
+        final_path, part_path = self._chunked_paths(request)
+        return web.json_response(self._chunked_status(final_path, part_path, size))
+
+    async def handle_post(self, request):
+        """Receive a multipart archive or one part of a chunked upload."""
+        self._check(request)
+        if "Content-Range" in request.headers:
+            return await self._handle_part(request)
+
+        reader = await request.multipart()
+        field = await reader.next()
+        if field is None or field.name != "file":
+            raise web.HTTPBadRequest(text="Missing file field")
+        target = os.path.join(self._instance_dir(request), _safe(field.filename))
+        with open(target, "wb") as f:
+            while True:
+                chunk = await field.read_chunk()
+                if not chunk:
+                    break
+                f.write(chunk)
+                self.bytes_received += len(chunk)
+        self.archives_received += 1
+        _LOGGER.info(f"Received {target}")
+        return web.Response(text="OK")
+
+    async def _handle_part(self, request):
+        match = CONTENT_RANGE_RE.match(request.headers["Content-Range"])
+        if not match:
+            raise web.HTTPBadRequest(text="Invalid Content-Range")
+        start, end, size = (int(v) for v in match.groups())
+        final_path, part_path = self._chunked_paths(request)
+        status = self._chunked_status(final_path, part_path, size)
+        if status["complete"] or start != status["offset"]:
+            return web.json_response(status) # Out of order part, the client resumes from our offset
+
+        body = await request.read()
+        if len(body) != end - start + 1:
+            raise web.HTTPBadRequest(text="Part length does not match Content-Range")
+        with open(part_path, "ab") as f:
+            f.write(body)
+        self.bytes_received += len(body)
+        if start + len(body) == size:
+            os.replace(part_path, final_path)
+            self.archives_received += 1
+            _LOGGER.info(f"Received {final_path} in parts")
+        return web.json_response(self._chunked_status(final_path, part_path, size))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--api-key", default=None)
+    parser.add_argument("--out", default="./received")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Probability of answering 503 to a request")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    server = UploadServer(args.out, args.api_key, args.fail_rate)
+    web.run_app(server.app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()